@@ -0,0 +1,118 @@
+"""
+Throughput of npm license fetching with packuments decoded on the event loop
+and in thread / process worker pools.
+
+A local registry running in a separate process serves synthetic packuments,
+every package is requested in two versions so the whole packument is downloaded.
+
+Usage:
+    PYTHONPATH=. python benchmarks/packument_parsing.py --packuments 500 --size-mb 2 --latency 0.05
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import time
+
+from aiohttp import web
+
+from license_sh.cache import NPM
+from license_sh.registries import REGISTRY_ENVS
+from license_sh.resolvers import LookupOptions
+from license_sh.runners.runners_shared import PARSE_WORKERS_ENV, fetch_npm_licenses
+
+NPM_REGISTRY_ENV = REGISTRY_ENVS[NPM]
+
+VERSION_TEMPLATE = {
+    "description": "Synthetic package used to benchmark packument parsing",
+    "keywords": ["benchmark", "license", "packument"],
+    "dependencies": {f"dependency-{i}": f"^{i}.0.0" for i in range(20)},
+    "maintainers": [{"name": f"maintainer-{i}", "email": f"maintainer-{i}@example.com"} for i in range(5)],
+    "dist": {
+        "shasum": "0" * 40,
+        "integrity": "sha512-" + "A" * 86 + "==",
+    },
+}
+
+
+def get_packument(name: str, size: int) -> bytes:
+    versions = {}
+    data = b""
+    while len(data) < size:
+        for _ in range(50):
+            version = f"1.0.{len(versions)}"
+            versions[version] = dict(VERSION_TEMPLATE, name=name, version=version, license="MIT")
+        data = json.dumps({"name": name, "versions": versions, "time": {"modified": "2021-01-01"}}).encode()
+    return data
+
+
+def serve(port: int, size: int, latency: float) -> None:
+    data = get_packument("package", size)
+
+    async def packument(request):
+        await asyncio.sleep(latency)
+        return web.Response(body=data.replace(b'"package"', f'"{request.match_info["name"]}"'.encode()),
+                            content_type="application/json")
+
+    app = web.Application()
+    app.router.add_get("/{name}/", packument)
+    web.run_app(app, host="127.0.0.1", port=port, print=None)
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_server(port: int) -> None:
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port)).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("Registry didn't start")
+
+
+def run(packuments: int, workers: str) -> float:
+    os.environ[PARSE_WORKERS_ENV] = workers
+    packages = [(f"package-{i}", version) for i in range(packuments) for version in ("1.0.0", "1.0.1")]
+    started = time.monotonic()
+    license_map = fetch_npm_licenses(packages, options=LookupOptions(use_cache=False, use_npm_cache=False))
+    elapsed = time.monotonic() - started
+    assert all(license == "MIT" for license in license_map.values()), "Unexpected licenses"
+    assert len(license_map) == len(packages), "Some packuments failed"
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--packuments", type=int, default=500)
+    parser.add_argument("--size-mb", type=float, default=2.0)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds before the registry responds")
+    parser.add_argument("--workers", default="none,thread,process")
+    args = parser.parse_args()
+
+    port = get_free_port()
+    size = int(args.size_mb * 1024 * 1024)
+    server = multiprocessing.Process(target=serve, args=(port, size, args.latency), daemon=True)
+    server.start()
+    try:
+        wait_for_server(port)
+        os.environ[NPM_REGISTRY_ENV] = f"http://127.0.0.1:{port}"
+        print(f"{args.packuments} packuments of {args.size_mb} MB, {args.latency * 1000:.0f} ms latency")
+        for workers in args.workers.split(","):
+            elapsed = run(args.packuments, workers)
+            print(
+                f"{workers:>8}: {elapsed:6.2f} s, {args.packuments / elapsed:6.1f} packuments/s, "
+                f"{args.packuments * args.size_mb / elapsed:6.1f} MB/s"
+            )
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,13 @@
 
 Usage:
   license-sh config
+  license-sh cache (stats | clear)
+  license-sh cache serve [<store>] [--host <host>] [--port <port>]
+  license-sh cache export <bundle> (--for <dir>)...
+  license-sh cache import <bundle>
+  license-sh db (import | update) <file>
+  license-sh db stats
+  license-sh serve-fixtures <fixtures> [--port <port>] [--latency <seconds>] [--error-rate <rate>]
   license-sh [options]
   license-sh <path> [options]
   license-sh (-h | --help)
@@ -16,7 +23,14 @@ Options:
   -p --project <project_type>         Run only specific project [yarn | npm | maven | pipenv]
   -i --interactive                    Runs in an interactive mode that allows you to configure project after a license check.
   --dependencies                      Include dependency license text analysis
+  --fail-fast                         Check direct dependencies first and stop at the first license violation
   -c --config <config_path>           Use custom path to config
+  --offline                           Make no network requests, fail on licenses missing in the local caches
+  --for <dir>                         Project whose cache entries are exported
+  --host <host>                       Interface of the cache server [default: 127.0.0.1].
+  --port <port>                       Port of the fixture or cache server [default: 8080].
+  --latency <seconds>                 Delay of each fixture server response [default: 0].
+  --error-rate <rate>                 Share of fixture server requests failing with 503 [default: 0].
   --version                           Show version.
 """
 from docopt import docopt
@@ -1,4 +1,4 @@
-from typing import Union
+from typing import Dict, Optional, Union
 
 from anytree import AnyNode
 
@@ -16,13 +16,16 @@ ANALYZERS = {
 }
 
 
-def run_analyze(project_to_check: ProjectType, path: str, dep_tree: AnyNode) -> Union[AnyNode, None]:
+def run_analyze(
+    project_to_check: ProjectType, path: str, dep_tree: AnyNode, registries: Optional[Dict[str, str]] = None
+) -> Union[AnyNode, None]:
     """ Run dependency analyze
 
     Args:
         project_to_check (str): Project type to check
         path (str): Path to the project directory
         dep_tree (AnyNode): Dependency tree to update with analyzed data
+        registries (Dict[str, str], optional): Registries from the config, ecosystem as key
 
     Returns:
         [AnyNode]: Updated tree or None if unsuported project type
@@ -32,4 +35,8 @@ def run_analyze(project_to_check: ProjectType, path: str, dep_tree: AnyNode) ->
     if not analyzer:
         return None
 
+    if project_to_check == ProjectType.MAVEN:
+        # only maven downloads license texts, possibly through a configured mirror
+        return analyze_maven(path, dep_tree, registries)
+
     return analyzer(path, dep_tree)
@@ -1,13 +1,12 @@
-import asyncio
 import copy
 import os
 import subprocess
 import tempfile
 import xml.etree.ElementTree as ET
-from typing import Dict, List, Tuple
+from functools import partial
+from typing import Dict, List, Optional, Tuple
 from zipfile import ZipFile
 
-import aiohttp as aiohttp
 from anytree import AnyNode
 
 from license_sh.analyze.analyze_shared import (
@@ -15,6 +14,20 @@ from license_sh.analyze.analyze_shared import (
     add_analyze_to_dep_tree,
     transform_html,
 )
+from license_sh.cache import MAVEN, get_cache
+from license_sh.fetcher import (
+    NOT_MODIFIED,
+    FetchStats,
+    OfflineError,
+    Validators,
+    fetch_all,
+    get_conditional_headers,
+    get_validators,
+    is_offline,
+    report_fetch_stats,
+)
+from license_sh.registries import get_mirror_url, get_registry
+from license_sh.runners.runners_shared import get_maven_offline_flags
 
 
 def get_licenses_xml(directory: str):
@@ -31,6 +44,7 @@ def get_licenses_xml(directory: str):
         subprocess.run(
             [
                 "mvn",
+                *get_maven_offline_flags(),
                 "license:download-licenses",
                 f"-DlicensesOutputDirectory={dirpath}",
                 "-DskipDownloadLicenses=true",
@@ -77,6 +91,7 @@ def call_copy_dependencies(directory: str, tmpDir: str):
     subprocess.run(
         [
             "mvn",
+            *get_maven_offline_flags(),
             "dependency:copy-dependencies",
             f"-DoutputDirectory={tmpDir}",
             "-f",
@@ -123,17 +138,20 @@ def get_jar_analyze_dict(tmp_dir: str, analyze_list: List) -> Dict:
     return jar_analyze_dict
 
 
-def get_analyze_maven_data(directory: str, license_dir: str) -> List:
+def get_analyze_maven_data(directory: str, license_dir: str, registry: Optional[str] = None) -> List:
     """Download licenses xml and based on that download licenses and analyze them
 
     Args:
         directory (str): Path to the project
         license_dir (str): Directory where to store licenses
+        registry (str, optional): Mirror of license files, None downloads them from their urls
 
     Returns:
         [List]: Result of the askalono analysis
     """
-    fetch_maven_licenses(parse_licenses_xml(get_licenses_xml(directory)), license_dir)
+    stats = FetchStats()
+    fetch_maven_licenses(parse_licenses_xml(get_licenses_xml(directory)), license_dir, stats, registry=registry)
+    report_fetch_stats(stats, silent=True)
     return run_askalono(license_dir, "*")
 
 
@@ -192,11 +210,12 @@ def unzip_maven_dependencies(directory: str):
                     continue
 
 
-def get_maven_analyze_dict(directory: str) -> Dict:
+def get_maven_analyze_dict(directory: str, registry: Optional[str] = None) -> Dict:
     """Get maven alanyze dictonary
 
     Args:
         directory (str): Path to the project
+        registry (str, optional): Mirror of license files, None downloads them from their urls
 
     Returns:
         Dict: Dependency id as key, license text and analyzed license name and value
@@ -204,7 +223,7 @@ def get_maven_analyze_dict(directory: str) -> Dict:
     data_dict: Dict[str, List[Dict[str, str]]] = {}
 
     with tempfile.TemporaryDirectory() as dirpath:
-        license_data = get_analyze_maven_data(directory, dirpath)
+        license_data = get_analyze_maven_data(directory, dirpath, registry)
         for item in license_data:
             *path_to_file, file_name = item.get("path").split("/")
             dep_id, *rest = file_name.split("@")
@@ -226,60 +245,137 @@ def get_maven_analyze_dict(directory: str) -> Dict:
         return data_dict
 
 
-def analyze_maven(directory: str, dep_tree: AnyNode) -> AnyNode:
+def analyze_maven(directory: str, dep_tree: AnyNode, registries: Optional[Dict[str, str]] = None) -> AnyNode:
     """Run maven analyze
 
   Args:
       directory (str): Path to the project
       dep_tree (AnyNode): Dependency tree to update
+      registries (Dict[str, str], optional): Registries from the config, ecosystem as key
 
   Returns:
       [AnyNode]: Updated tree with analyze
   """
     jar_analysis = get_jar_analyze_data(directory)
-    licenses_analysis = get_maven_analyze_dict(directory)
+    licenses_analysis = get_maven_analyze_dict(directory, get_registry(MAVEN, registries))
     analyze_data = merge_licenses_analysis_with_jar_analysis(
         licenses_analysis, jar_analysis
     )
     return add_analyze_to_dep_tree(analyze_data, dep_tree)
 
 
-def fetch_maven_licenses(dep_data: Dict, dir_path: str):
-    """Fetch licenses from url
+def get_cached_texts(
+    requests: List[Tuple[str, str]], cache
+) -> Tuple[Dict[str, str], Dict[str, Optional[Validators]]]:
+    """Get license texts downloaded before, in offline mode every text has to be cached
 
-    TODO: Write unittests
+    Returns:
+        Tuple[Dict, Dict]: Cached texts and validators of the ones to revalidate, none are revalidated offline
+
+    Raises:
+        OfflineError: In offline mode, when some texts aren't in the cache
+    """
+    if cache is None:
+        return {}, {}
+    cached = cache.get_texts(url for url, _ in requests)
+    missing = [url for url, _ in requests if url not in cached]
+    if is_offline():
+        if missing:
+            raise OfflineError(MAVEN, missing)
+        return cached, {}
+    return cached, cache.get_stale_texts(cached)
+
+
+async def read_license_text(resp, request) -> Tuple[Optional[str], Optional[Validators]]:
+    """Read license text and its validators, the text is None when it wasn't modified"""
+    if resp.status == NOT_MODIFIED:
+        return None, None
+    text = await resp.text() if resp.content_type.startswith('text') else ""
+    return text, get_validators(resp.headers)
+
+
+def write_license_text(dir_path: str, file_name: str, text: str, stats: FetchStats) -> None:
+    stats.add_license(text)
+    if not text:
+        return
+    with open(os.path.join(dir_path, file_name), "w") as file:
+        file.write(transform_html(text))
+
+
+def fetch_maven_licenses(
+    dep_data: Dict,
+    dir_path: str,
+    stats: Optional[FetchStats] = None,
+    debug: bool = False,
+    registry: Optional[str] = None,
+    use_cache: bool = True,
+):
+    """Fetch licenses from url, texts downloaded before are taken from the cache
+
+    Texts cached for longer than the revalidation period are revalidated with conditional
+    requests, so unchanged texts cost a 304 with no body.
 
     Args:
         dep_data (Dict): dependency data with dep_id as key and url as value
         dir_path (str): path to where to download the files
-    """
+        stats (FetchStats, optional): Collects counts of fetched and failed license texts
+        debug (bool, optional): Print adjustments of concurrency per host
+        registry (str, optional): Mirror keeping license files under their original host and path
+        use_cache (bool, optional): Use the persistent cache of license texts. Defaults to True.
 
-    async def fetch(session, url, dep_id):
-        async with session.get(url) as resp:
-            if resp.content_type.startswith('text'):
-                return await resp.text(), dep_id
-            else:
-                return None
-            # Catch HTTP errors/exceptions here
-
-    async def fetch_concurrent():
-        loop = asyncio.get_event_loop()
-        async with aiohttp.ClientSession() as session:
-            tasks = []
-            for dep_id, urls in dep_data.items():
-                for index, url in enumerate(urls):
-                    tasks.append(
-                        loop.create_task(fetch(session, url, f"{dep_id}@{index}"))
-                    )
-
-            for result in asyncio.as_completed(tasks):
-                try:
-                    response = await result
-                    if response:
-                        output, dep_id = response
-                        with open(os.path.join(dir_path, dep_id), "w") as file:
-                            file.write(transform_html(output))
-                except aiohttp.client_exceptions.ClientConnectorCertificateError:
-                    continue
-
-    asyncio.run(fetch_concurrent())
+    Raises:
+        OfflineError: In offline mode, when some texts aren't in the cache
+    """
+    stats = stats if stats is not None else FetchStats()
+    cache = get_cache() if use_cache else None
+    requests = [(url, f"{dep_id}@{index}") for dep_id, urls in dep_data.items() for index, url in enumerate(urls)]
+    cached, stale = get_cached_texts(requests, cache)
+    fetched: Dict[str, str] = {}
+    validators: Dict[str, Optional[Validators]] = {}
+    not_modified: List[str] = []
+
+    write = partial(write_license_text, dir_path, stats=stats)
+
+    def handle_error(error, request):
+        url, file_name = request
+        # a stale text which couldn't be revalidated is still better than none
+        if url in cached:
+            write(file_name, cached[url])
+        else:
+            stats.failed += 1
+
+    def handle(output, request):
+        url, file_name = request
+        text, text_validators = output
+        if url in stale:
+            stats.add_revalidation(text is None)
+        if text is None:
+            not_modified.append(url)
+            text = cached[url]
+        else:
+            fetched[url] = text
+            validators[url] = text_validators
+        write(file_name, text)
+
+    for url, file_name in requests:
+        if url in cached and url not in stale:
+            write(file_name, cached[url])
+
+    try:
+        fetch_all(
+            [
+                (get_mirror_url(url, registry), (url, file_name))
+                for url, file_name in requests
+                if url not in cached or url in stale
+            ],
+            handle,
+            read_license_text,
+            stats=stats,
+            debug=debug,
+            handle_error=handle_error,
+            headers=lambda request: get_conditional_headers(stale.get(request[0])),
+        )
+    finally:
+        if cache is not None:
+            cache.set_texts(fetched, validators)
+            cache.refresh_texts(not_modified)
@@ -1,53 +1,211 @@
+import hashlib
+import json
 import os
 import re
+import shutil
 import subprocess
+import sys
+import sysconfig
 import tempfile
-from typing import Dict, List
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
 
 from anytree import AnyNode, PreOrderIter
 
 from license_sh.analyze.analyze_shared import run_askalono, LICENSE_GLOB
+from license_sh.cache import NO_CACHE_ENV, PYPI, get_cache_dir
+from license_sh.fetcher import OfflineError, is_offline
 
 SUFFIX = ".dist-info"
+TARGETS_DIR = "pipenv-targets"
+STAGING_PREFIX = "staging-"
+MAX_TARGETS = 5  # targets of other lockfiles kept, the least recently used ones are removed
+PRUNE_GRACE = 60 * 60  # seconds a used target is never removed for, a parallel run may be reading it
 
 
-def get_analyze_pipenv_data(directory: str, tmp_dir: str) -> List:
+def read_pipfile_lock(directory: str) -> Optional[Dict]:
+    try:
+        with open(os.path.join(directory, "Pipfile.lock")) as pipfile_lock:
+            lock = json.load(pipfile_lock)
+    except (OSError, ValueError):
+        return None
+    return lock if isinstance(lock, dict) else None
+
+
+def get_requirement(name: str, entry: Dict) -> Optional[str]:
+    """Get requirement line of a Pipfile.lock entry
+
+    Example:
+        ("idna", {"version": "==2.10", "hashes": ["sha256:b3"], "markers": "python_version >= '3'"})
+        -> "idna==2.10 ; python_version >= '3' --hash=sha256:b3"
+
+    Returns:
+        Optional[str]: The line or None for entries without a pinned version and hashes (VCS checkouts,
+        local paths), pip requires hashes of all requirements once one has them
+    """
+    version = entry.get("version", "")
+    hashes = entry.get("hashes") or []
+    if not version.startswith("==") or not hashes:
+        return None
+    extras = f"[{','.join(entry['extras'])}]" if entry.get("extras") else ""
+    markers = f" ; {entry['markers']}" if entry.get("markers") else ""
+    return f"{name}{extras}{version}{markers} " + " ".join(f"--hash={value}" for value in hashes)
+
+
+def get_hashed_requirements(lock: Dict) -> str:
+    """Get hashed requirements of the default packages of Pipfile.lock, as `pipenv lock -r` does
+
+    Args:
+        lock (Dict): Parsed Pipfile.lock
+
+    Returns:
+        str: Content of a requirements file
+    """
+    sources = [source["url"] for source in lock.get("_meta", {}).get("sources", []) if source.get("url")]
+    lines = [f"-i {url}" if i == 0 else f"--extra-index-url {url}" for i, url in enumerate(sources)]
+    lines += filter(None, (get_requirement(name, entry) for name, entry in lock.get("default", {}).items()))
+    return "\n".join(lines) + "\n"
+
+
+def install_requirements(directory: str, lock: Dict, target: str) -> bool:
+    """Install packages of Pipfile.lock into target with pip of the project's environment
+
+    Returns:
+        bool: pip succeeded
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        requirements_path = os.path.join(tmp_dir, "requirements.txt")
+        with open(requirements_path, "w") as requirements_file:
+            requirements_file.write(get_hashed_requirements(lock))
+
+        # the lockfile pins every package, so pip has nothing to resolve
+        process = subprocess.run(
+            [
+                "pipenv",
+                "run",
+                "pip",
+                "install",
+                *(["--no-index"] if is_offline() else []),
+                "--no-deps",
+                "-r",
+                requirements_path,
+                "--target",
+                target,
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=directory,
+        )
+    return process.returncode == 0
+
+
+def get_targets_dir() -> Optional[str]:
+    """Get directory of install targets cached by the locked packages, None when caching is disabled"""
+    if os.environ.get(NO_CACHE_ENV):
+        return None
+    return os.path.join(get_cache_dir(), TARGETS_DIR)
+
+
+def get_target_key(lock: Dict) -> Optional[str]:
+    """Get key of the install target of Pipfile.lock
+
+    _meta.hash is the hash of the Pipfile, it doesn't change when `pipenv lock` pins other
+    versions, so the target is keyed by the hashed requirements pip installs instead. pip picks
+    wheels and evaluates markers for the Python version and platform, they are part of the key.
+
+    Returns:
+        Optional[str]: sha256 of the requirements, Python version and platform tag or None when no package is pinned
+    """
+    if not lock.get("default"):
+        return None
+    python = "{}.{}".format(*sys.version_info[:2])
+    return hashlib.sha256(f"{python} {sysconfig.get_platform()}\n{get_hashed_requirements(lock)}".encode()).hexdigest()
+
+
+def prune_targets(targets_dir: str, keep: int = MAX_TARGETS, grace: float = PRUNE_GRACE) -> None:
+    """Remove all but the most recently used install targets
+
+    Targets used within the grace period are kept even over the limit, another run may be
+    analysing them.
+
+    Args:
+        targets_dir (str): Directory of the targets
+        keep (int, optional): Number of targets to keep
+        grace (float, optional): Seconds since the last use a target is kept for
+    """
+    targets = [
+        entry for entry in os.scandir(targets_dir) if entry.is_dir() and not entry.name.startswith(STAGING_PREFIX)
+    ]
+    targets.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in targets[keep:]:
+        if entry.stat().st_mtime < time.time() - grace:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+@contextmanager
+def get_install_target(directory: str) -> Iterator[str]:
+    """Get directory with the packages of the project's Pipfile.lock installed
+
+    Targets are cached by the pinned packages, a repeated run on an unchanged lockfile reuses
+    the installed one. Packages are installed into a staging directory, which is renamed to the
+    cached target once pip succeeds, so parallel runs never see a partial target. A failed or
+    uncached install is removed after use, only the most recently used targets are kept.
+
+    Args:
+        directory (str): Path to the project
+
+    Yields:
+        str: Path of the target
+
+    Raises:
+        OfflineError: In offline mode, when the target isn't cached and pip can't install it
+    """
+    lock = read_pipfile_lock(directory) or {}
+    key = get_target_key(lock)
+    targets_dir = get_targets_dir()
+    target = os.path.join(targets_dir, key) if targets_dir and key else None
+    if target is not None and os.path.isdir(target):
+        os.utime(target)  # recently used targets are kept by prune_targets
+        yield target
+        return
+
+    if targets_dir:
+        os.makedirs(targets_dir, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=STAGING_PREFIX, dir=targets_dir)
+    installed = bool(lock) and install_requirements(directory, lock, staging)
+    if installed and target is not None:
+        try:
+            os.rename(staging, target)
+        except OSError:  # a parallel run installed it meanwhile
+            shutil.rmtree(staging, ignore_errors=True)
+        prune_targets(os.path.dirname(target))
+        yield target
+        return
+
+    try:
+        if lock and not installed and is_offline():
+            # bundles don't carry targets, pip has no index to install from
+            raise OfflineError(
+                PYPI, [f"{name}@{entry['version'].lstrip('=')}" for name, entry in lock.get("default", {}).items()
+                       if entry.get("version")]
+            )
+        yield staging
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def get_analyze_pipenv_data(target: str) -> List:
     """
     Analyze pipenv dependencies
 
     Args:
-      directory (str): Path to the project
+      target (str): Directory the packages of the project are installed in
 
     Returns:
       [Dict]: Analyzed data as dictionary
     """
-    requirements_output = subprocess.run(
-        ["pipenv", "lock", "-r"],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        cwd=directory,
-    ).stdout.decode("utf-8")
-    requirements_path = os.path.join(tmp_dir, "requirements.txt")
-    with open(requirements_path, "w") as requirements_file:
-        requirements_file.write(requirements_output)
-
-    subprocess.run(
-        [
-            "pipenv",
-            "run",
-            "pip",
-            "install",
-            "-r",
-            requirements_path,
-            "--target",
-            tmp_dir,
-        ],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        cwd=directory,
-    )
-
-    return run_askalono(tmp_dir)
+    return run_askalono(target)
 
 
 def get_pipenv_analyze_dict(directory: str) -> Dict:
@@ -63,8 +221,8 @@ def get_pipenv_analyze_dict(directory: str) -> Dict:
 
     data_dict: Dict[str, List[Dict[str, str]]] = {}
 
-    with tempfile.TemporaryDirectory() as dirpath:
-        license_data = get_analyze_pipenv_data(directory, dirpath)
+    with get_install_target(directory) as target:
+        license_data = get_analyze_pipenv_data(target)
         for item in license_data:
             *path, folder_name, license_name = item.get("path").split("/")
             dep_id, *rest = folder_name.split(SUFFIX)
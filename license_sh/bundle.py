@@ -0,0 +1,191 @@
+import gzip
+import json
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from anytree import PreOrderIter
+
+from license_sh.cache import LicenseCache
+from license_sh.resolvers import LOCKFILE
+from license_sh.types.nodes import PackageInfo
+
+BUNDLE_FORMAT = "license-sh-bundle"
+BUNDLE_VERSION = 1
+
+LICENSE = "license"
+INDEX = "index"
+TEXT = "text"
+METADATA = "metadata"
+NOT_FOUND = "not_found"
+
+
+class BundleStats(NamedTuple):
+    licenses: int
+    indexes: int
+    texts: int
+    metadata: int = 0
+    not_found: int = 0
+
+
+def get_tree_licenses(dep_tree) -> Dict[PackageInfo, Optional[str]]:
+    """Get licenses a check of the tree looked up, the lockfile is at hand offline too
+
+    Args:
+        dep_tree (PackageNode): Checked dependency tree
+
+    Returns:
+        Dict[PackageInfo, Optional[str]]: License of each looked up package, None if it has no license
+    """
+    return {
+        PackageInfo(node.name, node.version): node.license
+        for node in PreOrderIter(dep_tree)
+        if getattr(node, "license_source", None) not in (None, LOCKFILE)
+    }
+
+
+def get_tree_unresolved(dep_tree) -> Set[PackageInfo]:
+    """Get packages of the tree a check resolved no license of, the registry may not know them
+
+    Args:
+        dep_tree (PackageNode): Checked dependency tree
+
+    Returns:
+        Set[PackageInfo]: Packages without a license
+    """
+    return {
+        PackageInfo(node.name, node.version)
+        for node in PreOrderIter(dep_tree)
+        if getattr(node, "license", None) is None and getattr(node, "license_source", None) != LOCKFILE
+    }
+
+
+def get_bundle_records(
+    cache: LicenseCache,
+    licenses: Dict[str, Dict[PackageInfo, Optional[str]]],
+    text_urls: Iterable[str],
+    unresolved: Optional[Dict[Tuple[str, str], Set[PackageInfo]]] = None,
+) -> Iterator[Dict]:
+    for ecosystem, packages in licenses.items():
+        for package, license in packages.items():
+            yield {"type": LICENSE, "ecosystem": ecosystem, "name": package.name, "version": package.version,
+                   "license": license}
+        indexes = cache.get_version_indexes(ecosystem, {package.name for package in packages})
+        for name, (index, modified) in indexes.items():
+            yield {"type": INDEX, "ecosystem": ecosystem, "name": name, "modified": modified, "licenses": index}
+        for package, (license, requires) in cache.get_metadata(ecosystem, packages).items():
+            yield {"type": METADATA, "ecosystem": ecosystem, "name": package.name, "version": package.version,
+                   "license": license, "requires": requires}
+    for (ecosystem, registry), unresolved_packages in (unresolved or {}).items():
+        for package, reason in cache.get_not_found(ecosystem, registry, unresolved_packages).items():
+            yield {"type": NOT_FOUND, "ecosystem": ecosystem, "registry": registry, "name": package.name,
+                   "version": package.version, "reason": reason}
+    for url, text in cache.get_texts(text_urls).items():
+        yield {"type": TEXT, "url": url, "text": text}
+
+
+def export_bundle(
+    path: str,
+    cache: LicenseCache,
+    licenses: Dict[str, Dict[PackageInfo, Optional[str]]],
+    text_urls: Iterable[str] = (),
+    unresolved: Optional[Dict[Tuple[str, str], Set[PackageInfo]]] = None,
+) -> BundleStats:
+    """Write cache entries needed to check projects into a gzipped NDJSON bundle
+
+    The first line is the header, every other line one record: a license of a package,
+    the version index of a package name (a packument projected down to licenses), a license text,
+    core metadata of a package (license and requirements, Python dependency graphs are built from it)
+    or a package a registry doesn't know, so an offline check doesn't miss it.
+
+    Args:
+        path (str): Path of the bundle
+        cache (LicenseCache): Cache with the version indexes and license texts
+        licenses (Dict[str, Dict[PackageInfo, Optional[str]]]): Licenses to export keyed by ecosystem
+        text_urls (Iterable[str], optional): Urls of license texts to export
+        unresolved (Dict[Tuple[str, str], Set[PackageInfo]], optional): Packages without a license keyed
+            by ecosystem and registry, the ones the registry didn't know are exported
+
+    Returns:
+        BundleStats: Counts of exported records
+    """
+    counts = {LICENSE: 0, INDEX: 0, TEXT: 0, METADATA: 0, NOT_FOUND: 0}
+    with gzip.open(path, "wt", encoding="utf-8") as file:
+        file.write(json.dumps({"format": BUNDLE_FORMAT, "version": BUNDLE_VERSION}) + "\n")
+        for record in get_bundle_records(cache, licenses, text_urls, unresolved):
+            file.write(json.dumps(record, separators=(",", ":")) + "\n")
+            counts[record["type"]] += 1
+    return BundleStats(counts[LICENSE], counts[INDEX], counts[TEXT], counts[METADATA], counts[NOT_FOUND])
+
+
+def read_bundle(path: str) -> Iterator[Dict]:
+    """Read records of a bundle
+
+    Raises:
+        ValueError: The file isn't a bundle of a supported version
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        try:
+            header = json.loads(file.readline())
+        except (OSError, ValueError):
+            raise ValueError("Not a license-sh bundle")
+        if not isinstance(header, dict) or header.get("format") != BUNDLE_FORMAT:
+            raise ValueError("Not a license-sh bundle")
+        if header.get("version") != BUNDLE_VERSION:
+            raise ValueError(f"Unsupported bundle version {header.get('version')}")
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def import_bundle(path: str, cache: LicenseCache) -> BundleStats:
+    """Store records of a bundle in the cache
+
+    Args:
+        path (str): Path of the bundle
+        cache (LicenseCache): Cache to import to
+
+    Returns:
+        BundleStats: Counts of imported records
+
+    Raises:
+        ValueError: The file isn't a valid bundle
+    """
+    licenses: Dict[str, Dict[PackageInfo, Optional[str]]] = {}
+    texts: Dict[str, str] = {}
+    metadata: Dict[str, Dict[PackageInfo, Tuple[Optional[str], List[str]]]] = {}
+    not_found: Dict[Tuple[str, str], Dict[PackageInfo, str]] = {}
+    indexes = 0
+    for record in read_bundle(path):
+        kind = record.get("type")
+        if kind == LICENSE:
+            licenses.setdefault(record["ecosystem"], {})[PackageInfo(record["name"], record["version"])] = record[
+                "license"
+            ]
+        elif kind == INDEX:
+            cache.set_version_index(record["ecosystem"], record["name"], record["licenses"], record.get("modified"))
+            indexes += 1
+        elif kind == TEXT:
+            texts[record["url"]] = record["text"]
+        elif kind == METADATA:
+            metadata.setdefault(record["ecosystem"], {})[PackageInfo(record["name"], record["version"])] = (
+                record["license"],
+                record["requires"],
+            )
+        elif kind == NOT_FOUND:
+            not_found.setdefault((record["ecosystem"], record["registry"]), {})[
+                PackageInfo(record["name"], record["version"])
+            ] = record["reason"]
+
+    for ecosystem, packages in licenses.items():
+        cache.set_many(ecosystem, packages)
+    for ecosystem, entries in metadata.items():
+        cache.set_metadata(ecosystem, entries)
+    for (ecosystem, registry), reasons in not_found.items():
+        cache.set_not_found(ecosystem, registry, reasons)
+    cache.set_texts(texts)
+    return BundleStats(
+        sum(len(packages) for packages in licenses.values()),
+        indexes,
+        len(texts),
+        sum(len(entries) for entries in metadata.values()),
+        sum(len(reasons) for reasons in not_found.values()),
+    )
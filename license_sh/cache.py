@@ -0,0 +1,815 @@
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from license_sh.fetcher import PRIVATE_PACKAGE, FetchStats, Validators, split_config_packages, split_private
+from license_sh.types.nodes import PackageInfo
+
+CACHE_DIR_ENV = "LICENSE_SH_CACHE_DIR"
+CACHE_MAX_SIZE_ENV = "LICENSE_SH_CACHE_MAX_SIZE"
+NO_CACHE_ENV = "LICENSE_SH_NO_CACHE"
+NOT_FOUND_TTL_ENV = "LICENSE_SH_NOT_FOUND_TTL"
+REVALIDATE_AFTER_ENV = "LICENSE_SH_REVALIDATE_AFTER"
+CACHE_FILE_NAME = "cache.sqlite3"
+
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024  # 64 MB
+UNRESOLVED_TTL = 24 * 60 * 60  # a day
+NOT_FOUND_TTL = 60 * 60  # an hour, the package might get published
+REVALIDATE_AFTER = 24 * 60 * 60  # a day, license texts behind urls may change
+ROW_OVERHEAD = 64  # rough per-row cost used for size accounting
+EVICTION_RATIO = 0.9  # evict down to 90% of the max size
+
+NPM = "npm"
+PYPI = "pypi"
+MAVEN = "maven"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS licenses (
+    key TEXT PRIMARY KEY,
+    ecosystem TEXT NOT NULL,
+    name TEXT NOT NULL,
+    version TEXT NOT NULL,
+    integrity TEXT,
+    license TEXT,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS licenses_accessed_at ON licenses (accessed_at);
+CREATE TABLE IF NOT EXISTS packuments (
+    key TEXT PRIMARY KEY,
+    ecosystem TEXT NOT NULL,
+    name TEXT NOT NULL,
+    modified TEXT,
+    licenses TEXT NOT NULL,
+    license TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS packuments_accessed_at ON packuments (accessed_at);
+CREATE TABLE IF NOT EXISTS not_found (
+    key TEXT PRIMARY KEY,
+    ecosystem TEXT NOT NULL,
+    registry TEXT,
+    name TEXT NOT NULL,
+    version TEXT NOT NULL,
+    reason TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS texts (
+    key TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    created_at REAL NOT NULL,
+    checked_at REAL,
+    accessed_at REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS texts_accessed_at ON texts (accessed_at);
+CREATE TABLE IF NOT EXISTS metadata (
+    key TEXT PRIMARY KEY,
+    ecosystem TEXT NOT NULL,
+    name TEXT NOT NULL,
+    version TEXT NOT NULL,
+    license TEXT,
+    requires TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS metadata_accessed_at ON metadata (accessed_at);
+CREATE TABLE IF NOT EXISTS stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO stats (name, value) VALUES ('hits', 0), ('misses', 0), ('index_hits', 0);
+"""
+
+# columns added to tables of existing caches when they are opened
+ADDED_COLUMNS = {
+    "packuments": {"license": "TEXT", "etag": "TEXT", "last_modified": "TEXT"},
+    "texts": {"etag": "TEXT", "last_modified": "TEXT", "checked_at": "REAL"},
+    "not_found": {"registry": "TEXT"},
+}
+
+
+class CacheStats(NamedTuple):
+    """
+    Summary of the persistent cache state.
+    """
+    path: str
+    entries: int
+    unresolved: int
+    size: int
+    hits: int
+    misses: int
+    indexed_packages: int = 0
+    index_hits: int = 0
+    not_found: int = 0
+    texts: int = 0
+    metadata: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+def get_cache_dir() -> str:
+    """Get directory where the persistent cache lives
+
+    Uses LICENSE_SH_CACHE_DIR, then XDG_CACHE_HOME and falls back to ~/.cache
+
+    Returns:
+        str: Path to the cache directory
+    """
+    cache_dir = os.environ.get(CACHE_DIR_ENV)
+    if cache_dir:
+        return cache_dir
+    xdg_cache = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(xdg_cache, "license-sh")
+
+
+def get_cache_key(ecosystem: str, name: str, version: str) -> str:
+    return f"{ecosystem}:{name}@{version}"
+
+
+def get_not_found_key(ecosystem: str, registry: str, name: str, version: str) -> str:
+    """A package is only known not to be found on one registry, a mirror may have it"""
+    return f"{registry} {get_cache_key(ecosystem, name, version)}"
+
+
+def get_index_key(ecosystem: str, name: str) -> str:
+    return f"{ecosystem}:{name}"
+
+
+def pack_version_index(licenses: Dict[str, Optional[str]]) -> str:
+    """Serialize version -> license index compactly, grouping versions by license
+
+    Args:
+        licenses (Dict[str, Optional[str]]): License of each version
+
+    Returns:
+        str: JSON list of [license, [versions]] pairs
+    """
+    grouped: Dict[Optional[str], List[str]] = {}
+    for version, license in licenses.items():
+        grouped.setdefault(license, []).append(version)
+    return json.dumps([[license, versions] for license, versions in grouped.items()], separators=(",", ":"))
+
+
+def unpack_version_index(data: str) -> Dict[str, Optional[str]]:
+    return {version: license for license, versions in json.loads(data) for version in versions}
+
+
+class LicenseCache:
+    """
+    Persistent license cache keyed by ecosystem + name + version.
+
+    A published version's license never changes, so resolved entries are kept until
+    they are evicted (least recently used first) once the cache grows over max_size.
+    Entries without a license are only trusted for unresolved_ttl seconds and packages
+    the registry doesn't know (negative entries) for the even shorter not_found_ttl.
+
+    Core metadata of pinned releases (license and requirements) is kept like licenses.
+
+    Mutable resources, packuments and license texts, keep their ETag and Last-Modified,
+    so they are revalidated with conditional requests instead of being downloaded again.
+
+    The cache is a SQLite database in WAL mode, so it's safe to share it between
+    parallel jobs on one machine.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_size: int = DEFAULT_MAX_SIZE,
+        unresolved_ttl: float = UNRESOLVED_TTL,
+        not_found_ttl: float = NOT_FOUND_TTL,
+        revalidate_after: float = REVALIDATE_AFTER,
+    ):
+        self.path = path
+        self.max_size = max_size
+        self.unresolved_ttl = unresolved_ttl
+        self.not_found_ttl = not_found_ttl
+        self.revalidate_after = revalidate_after
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self._add_columns()
+
+    def _add_columns(self) -> None:
+        for table, columns in ADDED_COLUMNS.items():
+            existing = {row[1] for row in self.connection.execute(f"PRAGMA table_info({table})")}
+            for column, column_type in columns.items():
+                if column not in existing:
+                    self.connection.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+    def close(self):
+        self.connection.close()
+
+    def get_many(
+        self,
+        ecosystem: str,
+        packages: Iterable[PackageInfo],
+        integrities: Optional[Dict[PackageInfo, str]] = None,
+    ) -> Dict[PackageInfo, Optional[str]]:
+        """Look up licenses of many packages at once
+
+        Args:
+            ecosystem (str): Ecosystem of the packages e.g. npm or pypi
+            packages (Iterable[PackageInfo]): Packages to look up
+            integrities (Dict[PackageInfo, str], optional): Lockfile integrity hashes,
+                an entry stored with a different hash is treated as a miss
+
+        Returns:
+            Dict[PackageInfo, Optional[str]]: Cache hits only, None marks a package
+            known to have no license
+        """
+        integrities = integrities or {}
+        now = time.time()
+        result: Dict[PackageInfo, Optional[str]] = {}
+        keys = {
+            get_cache_key(ecosystem, package.name, package.version): PackageInfo(*package)
+            for package in packages
+        }
+
+        rows = []
+        key_list = list(keys.keys())
+        # stay under SQLite's limit of host parameters
+        for i in range(0, len(key_list), 500):
+            chunk = key_list[i:i + 500]
+            rows += self.connection.execute(
+                "SELECT key, integrity, license, created_at FROM licenses "
+                f"WHERE key IN ({','.join('?' * len(chunk))})",
+                chunk,
+            ).fetchall()
+
+        for key, integrity, license, created_at in rows:
+            package = keys[key]
+            expected_integrity = integrities.get(package)
+            if expected_integrity and integrity and expected_integrity != integrity:
+                continue
+            if license is None and now - created_at > self.unresolved_ttl:
+                continue
+            result[package] = license
+
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            self.connection.executemany(
+                "UPDATE licenses SET accessed_at = ? WHERE key = ?",
+                [
+                    (now, get_cache_key(ecosystem, package.name, package.version))
+                    for package in result
+                ],
+            )
+            self._add_stat("hits", len(result))
+            self._add_stat("misses", len(keys) - len(result))
+
+        return result
+
+    def set_many(
+        self,
+        ecosystem: str,
+        licenses: Dict[PackageInfo, Optional[str]],
+        integrities: Optional[Dict[PackageInfo, str]] = None,
+    ) -> None:
+        """Store licenses of many packages at once
+
+        Args:
+            ecosystem (str): Ecosystem of the packages e.g. npm or pypi
+            licenses (Dict[PackageInfo, Optional[str]]): License for each package,
+                None if the package has no license
+            integrities (Dict[PackageInfo, str], optional): Lockfile integrity hashes
+        """
+        if not licenses:
+            return
+        integrities = integrities or {}
+        now = time.time()
+        rows = []
+        for package, license in licenses.items():
+            key = get_cache_key(ecosystem, package.name, package.version)
+            integrity = integrities.get(package)
+            size = ROW_OVERHEAD + len(key) + len(integrity or "") + len(license or "")
+            rows.append(
+                (key, ecosystem, package.name, package.version, integrity, license, now, now, size)
+            )
+
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO licenses "
+                "(key, ecosystem, name, version, integrity, license, created_at, accessed_at, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._evict()
+
+    def get_version_index(
+        self, ecosystem: str, packages: Iterable[PackageInfo]
+    ) -> Dict[PackageInfo, Optional[str]]:
+        """Answer packages from version -> license indexes extracted from fetched packuments
+
+        Args:
+            ecosystem (str): Ecosystem of the packages
+            packages (Iterable[PackageInfo]): Packages to look up
+
+        Returns:
+            Dict[PackageInfo, Optional[str]]: Packages whose version is in the index of its name
+        """
+        packages = [PackageInfo(*package) for package in packages]
+        keys = list({get_index_key(ecosystem, package.name) for package in packages})
+        indexes: Dict[str, Dict[str, Optional[str]]] = {}
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            for name, licenses in self.connection.execute(
+                f"SELECT name, licenses FROM packuments WHERE key IN ({','.join('?' * len(chunk))})",
+                chunk,
+            ):
+                indexes[name] = unpack_version_index(licenses)
+
+        result = {
+            package: indexes[package.name][package.version]
+            for package in packages
+            if package.version in indexes.get(package.name, {})
+        }
+        if result:
+            now = time.time()
+            with self.connection:
+                self.connection.execute("BEGIN IMMEDIATE")
+                self.connection.executemany(
+                    "UPDATE packuments SET accessed_at = ? WHERE key = ?",
+                    [(now, get_index_key(ecosystem, name)) for name in {package.name for package in result}],
+                )
+                self._add_stat("index_hits", len(result))
+        return result
+
+    def set_version_index(
+        self,
+        ecosystem: str,
+        name: str,
+        licenses: Dict[str, Optional[str]],
+        modified: Optional[str] = None,
+        validators: Optional[Validators] = None,
+        license: Optional[str] = None,
+    ) -> None:
+        """Store version -> license index of a package
+
+        Args:
+            ecosystem (str): Ecosystem of the package
+            name (str): Package name
+            licenses (Dict[str, Optional[str]]): License of every version found in the packument
+            modified (str, optional): Modification time of the packument
+            validators (Validators, optional): ETag and Last-Modified of the packument
+            license (str, optional): Package level license, the license of versions the packument doesn't list
+        """
+        key = get_index_key(ecosystem, name)
+        data = pack_version_index(licenses)
+        validators = validators or Validators()
+        now = time.time()
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            self.connection.execute(
+                "INSERT OR REPLACE INTO packuments "
+                "(key, ecosystem, name, modified, licenses, license, etag, last_modified, created_at, accessed_at, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, ecosystem, name, modified, data, license, validators.etag, validators.last_modified, now, now,
+                 ROW_OVERHEAD + len(key) + len(data)),
+            )
+            self._evict()
+
+    def get_packument_validators(
+        self, ecosystem: str, names: Iterable[str]
+    ) -> Dict[str, Tuple[Validators, Optional[str]]]:
+        """Get validators of stored packuments, to revalidate them with conditional requests
+
+        Args:
+            ecosystem (str): Ecosystem of the packages
+            names (Iterable[str]): Package names
+
+        Returns:
+            Dict[str, Tuple[Validators, Optional[str]]]: Name as key, validators and package level license as value,
+                for packuments stored with validators only
+        """
+        keys = list({get_index_key(ecosystem, name) for name in names})
+        result = {}
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            for name, license, etag, last_modified in self.connection.execute(
+                "SELECT name, license, etag, last_modified FROM packuments "
+                f"WHERE key IN ({','.join('?' * len(chunk))}) AND (etag IS NOT NULL OR last_modified IS NOT NULL)",
+                chunk,
+            ):
+                result[name] = (Validators(etag, last_modified), license)
+        return result
+
+    def get_version_indexes(
+        self, ecosystem: str, names: Iterable[str]
+    ) -> Dict[str, Tuple[Dict[str, Optional[str]], Optional[str]]]:
+        """Get version -> license indexes of packages, e.g. to export them
+
+        Args:
+            ecosystem (str): Ecosystem of the packages
+            names (Iterable[str]): Package names
+
+        Returns:
+            Dict[str, Tuple[Dict, Optional[str]]]: Name as key, index and packument modification time as value
+        """
+        keys = list({get_index_key(ecosystem, name) for name in names})
+        indexes = {}
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            for name, licenses, modified in self.connection.execute(
+                f"SELECT name, licenses, modified FROM packuments WHERE key IN ({','.join('?' * len(chunk))})",
+                chunk,
+            ):
+                indexes[name] = (unpack_version_index(licenses), modified)
+        return indexes
+
+    def get_texts(self, urls: Iterable[str]) -> Dict[str, str]:
+        """Look up license texts downloaded before
+
+        Args:
+            urls (Iterable[str]): Original urls of the texts
+
+        Returns:
+            Dict[str, str]: Url as key, text as value, for cached texts only
+        """
+        url_list = list(set(urls))
+        result: Dict[str, str] = {}
+        for i in range(0, len(url_list), 500):
+            chunk = url_list[i:i + 500]
+            result.update(
+                self.connection.execute(
+                    f"SELECT key, text FROM texts WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                )
+            )
+        if result:
+            now = time.time()
+            with self.connection:
+                self.connection.execute("BEGIN IMMEDIATE")
+                self.connection.executemany(
+                    "UPDATE texts SET accessed_at = ? WHERE key = ?", [(now, url) for url in result]
+                )
+        return result
+
+    def set_texts(self, texts: Dict[str, str], validators: Optional[Dict[str, Optional[Validators]]] = None) -> None:
+        """Store license texts
+
+        Args:
+            texts (Dict[str, str]): Original url as key, text as value
+            validators (Dict[str, Validators], optional): ETag and Last-Modified of the texts
+        """
+        if not texts:
+            return
+        validators = validators or {}
+        now = time.time()
+        rows = []
+        for url, text in texts.items():
+            etag, last_modified = validators.get(url) or Validators()
+            rows.append((url, text, etag, last_modified, now, now, now, ROW_OVERHEAD + len(url) + len(text)))
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO texts (key, text, etag, last_modified, created_at, checked_at, accessed_at, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._evict()
+
+    def get_stale_texts(self, urls: Iterable[str]) -> Dict[str, Optional[Validators]]:
+        """Get license texts not checked for revalidate_after seconds
+
+        Args:
+            urls (Iterable[str]): Original urls of the texts
+
+        Returns:
+            Dict[str, Optional[Validators]]: Url as key, validators as value, None for texts stored without them
+        """
+        url_list = list(set(urls))
+        result = {}
+        for i in range(0, len(url_list), 500):
+            chunk = url_list[i:i + 500]
+            for url, etag, last_modified in self.connection.execute(
+                "SELECT key, etag, last_modified FROM texts "
+                f"WHERE key IN ({','.join('?' * len(chunk))}) AND COALESCE(checked_at, created_at) < ?",
+                chunk + [time.time() - self.revalidate_after],
+            ):
+                result[url] = Validators(etag, last_modified) if etag or last_modified else None
+        return result
+
+    def refresh_texts(self, urls: Iterable[str]) -> None:
+        """Mark license texts the server reported as not modified as checked now"""
+        now = time.time()
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            self.connection.executemany("UPDATE texts SET checked_at = ? WHERE key = ?", [(now, url) for url in urls])
+
+    def get_metadata(
+        self, ecosystem: str, packages: Iterable[PackageInfo]
+    ) -> Dict[PackageInfo, Tuple[Optional[str], List[str]]]:
+        """Look up core metadata of released packages
+
+        Args:
+            ecosystem (str): Ecosystem of the packages e.g. pypi
+            packages (Iterable[PackageInfo]): Packages to look up
+
+        Returns:
+            Dict[PackageInfo, Tuple[Optional[str], List[str]]]: License and names of the required
+            packages, for cached packages only
+        """
+        keys = {get_cache_key(ecosystem, package.name, package.version): PackageInfo(*package) for package in packages}
+        key_list = list(keys.keys())
+        result: Dict[PackageInfo, Tuple[Optional[str], List[str]]] = {}
+        for i in range(0, len(key_list), 500):
+            chunk = key_list[i:i + 500]
+            for key, license, requires in self.connection.execute(
+                f"SELECT key, license, requires FROM metadata WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            ):
+                result[keys[key]] = (license, json.loads(requires))
+        if result:
+            now = time.time()
+            with self.connection:
+                self.connection.execute("BEGIN IMMEDIATE")
+                self.connection.executemany(
+                    "UPDATE metadata SET accessed_at = ? WHERE key = ?",
+                    [(now, get_cache_key(ecosystem, package.name, package.version)) for package in result],
+                )
+        return result
+
+    def set_metadata(self, ecosystem: str, metadata: Dict[PackageInfo, Tuple[Optional[str], List[str]]]) -> None:
+        """Store core metadata of released packages
+
+        Args:
+            ecosystem (str): Ecosystem of the packages e.g. pypi
+            metadata (Dict[PackageInfo, Tuple[Optional[str], List[str]]]): License and names of the
+                required packages of each package
+        """
+        if not metadata:
+            return
+        now = time.time()
+        rows = []
+        for package, (license, requires) in metadata.items():
+            key = get_cache_key(ecosystem, package.name, package.version)
+            packed = json.dumps(requires, separators=(",", ":"))
+            size = ROW_OVERHEAD + len(key) + len(license or "") + len(packed)
+            rows.append((key, ecosystem, package.name, package.version, license, packed, now, now, size))
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO metadata "
+                "(key, ecosystem, name, version, license, requires, created_at, accessed_at, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._evict()
+
+    def get_not_found(
+        self, ecosystem: str, registry: str, packages: Iterable[PackageInfo]
+    ) -> Dict[PackageInfo, str]:
+        """Look up packages recently not found on the registry
+
+        Args:
+            ecosystem (str): Ecosystem of the packages
+            registry (str): Base url of the registry
+            packages (Iterable[PackageInfo]): Packages to look up
+
+        Returns:
+            Dict[PackageInfo, str]: Reason for each package that is still considered not found
+        """
+        keys = {
+            get_not_found_key(ecosystem, registry, package.name, package.version): PackageInfo(*package)
+            for package in packages
+        }
+        key_list = list(keys.keys())
+        result = {}
+        for i in range(0, len(key_list), 500):
+            chunk = key_list[i:i + 500]
+            for key, reason in self.connection.execute(
+                f"SELECT key, reason FROM not_found WHERE key IN ({','.join('?' * len(chunk))}) AND created_at >= ?",
+                chunk + [time.time() - self.not_found_ttl],
+            ):
+                result[keys[key]] = reason
+        return result
+
+    def set_not_found(self, ecosystem: str, registry: str, reasons: Dict[PackageInfo, str]) -> None:
+        """Remember packages the registry doesn't know
+
+        Args:
+            ecosystem (str): Ecosystem of the packages
+            registry (str): Base url of the registry
+            reasons (Dict[PackageInfo, str]): Why each package couldn't be resolved
+        """
+        if not reasons:
+            return
+        now = time.time()
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO not_found (key, ecosystem, registry, name, version, reason, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (get_not_found_key(ecosystem, registry, package.name, package.version), ecosystem, registry,
+                     package.name, package.version, reason, now)
+                    for package, reason in reasons.items()
+                ],
+            )
+            self._evict()
+
+    def _add_stat(self, name: str, value: int) -> None:
+        if value:
+            self.connection.execute(
+                "UPDATE stats SET value = value + ? WHERE name = ?", (value, name)
+            )
+
+    def _evict(self) -> None:
+        """
+        Drop expired unresolved and negative entries and least recently used entries above max_size.
+        Has to be called inside a write transaction.
+        """
+        self.connection.execute(
+            "DELETE FROM licenses WHERE license IS NULL AND created_at < ?",
+            (time.time() - self.unresolved_ttl,),
+        )
+        self.connection.execute(
+            "DELETE FROM not_found WHERE created_at < ?", (time.time() - self.not_found_ttl,)
+        )
+        size = self._get_size()
+        if size <= self.max_size:
+            return
+
+        to_free = size - int(self.max_size * EVICTION_RATIO)
+        freed = 0
+        evicted: Dict[str, List[Tuple[str]]] = {"licenses": [], "packuments": [], "texts": [], "metadata": []}
+        for table, key, row_size, _ in self.connection.execute(
+            "SELECT 'licenses', key, size, accessed_at FROM licenses "
+            "UNION ALL SELECT 'packuments', key, size, accessed_at FROM packuments "
+            "UNION ALL SELECT 'texts', key, size, accessed_at FROM texts "
+            "UNION ALL SELECT 'metadata', key, size, accessed_at FROM metadata "
+            "ORDER BY accessed_at"
+        ).fetchall():
+            if freed >= to_free:
+                break
+            evicted[table].append((key,))
+            freed += row_size
+        for table, keys in evicted.items():
+            self.connection.executemany(f"DELETE FROM {table} WHERE key = ?", keys)
+
+    def _get_size(self) -> int:
+        (size,) = self.connection.execute(
+            "SELECT (SELECT COALESCE(SUM(size), 0) FROM licenses) + (SELECT COALESCE(SUM(size), 0) FROM packuments)"
+            " + (SELECT COALESCE(SUM(size), 0) FROM texts) + (SELECT COALESCE(SUM(size), 0) FROM metadata)"
+        ).fetchone()
+        return size
+
+    def stats(self) -> CacheStats:
+        entries, unresolved = self.connection.execute(
+            "SELECT COUNT(*), COUNT(*) - COUNT(license) FROM licenses"
+        ).fetchone()
+        (indexed_packages,) = self.connection.execute("SELECT COUNT(*) FROM packuments").fetchone()
+        (texts,) = self.connection.execute("SELECT COUNT(*) FROM texts").fetchone()
+        (metadata,) = self.connection.execute("SELECT COUNT(*) FROM metadata").fetchone()
+        (not_found,) = self.connection.execute(
+            "SELECT COUNT(*) FROM not_found WHERE created_at >= ?", (time.time() - self.not_found_ttl,)
+        ).fetchone()
+        counters = dict(self.connection.execute("SELECT name, value FROM stats"))
+        return CacheStats(
+            path=self.path,
+            entries=entries,
+            unresolved=unresolved,
+            size=self._get_size(),
+            hits=counters.get("hits", 0),
+            misses=counters.get("misses", 0),
+            indexed_packages=indexed_packages,
+            index_hits=counters.get("index_hits", 0),
+            not_found=not_found,
+            texts=texts,
+            metadata=metadata,
+        )
+
+    def clear(self) -> None:
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            self.connection.execute("DELETE FROM licenses")
+            self.connection.execute("DELETE FROM packuments")
+            self.connection.execute("DELETE FROM not_found")
+            self.connection.execute("DELETE FROM texts")
+            self.connection.execute("DELETE FROM metadata")
+            self.connection.execute("UPDATE stats SET value = 0")
+        self.connection.execute("VACUUM")
+
+
+_cache: Optional[LicenseCache] = None
+
+
+def get_cache() -> Optional[LicenseCache]:
+    """Get the shared persistent cache
+
+    Returns:
+        Optional[LicenseCache]: The cache or None if disabled with LICENSE_SH_NO_CACHE
+    """
+    global _cache
+    if os.environ.get(NO_CACHE_ENV):
+        return None
+    if _cache is None:
+        max_size = int(os.environ.get(CACHE_MAX_SIZE_ENV, DEFAULT_MAX_SIZE))
+        not_found_ttl = float(os.environ.get(NOT_FOUND_TTL_ENV, NOT_FOUND_TTL))
+        revalidate_after = float(os.environ.get(REVALIDATE_AFTER_ENV, REVALIDATE_AFTER))
+        _cache = LicenseCache(
+            os.path.join(get_cache_dir(), CACHE_FILE_NAME),
+            max_size=max_size,
+            not_found_ttl=not_found_ttl,
+            revalidate_after=revalidate_after,
+        )
+    return _cache
+
+
+def split_cached(
+    cache: Optional[LicenseCache],
+    ecosystem: str,
+    packages: Iterable[Tuple[str, str]],
+    integrities: Optional[Dict[PackageInfo, str]] = None,
+) -> Tuple[Dict[PackageInfo, Optional[str]], List[PackageInfo]]:
+    """Split packages into the ones answered by cache and the ones that need to be fetched
+
+    Args:
+        cache (Optional[LicenseCache]): Cache to use, None to skip the cache
+        ecosystem (str): Ecosystem of the packages
+        packages (Iterable[Tuple[str, str]]): (name, version) pairs to look up
+        integrities (Dict[PackageInfo, str], optional): Lockfile integrity hashes
+
+    Returns:
+        Tuple[Dict, List]: Cached licenses and list of packages missing in the cache
+    """
+    package_list = [PackageInfo(*package) for package in packages]
+    if cache is None:
+        return {}, package_list
+    cached = cache.get_many(ecosystem, package_list, integrities)
+    return cached, [package for package in package_list if package not in cached]
+
+
+def split_not_found(
+    cache: Optional[LicenseCache], ecosystem: str, registry: str, packages: List[PackageInfo]
+) -> Tuple[Dict[PackageInfo, str], List[PackageInfo]]:
+    """Split packages recently not found on the registry from the ones to fetch
+
+    Args:
+        cache (Optional[LicenseCache]): Cache to use, None to skip the cache
+        ecosystem (str): Ecosystem of the packages
+        registry (str): Base url of the registry the packages would be fetched from
+        packages (List[PackageInfo]): Packages to look up
+
+    Returns:
+        Tuple[Dict, List]: Reasons of packages known not to be found and list of packages to fetch
+    """
+    if cache is None or not packages:
+        return {}, packages
+    not_found = cache.get_not_found(ecosystem, registry, packages)
+    return not_found, [package for package in packages if package not in not_found]
+
+
+def skip_lookups(
+    cache: Optional[LicenseCache],
+    ecosystem: str,
+    registry: str,
+    packages: List[PackageInfo],
+    private_packages: Optional[List[str]],
+    stats: FetchStats,
+    config_packages: Optional[Set[str]] = None,
+) -> List[PackageInfo]:
+    """Drop packages the config ignores or overrides, private packages and packages recently
+    not found, recording why they aren't fetched
+
+    Args:
+        cache (Optional[LicenseCache]): Cache to use, None to skip the negative cache
+        ecosystem (str): Ecosystem of the packages
+        registry (str): Base url of the registry the packages would be fetched from
+        packages (List[PackageInfo]): Packages to fetch
+        private_packages (List[str], optional): Name patterns of packages never looked up remotely
+        stats (FetchStats): Collects the reasons
+        config_packages (Set[str], optional): Keys of ignored and overridden packages
+
+    Returns:
+        List[PackageInfo]: Packages that should be fetched
+    """
+    from_config, packages = split_config_packages(packages, config_packages)
+    stats.from_config.update(from_config)
+    private, packages = split_private(packages, private_packages)
+    for package in private:
+        stats.add_unresolved(package, PRIVATE_PACKAGE)
+    not_found, packages = split_not_found(cache, ecosystem, registry, packages)
+    for package, reason in not_found.items():
+        stats.add_unresolved(package, reason)
+    return packages
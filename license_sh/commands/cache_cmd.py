@@ -0,0 +1,146 @@
+import shutil
+import tempfile
+from typing import Dict, List, Optional, Set, Tuple
+
+from license_sh.analyze.maven import fetch_maven_licenses, get_licenses_xml, parse_licenses_xml
+from license_sh.analyze.pipenv import get_targets_dir
+from license_sh.bundle import BundleStats, export_bundle, get_tree_licenses, get_tree_unresolved, import_bundle
+from license_sh.cache import MAVEN, NPM, PYPI, LicenseCache, get_cache
+from license_sh.config import get_config
+from license_sh.project_identifier import ProjectType, get_project_types
+from license_sh.registries import get_registry
+from license_sh.remote_cache_server import serve_remote_cache
+from license_sh.runners import run_check
+from license_sh.types.nodes import PackageInfo
+
+ECOSYSTEMS = {
+    ProjectType.NPM: NPM,
+    ProjectType.YARN: NPM,
+    ProjectType.PYTHON_PIPENV: PYPI,
+    ProjectType.MAVEN: MAVEN,
+}
+
+
+def format_size(size: int) -> str:
+    for unit in ["B", "KB", "MB"]:
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024  # type: ignore
+    return f"{size:.1f} GB"
+
+
+def print_cache_stats(cache: LicenseCache):
+    stats = cache.stats()
+    print(f"📦 Cache location: {stats.path}")
+    print(f"Entries: {stats.entries} ({stats.unresolved} without license)")
+    print(f"Size: {format_size(stats.size)} of {format_size(cache.max_size)}")
+    print(f"Version indexes: {stats.indexed_packages} packages")
+    print(f"Not found on registries: {stats.not_found} packages")
+    print(f"License texts: {stats.texts}")
+    print(f"Package metadata: {stats.metadata} releases")
+    print(
+        f"Hits: {stats.hits}, misses: {stats.misses}, hit rate: {stats.hit_rate:.1%}, "
+        f"answered from version indexes: {stats.index_hits}"
+    )
+
+
+def get_maven_text_urls(path: str, registries: Dict[str, str]) -> Set[str]:
+    """Get urls of license texts of a maven project, downloading the ones missing in the cache"""
+    dep_data = parse_licenses_xml(get_licenses_xml(path))
+    with tempfile.TemporaryDirectory() as license_dir:
+        fetch_maven_licenses(dep_data, license_dir, registry=get_registry(MAVEN, registries))
+    return {url for urls in dep_data.values() for url in urls}
+
+
+def get_project_config(path, project_type):
+    _, ignored_packages_map, overridden_packages_map, private_packages_map, registries = get_config(path)
+    config_packages = set(ignored_packages_map.get(project_type.value, [])) | set(
+        overridden_packages_map.get(project_type.value, {}).keys()
+    )
+    return private_packages_map.get(project_type.value, []), config_packages, registries
+
+
+def collect_project_entries(
+    path: str,
+    licenses: Dict[str, Dict[PackageInfo, Optional[str]]],
+    text_urls: Set[str],
+    unresolved: Dict[Tuple[str, str], Set[PackageInfo]],
+) -> List[ProjectType]:
+    """Check every project found in path, collecting licenses, license text urls and unresolved packages it needs"""
+    project_types = get_project_types(path)
+    for project_type in project_types:
+        private_packages, config_packages, registries = get_project_config(path, project_type)
+        dep_tree = run_check(project_type, path, True, False, private_packages, config_packages, None, registries)
+        ecosystem = ECOSYSTEMS[project_type]
+        licenses.setdefault(ecosystem, {}).update(get_tree_licenses(dep_tree))
+        unresolved.setdefault((ecosystem, get_registry(ecosystem, registries) or ""), set()).update(
+            get_tree_unresolved(dep_tree)
+        )
+        if project_type == ProjectType.MAVEN:
+            text_urls.update(get_maven_text_urls(path, registries))
+    return project_types
+
+
+def print_bundle_stats(action: str, stats: BundleStats):
+    print(
+        f"{action} {stats.licenses} licenses, {stats.indexes} version indexes, {stats.texts} license texts, "
+        f"metadata of {stats.metadata} packages and {stats.not_found} packages not found on registries"
+    )
+
+
+def export_cmd(cache: LicenseCache, bundle: str, paths: List[str]) -> int:
+    licenses: Dict[str, Dict[PackageInfo, Optional[str]]] = {}
+    text_urls: Set[str] = set()
+    unresolved: Dict[Tuple[str, str], Set[PackageInfo]] = {}
+    for path in paths:
+        if not collect_project_entries(path, licenses, text_urls, unresolved):
+            print(f"None of currently supported projects found in '{path}'")
+            return 2
+    print_bundle_stats("Exported", export_bundle(bundle, cache, licenses, text_urls, unresolved))
+    return 0
+
+
+def import_cmd(cache: LicenseCache, bundle: str) -> int:
+    try:
+        print_bundle_stats("Imported", import_bundle(bundle, cache))
+    except (OSError, ValueError, KeyError) as error:
+        print(f"Couldn't import {bundle}: {error}")
+        return 1
+    return 0
+
+
+def serve_cmd(arguments) -> int:
+    try:
+        port = int(arguments["--port"])
+    except ValueError:
+        print("Port has to be a number")
+        return 2
+    try:
+        serve_remote_cache(arguments["<store>"], arguments["--host"], port)
+    except ValueError as error:
+        print(error)
+        return 2
+    return 0
+
+
+def cache_cmd(arguments) -> int:
+    if arguments["serve"]:
+        return serve_cmd(arguments)
+
+    cache = get_cache()
+    if cache is None:
+        print("Cache is disabled")
+        return 1
+
+    if arguments["stats"]:
+        print_cache_stats(cache)
+    elif arguments["clear"]:
+        cache.clear()
+        shutil.rmtree(get_targets_dir() or "", ignore_errors=True)
+        print("Cache cleared")
+    elif arguments["export"]:
+        return export_cmd(cache, arguments["<bundle>"], arguments["--for"])
+    elif arguments["import"]:
+        return import_cmd(cache, arguments["<bundle>"])
+
+    return 0
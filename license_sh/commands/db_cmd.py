@@ -0,0 +1,31 @@
+import time
+
+from license_sh.license_db import LicenseDatabase, get_license_db_path
+
+
+def print_db_stats(license_db: LicenseDatabase):
+    stats = license_db.stats()
+    print(f"📦 License database: {stats.path}")
+    print(f"Entries: {stats.entries}")
+    if stats.imported_at is not None:
+        print(f"Imported from {stats.source} at {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(stats.imported_at))}")
+    print(f"Updates applied: {stats.updates}")
+
+
+def db_cmd(arguments) -> int:
+    license_db = LicenseDatabase(get_license_db_path())
+    try:
+        if arguments["import"]:
+            count = license_db.import_snapshot(arguments["<file>"])
+            print(f"Imported {count} licenses")
+        elif arguments["update"]:
+            upserted, deleted = license_db.apply_update(arguments["<file>"])
+            print(f"Updated {upserted} licenses, deleted {deleted}")
+        print_db_stats(license_db)
+    except (OSError, ValueError) as error:
+        print(f"Couldn't load {arguments['<file>']}: {error}")
+        return 1
+    finally:
+        license_db.close()
+
+    return 0
@@ -1,3 +1,4 @@
+import os
 import sys
 from typing import List
 
@@ -6,7 +7,12 @@ import questionary
 from license_sh.version import __version__
 from license_sh.analyze import run_analyze
 from . import config_cmd
+from .cache_cmd import cache_cmd
+from .db_cmd import db_cmd
+from .serve_fixtures_cmd import serve_fixtures_cmd
 from ..config import get_config, get_raw_config, whitelist_licenses, ignore_packages
+from ..fail_fast import FailFast, LicenseViolation
+from ..fetcher import OFFLINE_ENV, OfflineError
 from ..helpers import (
     get_dependency_tree_with_licenses,
     get_problematic_packages_from_analyzed_tree,
@@ -28,6 +34,10 @@ def run_license_sh(arguments):
     project_type = arguments["--project"]
     debug = arguments["--debug"]
     interactive = bool(arguments["--interactive"])
+    fail_fast = arguments["--fail-fast"]
+
+    if arguments["--offline"]:
+        os.environ[OFFLINE_ENV] = "1"
 
     path_to_config: str = config_path if config_path else path
 
@@ -38,8 +48,19 @@ def run_license_sh(arguments):
     if config_mode:
         exit(config_cmd(path, get_raw_config(path_to_config)))
 
+    if arguments["cache"]:
+        exit(cache_cmd(arguments))
+
+    if arguments["db"]:
+        exit(db_cmd(arguments))
+
+    if arguments["serve-fixtures"]:
+        exit(serve_fixtures_cmd(arguments))
+
     silent = output == "json" or debug
-    whitelist, ignored_packages_map, overridden_packages_map = get_config(path_to_config)
+    whitelist, ignored_packages_map, overridden_packages_map, private_packages_map, registries = get_config(
+        path_to_config
+    )
 
     # docopt guarantees that output variable contains either console or json
     Reporter = {"console": ConsoleReporter, "json": JSONConsoleReporter}[output]
@@ -79,21 +100,36 @@ def run_license_sh(arguments):
             file=sys.stderr,
         )
 
-    dep_tree: PackageNode = run_check(project_to_check, path, silent, debug)
-
-    dep_tree.data_version = __version__
-    dep_tree.project = project_to_check.value
-
     ignored_packages = ignored_packages_map.get(project_to_check.value, [])
     overridden_packages = overridden_packages_map.get(project_to_check.value, {})
 
-    if analyze:
-        analyzed_tree = run_analyze(project_to_check, path, dep_tree)
-        if not analyzed_tree:
+    # the license of ignored and overridden packages is decided by the config, it's never fetched
+    try:
+        dep_tree: PackageNode = run_check(
+            project_to_check,
+            path,
+            silent,
+            debug,
+            private_packages_map.get(project_to_check.value, []),
+            set(ignored_packages) | set(overridden_packages.keys()),
+            FailFast(whitelist, ignored_packages, overridden_packages) if fail_fast else None,
+            registries,
+        )
+        dep_tree.data_version = __version__
+        dep_tree.project = project_to_check.value
+
+        if analyze and not run_analyze(project_to_check, path, dep_tree, registries):
             print(
                 f"Analyze not suported for '{project_to_check}' project",
                 file=sys.stderr,
             )
+    except LicenseViolation as violation:
+        print(f"❌ {violation.path} is licensed under {violation.license or 'an unknown license'}", file=sys.stderr)
+        exit(1)
+    except OfflineError as error:
+        print(f"❌ Offline: {error}. Import them with `license-sh cache import <bundle>`, a bundle is written by "
+              "`license-sh cache export <bundle> --for <dir>` on a machine with network access", file=sys.stderr)
+        exit(4)
 
     if not dep_tree:
         print("Unexpected issue, couldn't create dependency tree", file=sys.stderr)
@@ -0,0 +1,14 @@
+from license_sh.fixtures_server import serve_fixtures
+
+
+def serve_fixtures_cmd(arguments) -> int:
+    try:
+        port = int(arguments["--port"])
+        latency = float(arguments["--latency"])
+        error_rate = float(arguments["--error-rate"])
+    except ValueError:
+        print("Port, latency and error rate have to be numbers")
+        return 2
+
+    serve_fixtures(arguments["<fixtures>"], port=port, latency=latency, error_rate=error_rate)
+    return 0
@@ -10,6 +10,8 @@ DEFAULT_CONFIG_NAME = ".license-sh.json"
 IGNORED_PACKAGES = "ignored_packages"
 OVERRIDDEN_LICENSE = "overridden_packages"
 WHITELIST = "whitelist"
+PRIVATE_PACKAGES = "private_packages"
+REGISTRIES = "registries"
 
 
 def get_config_path(path_to_config: str) -> str:
@@ -36,7 +38,9 @@ def get_config(path_to_config: str) -> ConfigurationType:
     return (
         raw_config.get(WHITELIST, []),
         raw_config.get(IGNORED_PACKAGES, {}),
-        raw_config.get(OVERRIDDEN_LICENSE, {})
+        raw_config.get(OVERRIDDEN_LICENSE, {}),
+        raw_config.get(PRIVATE_PACKAGES, {}),
+        raw_config.get(REGISTRIES, {}),
     )
 
 
@@ -0,0 +1,88 @@
+from typing import Dict, List, Optional
+
+from anytree import LevelOrderIter
+
+from license_sh.helpers import is_license_ok, normalize_license_expression
+from license_sh.types.configuration import LanguageOverrides
+from license_sh.types.nodes import PackageInfo, PackageNode
+
+
+class LicenseViolation(Exception):
+    """
+    Raised in fail-fast mode by the first package whose license isn't whitelisted.
+    """
+
+    def __init__(self, package: PackageInfo, license: Optional[str], path: str):
+        super().__init__(f"{path} - {license or 'Unknown'}")
+        self.package = package
+        self.license = license
+        self.path = path
+
+
+class FailFast:
+    """
+    Checks licenses against the whitelist as soon as they are known and raises
+    LicenseViolation on the first package that isn't compliant, which stops all
+    outstanding fetches.
+
+    Usage:
+        fail_fast = FailFast(whitelist, ignored_packages, overridden_packages)
+        fail_fast.watch(dep_tree)
+        fetch_npm_licenses(packages, options=LookupOptions(on_license=fail_fast.check))
+    """
+
+    def __init__(
+        self,
+        whitelist: List[str],
+        ignored_packages: Optional[List[str]] = None,
+        overridden_packages: Optional[LanguageOverrides] = None,
+    ):
+        """
+        :param whitelist: whitelisted licenses
+        :param ignored_packages: "{name}" or "{name}=={version}" of packages never reported
+        :param overridden_packages: licenses of packages decided by the config
+        """
+        self.whitelist = whitelist
+        self.ignored_packages = set(ignored_packages or [])
+        self.overridden_packages = overridden_packages or {}
+        self.paths: Dict[PackageInfo, str] = {}
+
+    def watch(self, tree: PackageNode) -> None:
+        """Remember the shortest path to each package of the tree and check the licenses
+        already known, e.g. read from a lockfile or overridden by the config, direct
+        dependencies first
+
+        Raises:
+            LicenseViolation: When a known license isn't whitelisted
+        """
+        nodes = [node for node in LevelOrderIter(tree) if node is not tree]
+        for node in nodes:
+            package = PackageInfo(node.name, node.version)
+            if package not in self.paths:
+                self.paths[package] = " > ".join(f"{item.name}@{item.version}" for item in node.path[1:])
+        for node in nodes:
+            package = PackageInfo(node.name, node.version)
+            license = getattr(node, "license", None)
+            if license or self.get_override(package):
+                self.check(package, license)
+
+    def get_override(self, package: PackageInfo) -> Optional[str]:
+        override = (
+            self.overridden_packages.get(f"{package.name}=={package.version}")
+            or self.overridden_packages.get(package.name)
+        )
+        return override.get("license") if override else None
+
+    def check(self, package: PackageInfo, license: Optional[str]) -> None:
+        """Check a license of a single package
+
+        Raises:
+            LicenseViolation: When the license isn't whitelisted
+        """
+        package = PackageInfo(*package)
+        if package.name in self.ignored_packages or f"{package.name}=={package.version}" in self.ignored_packages:
+            return
+        license = self.get_override(package) or license
+        if is_license_ok(normalize_license_expression(license), self.whitelist):
+            return
+        raise LicenseViolation(package, license, self.paths.get(package, f"{package.name}@{package.version}"))
@@ -0,0 +1,834 @@
+import asyncio
+import atexit
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from fnmatch import fnmatchcase
+from typing import (
+    Any, Awaitable, Callable, Coroutine, Deque, Dict, Generator, Iterable, List, NamedTuple, Optional, Set, Tuple,
+    TypeVar,
+)
+from urllib.parse import urlsplit
+
+import aiohttp
+from anytree import PreOrderIter
+
+from license_sh.types.nodes import PackageInfo
+
+CONNECTIONS_PER_HOST_ENV = "LICENSE_SH_CONNECTIONS_PER_HOST"
+INITIAL_CONNECTIONS_ENV = "LICENSE_SH_INITIAL_CONNECTIONS"
+TIMEOUT_ENV = "LICENSE_SH_TIMEOUT"
+RETRIES_ENV = "LICENSE_SH_RETRIES"
+HEDGE_PERCENTILE_ENV = "LICENSE_SH_HEDGE_PERCENTILE"
+HEDGE_BUDGET_ENV = "LICENSE_SH_HEDGE_BUDGET"
+OFFLINE_ENV = "LICENSE_SH_OFFLINE"
+
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+NOT_MODIFIED = 304
+LATENCY_TOLERANCE = 2.0  # the window stops growing once latency doubles compared to the fastest response
+LATENCY_SLACK = 0.05  # seconds of jitter never considered as congestion
+HEDGE_MIN_SAMPLES = 20  # latencies observed before the percentile is trusted
+LATENCY_SAMPLES = 1000
+DNS_CACHE_TTL = 300  # seconds resolved registry addresses are reused
+KEEPALIVE_TIMEOUT = 30  # seconds an idle connection is kept open for the next lookup
+
+NOT_FOUND = "not found on the registry"
+INVALID_RESPONSE = "invalid registry response"
+PRIVATE_PACKAGE = "private package, not looked up"
+RESOLVED_FROM_CONFIG = "resolved from config"
+
+T = TypeVar("T")
+P = TypeVar("P")
+
+
+class FetchOptions(NamedTuple):
+    """
+    Network settings shared by all registry fetchers.
+    """
+    connections_per_host: int = 64
+    initial_connections: int = 8
+    timeout: float = 30.0
+    retries: int = 3
+    backoff: float = 0.5
+    max_backoff: float = 30.0
+    hedge_percentile: float = 0.0  # 0 disables hedging
+    hedge_budget: float = 0.05  # at most this fraction of requests is duplicated
+
+    @staticmethod
+    def from_env() -> "FetchOptions":
+        """Read fetch options from the environment
+
+        Returns:
+            FetchOptions: Options with environment overrides applied
+        """
+        defaults = FetchOptions()
+        return FetchOptions(
+            connections_per_host=int(
+                os.environ.get(CONNECTIONS_PER_HOST_ENV, defaults.connections_per_host)
+            ),
+            initial_connections=int(
+                os.environ.get(INITIAL_CONNECTIONS_ENV, defaults.initial_connections)
+            ),
+            timeout=float(os.environ.get(TIMEOUT_ENV, defaults.timeout)),
+            retries=int(os.environ.get(RETRIES_ENV, defaults.retries)),
+            hedge_percentile=float(os.environ.get(HEDGE_PERCENTILE_ENV, defaults.hedge_percentile)),
+            hedge_budget=float(os.environ.get(HEDGE_BUDGET_ENV, defaults.hedge_budget)),
+        )
+
+
+class AdaptiveWindow:
+    """
+    AIMD limit of concurrent requests to a single host.
+
+    The window grows by one request per window of healthy responses (additive increase)
+    and is halved on 429, 5xx, timeouts and connection errors (multiplicative decrease),
+    at most once per round trip, so a burst of failures of requests sent together
+    is counted as a single congestion signal. Responses that take much longer than the
+    fastest one seen stop the window from growing, before the registry starts to fail.
+    """
+
+    def __init__(self, host: str, initial: int, maximum: int, debug: bool = False):
+        self.host = host
+        self.maximum = max(1, maximum)
+        self.window = float(min(max(1, initial), self.maximum))
+        self.debug = debug
+        self.in_flight = 0
+        self.min_latency: Optional[float] = None
+        self.latency = 0.0
+        self.last_decrease = 0.0
+        self.increases = 0
+        self.decreases = 0
+        self.condition = asyncio.Condition()
+
+    @property
+    def limit(self) -> int:
+        return int(self.window)
+
+    async def __aenter__(self) -> "AdaptiveWindow":
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+        return self
+
+    async def __aexit__(self, *exc_info):
+        async with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def on_success(self, latency: float) -> None:
+        """Record a healthy response and grow the window if latency stays low
+
+        Args:
+            latency (float): Seconds until the response headers arrived
+        """
+        self.latency = latency if not self.latency else 0.8 * self.latency + 0.2 * latency
+        self.min_latency = latency if self.min_latency is None else min(self.min_latency, latency)
+        if latency > self.min_latency * LATENCY_TOLERANCE + LATENCY_SLACK or self.window >= self.maximum:
+            return
+        previous = self.limit
+        self.window = min(self.window + 1 / self.window, float(self.maximum))
+        if self.limit != previous:
+            self.increases += 1
+            self.log(f"window {previous} -> {self.limit} (latency {latency * 1000:.0f} ms)")
+
+    def on_congestion(self, reason: str) -> None:
+        """Shrink the window after a throttled or failed request
+
+        Args:
+            reason (str): What happened, for debug output
+        """
+        now = time.monotonic()
+        if now - self.last_decrease < self.latency:
+            return  # already reacted to this round trip
+        self.last_decrease = now
+        previous = self.limit
+        self.window = max(self.window / 2, 1.0)
+        self.decreases += 1
+        self.log(f"window {previous} -> {self.limit} ({reason})")
+
+    def log(self, message: str) -> None:
+        if self.debug:
+            print(f"[fetch] {self.host}: {message}", file=sys.stderr)
+
+
+class FetchError(Exception):
+    """
+    Raised when a resource couldn't be fetched, even after retries.
+    """
+
+    def __init__(self, url: str, reason: str, status: Optional[int] = None):
+        super().__init__(f"{url}: {reason}")
+        self.url = url
+        self.reason = reason
+        self.status = status
+
+
+class OfflineError(Exception):
+    """
+    Raised in offline mode when something would have to be fetched.
+    """
+
+    def __init__(self, ecosystem: str, missing: List[str]):
+        listed = ", ".join(missing[:10]) + (", ..." if len(missing) > 10 else "")
+        super().__init__(f"{len(missing)} {ecosystem} entries missing in the cache: {listed}")
+        self.ecosystem = ecosystem
+        self.missing = missing
+
+
+def is_offline() -> bool:
+    return bool(os.environ.get(OFFLINE_ENV))
+
+
+def check_offline(ecosystem: str, missing: Iterable[Tuple[str, str]]) -> None:
+    """Fail in offline mode when some packages are left to be fetched
+
+    Raises:
+        OfflineError: When offline and missing isn't empty
+    """
+    missing = list(missing)
+    if missing and is_offline():
+        raise OfflineError(ecosystem, [f"{name}@{version}" for name, version in missing])
+
+
+class FetchStats:
+    """
+    Counts outcomes of license lookups, so that packages which failed to fetch
+    aren't confused with packages that have no license. Packages that are known
+    not to be resolvable keep the reason, so it can be reported. Resolved packages
+    keep the source which answered them, e.g. the lockfile, the cache or the registry.
+    """
+
+    def __init__(self):
+        self.resolved = 0
+        self.no_license = 0
+        self.failed = 0
+        self.retries = 0
+        self.hedged = 0
+        self.revalidated = 0
+        self.not_modified = 0
+        self.unresolved: Dict[PackageInfo, str] = {}
+        self.from_config: Set[PackageInfo] = set()
+        self.sources: Dict[PackageInfo, str] = {}
+
+    def add_unresolved(self, package: Tuple[str, str], reason: str) -> None:
+        self.unresolved[PackageInfo(*package)] = reason
+
+    def add_source(self, package: Tuple[str, str], source: str) -> None:
+        self.sources[PackageInfo(*package)] = source
+
+    def add_license(self, license: Optional[str]) -> None:
+        if license and license != "UNKNOWN":
+            self.resolved += 1
+        else:
+            self.no_license += 1
+
+    def add_revalidation(self, not_modified: bool) -> None:
+        self.revalidated += 1
+        if not_modified:
+            self.not_modified += 1
+
+    def revalidation_summary(self) -> str:
+        ratio = self.not_modified / self.revalidated if self.revalidated else 0.0
+        return (
+            f"{self.revalidated} cached entries revalidated, {self.not_modified} not modified "
+            f"(revalidation hit ratio {ratio:.1%})"
+        )
+
+    def summary(self) -> str:
+        summary = (
+            f"{self.resolved} licenses fetched, {self.no_license} packages without license, "
+            f"{self.failed} failed to fetch ({self.retries} retries)"
+        )
+        if self.sources:
+            counts = Counter(self.sources.values())
+            summary += ", answered by " + ", ".join(f"{source} {count}" for source, count in counts.items())
+        if self.unresolved:
+            summary += f", {len(self.unresolved)} unresolvable"
+        if self.from_config:
+            summary += f", {len(self.from_config)} resolved from config"
+        if self.hedged:
+            summary += f", {self.hedged} slow requests hedged"
+        return summary
+
+
+def add_unresolved_reasons(dep_tree, stats: FetchStats) -> None:
+    """Mark packages without license with the reason they couldn't be resolved,
+    packages left to the config and the source which answered each package
+
+    Args:
+        dep_tree (PackageNode): Dependency tree
+        stats (FetchStats): Stats of the lookups
+    """
+    for node in PreOrderIter(dep_tree):
+        package = PackageInfo(node.name, node.version)
+        reason = stats.unresolved.get(package)
+        if reason and not node.license:
+            node.license_unresolved_reason = reason
+        if package in stats.from_config and not node.license:
+            node.license_from_config = True
+        if package in stats.sources:
+            node.license_source = stats.sources[package]
+
+
+def add_not_found(
+    stats: FetchStats, not_found: Dict[PackageInfo, str], packages: Iterable[Tuple[str, str]], reason: str
+) -> None:
+    """Record packages the registry couldn't resolve, for the report and the negative cache"""
+    for package in packages:
+        stats.add_unresolved(package, reason)
+        not_found[PackageInfo(*package)] = reason
+
+
+def is_private_package(name: str, patterns: Iterable[str]) -> bool:
+    return any(fnmatchcase(name, pattern) for pattern in patterns)
+
+
+def report_known_licenses(
+    packages: List[PackageInfo],
+    licenses: Dict[PackageInfo, Optional[str]],
+    unresolved: Dict[PackageInfo, str],
+    on_license: Callable[[PackageInfo, Optional[str]], None],
+) -> None:
+    """Pass licenses known before fetching to on_license, in the order of packages"""
+    for package in packages:
+        if package in licenses:
+            on_license(package, licenses[package])
+        elif package in unresolved:
+            on_license(package, None)
+
+
+def is_config_package(package: PackageInfo, config_packages: Set[str]) -> bool:
+    return package.name in config_packages or f"{package.name}=={package.version}" in config_packages
+
+
+def split_config_packages(
+    packages: Iterable[PackageInfo], config_packages: Optional[Set[str]]
+) -> Tuple[List[PackageInfo], List[PackageInfo]]:
+    """Split packages the config ignores or overrides, their license is never looked up
+
+    Args:
+        packages (Iterable[PackageInfo]): Packages to look up
+        config_packages (Set[str], optional): "{name}" or "{name}=={version}" keys of
+            ignored and overridden packages
+
+    Returns:
+        Tuple[List, List]: Packages resolved from config and the rest
+    """
+    from_config: List[PackageInfo] = []
+    rest: List[PackageInfo] = []
+    for package in packages:
+        (from_config if config_packages and is_config_package(package, config_packages) else rest).append(package)
+    return from_config, rest
+
+
+def split_private(
+    packages: Iterable[PackageInfo], patterns: Optional[List[str]]
+) -> Tuple[List[PackageInfo], List[PackageInfo]]:
+    """Split packages matching private name patterns, which are never looked up remotely
+
+    Args:
+        packages (Iterable[PackageInfo]): Packages to look up
+        patterns (List[str], optional): Glob patterns of package names e.g. "@company/*"
+
+    Returns:
+        Tuple[List, List]: Private packages and the rest
+    """
+    private: List[PackageInfo] = []
+    public: List[PackageInfo] = []
+    for package in packages:
+        (private if patterns and is_private_package(package.name, patterns) else public).append(package)
+    return private, public
+
+
+def report_fetch_stats(stats: FetchStats, silent: bool, debug: bool = False) -> None:
+    """Print fetch outcome, failures are reported even in silent mode
+
+    Args:
+        stats (FetchStats): Stats to report
+        silent (bool): Silent mode
+        debug (bool, optional): Also print how many revalidated cache entries were not modified
+    """
+    if debug and stats.revalidated:
+        print(stats.revalidation_summary(), file=sys.stderr)
+    if stats.failed:
+        print(
+            f"⚠️  {stats.failed} packages couldn't be fetched, their license is reported as unknown. "
+            f"({stats.summary()})",
+            file=sys.stderr,
+        )
+    elif not silent:
+        print(stats.summary(), file=sys.stderr)
+
+
+def get_host(url: str) -> str:
+    return urlsplit(url).netloc
+
+
+def is_congestion(error: aiohttp.ClientError) -> bool:
+    """Tell if a client error means an overloaded host, worth backing off and retrying
+
+    Connections the host reset or dropped are, failures to connect at all and broken responses
+    (payload or content length mismatch, undecodable bodies) aren't, retrying them would fail again.
+    """
+    if isinstance(error, aiohttp.ClientConnectorError):
+        return False
+    return isinstance(error, (aiohttp.ClientOSError, aiohttp.ServerDisconnectedError))
+
+
+def get_retry_after(headers) -> Optional[float]:
+    """Parse Retry-After header, which is either seconds or an HTTP date
+
+    Args:
+        headers: Response headers
+
+    Returns:
+        Optional[float]: Seconds to wait or None when not present
+    """
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None:
+        return None
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+async def read_text(resp: aiohttp.ClientResponse, payload=None) -> str:
+    return await resp.text()
+
+
+class Validators(NamedTuple):
+    """
+    ETag and Last-Modified of a cached resource, sent back to revalidate it with a conditional request.
+    """
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+def get_validators(headers) -> Optional[Validators]:
+    """Get validators of a response, None if it has neither ETag nor Last-Modified"""
+    validators = Validators(headers.get("ETag"), headers.get("Last-Modified"))
+    return validators if any(validators) else None
+
+
+def get_conditional_headers(validators: Optional[Validators]) -> Optional[Dict[str, str]]:
+    """Get headers of a conditional request, answered with 304 and no body when the resource is unchanged
+
+    Args:
+        validators (Validators, optional): Validators stored with the cached resource
+
+    Returns:
+        Optional[Dict[str, str]]: If-None-Match and If-Modified-Since headers, None without validators
+    """
+    if validators is None:
+        return None
+    headers = {}
+    if validators.etag:
+        headers["If-None-Match"] = validators.etag
+    if validators.last_modified:
+        headers["If-Modified-Since"] = validators.last_modified
+    return headers or None
+
+
+class HttpRequest(NamedTuple):
+    """
+    Method, JSON body and headers of a request, only idempotent requests are retried safely.
+    """
+    method: str = "GET"
+    body: Any = None
+    headers: Optional[Dict[str, str]] = None
+
+
+class _Retry(Exception):
+    """
+    Raised by a failed attempt which is worth retrying.
+    """
+
+    def __init__(self, error: FetchError, retry_after: Optional[float] = None):
+        super().__init__(str(error))
+        self.error = error
+        self.retry_after = retry_after
+
+
+class Fetcher:
+    """
+    Async HTTP client for registry lookups.
+
+    Limits concurrent requests per host with an adaptive (AIMD) window, applies timeouts
+    and retries transient failures (connection errors, timeouts, 429 and 5xx) with
+    exponential backoff, honouring the Retry-After header.
+
+    Hedged fetches send a duplicate request when the first one hasn't answered within
+    the configured percentile of observed latencies, the first response wins and the
+    other request is cancelled. Duplicates are capped to a fraction of all requests.
+
+    Usage:
+        async with Fetcher() as fetcher:
+            text = await fetcher.fetch(url)
+    """
+
+    def __init__(
+        self, options: Optional[FetchOptions] = None, stats: Optional[FetchStats] = None, debug: bool = False
+    ):
+        self.options = options or FetchOptions.from_env()
+        self.stats = stats if stats is not None else FetchStats()
+        self.debug = debug
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.windows: Dict[str, AdaptiveWindow] = {}
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self.requests = 0
+        self.hedged = 0
+
+    async def __aenter__(self) -> "Fetcher":
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=0,
+                limit_per_host=self.options.connections_per_host,
+                ttl_dns_cache=DNS_CACHE_TTL,
+                keepalive_timeout=KEEPALIVE_TIMEOUT,
+            ),
+            timeout=aiohttp.ClientTimeout(total=self.options.timeout),
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        if self.session:
+            await self.session.close()
+        for window in self.windows.values():
+            window.log(
+                f"final window {window.limit} ({window.increases} increases, {window.decreases} decreases)"
+            )
+
+    def get_window(self, url: str) -> AdaptiveWindow:
+        host = get_host(url)
+        if host not in self.windows:
+            self.windows[host] = AdaptiveWindow(
+                host, self.options.initial_connections, self.options.connections_per_host, self.debug
+            )
+        return self.windows[host]
+
+    def get_backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        if retry_after is not None:
+            return min(retry_after, self.options.max_backoff)
+        delay = self.options.backoff * (2 ** attempt)
+        return min(delay + random.uniform(0, delay), self.options.max_backoff)
+
+    def get_hedge_delay(self) -> Optional[float]:
+        """Get the time after which a request is hedged
+
+        Returns:
+            Optional[float]: Configured percentile of observed latencies or None when hedging is off
+        """
+        if not self.options.hedge_percentile or len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        latencies = sorted(self.latencies)
+        index = min(int(len(latencies) * self.options.hedge_percentile / 100), len(latencies) - 1)
+        return latencies[index]
+
+    def take_hedge(self, stats: Optional[FetchStats] = None) -> bool:
+        if self.hedged >= max(1.0, self.requests * self.options.hedge_budget):
+            return False
+        self.hedged += 1
+        (stats or self.stats).hedged += 1
+        return True
+
+    async def fetch(
+        self,
+        url: str,
+        read: Callable[[aiohttp.ClientResponse], Awaitable[T]] = read_text,  # type: ignore
+        hedge: bool = False,
+        stats: Optional[FetchStats] = None,
+        request: Optional[HttpRequest] = None,
+    ) -> T:
+        """Fetch a url and process the response with read
+
+        Args:
+            url (str): Url to fetch
+            read (Callable): Coroutine reading the successful response
+            hedge (bool, optional): Duplicate the request when it's slower than usual
+            stats (FetchStats, optional): Collects retries and hedges of this fetch, instead of
+                the stats of the fetcher
+            request (HttpRequest, optional): Method, JSON body and headers. Defaults to a plain GET.
+
+        Raises:
+            FetchError: When the request fails with a non retryable status or runs out of retries
+
+        Returns:
+            T: Result of read
+        """
+        stats = stats if stats is not None else self.stats
+        request = request or HttpRequest()
+        if hedge and self.options.hedge_percentile:
+            return await self.fetch_hedged(url, read, stats, request)
+        return await self.fetch_with_retries(url, read, stats, request)
+
+    async def fetch_hedged(
+        self, url: str, read: Callable[[aiohttp.ClientResponse], Awaitable[T]], stats: FetchStats, request: HttpRequest
+    ) -> T:
+        started = asyncio.Event()
+        tasks: Set[asyncio.Future] = {
+            asyncio.ensure_future(self.fetch_with_retries(url, read, stats, request, started))
+        }
+        waiter = asyncio.ensure_future(started.wait())
+        try:
+            # the hedge delay counts from the moment the request got a slot in its host window
+            await asyncio.wait(tasks | {waiter}, return_when=asyncio.FIRST_COMPLETED)
+            delay = self.get_hedge_delay()
+            if delay is not None and not (await asyncio.wait(tasks, timeout=delay))[0] and self.take_hedge(stats):
+                tasks.add(asyncio.ensure_future(self.fetch_with_retries(url, read, stats, request)))
+
+            error: Optional[BaseException] = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = error or task.exception()
+            assert error
+            raise error
+        finally:
+            for task in tasks | {waiter}:
+                task.cancel()
+
+    async def fetch_with_retries(
+        self,
+        url: str,
+        read: Callable[[aiohttp.ClientResponse], Awaitable[T]],
+        stats: FetchStats,
+        request: HttpRequest,
+        started: Optional[asyncio.Event] = None,
+    ) -> T:
+        attempt = 0
+        while True:
+            try:
+                return await self.request(url, read, request, started)
+            except _Retry as retry:
+                if attempt >= self.options.retries:
+                    raise retry.error
+                await asyncio.sleep(self.get_backoff(attempt, retry.retry_after))
+            attempt += 1
+            stats.retries += 1
+
+    async def request(
+        self,
+        url: str,
+        read: Callable[[aiohttp.ClientResponse], Awaitable[T]],
+        request: HttpRequest,
+        on_start: Optional[asyncio.Event] = None,
+    ) -> T:
+        """Single attempt to fetch a url, feeding the outcome to the window of its host"""
+        assert self.session, "Fetcher has to be used as an async context manager"
+        if is_offline():
+            raise FetchError(url, "offline mode")
+        async with self.get_window(url) as window:
+            if on_start:
+                on_start.set()
+            self.requests += 1
+            started = time.monotonic()
+            try:
+                async with self.session.request(
+                    request.method, url, json=request.body, headers=request.headers
+                ) as resp:
+                    if resp.status in RETRY_STATUSES:
+                        window.on_congestion(f"HTTP {resp.status}")
+                        raise _Retry(FetchError(url, f"HTTP {resp.status}", resp.status), get_retry_after(resp.headers))
+                    window.on_success(time.monotonic() - started)
+                    if resp.status >= 400:
+                        raise FetchError(url, f"HTTP {resp.status}", resp.status)
+                    result = await read(resp)
+                    self.latencies.append(time.monotonic() - started)
+                    return result
+            except asyncio.TimeoutError:
+                window.on_congestion("timeout")
+                raise _Retry(FetchError(url, "timeout"))
+            except aiohttp.ClientSSLError as e:
+                raise FetchError(url, f"{type(e).__name__}")
+            except aiohttp.ClientError as e:
+                if not is_congestion(e):
+                    raise FetchError(url, f"{type(e).__name__}")
+                window.on_congestion(type(e).__name__)
+                raise _Retry(FetchError(url, f"{type(e).__name__}"))
+
+
+class FetchResult(NamedTuple):
+    """
+    Outcome of a single lookup of a fetch stream, error is set when the fetch failed.
+    """
+    payload: Any
+    result: Any
+    error: Optional[FetchError]
+
+
+class FetchEngine:
+    """
+    Fetcher shared by all runners and analyzers of the process.
+
+    Owns a single event loop running in a background thread with one pooled connector,
+    so every lookup reuses keep-alive connections, resolved addresses and the adaptive
+    window of its host, whichever ecosystem it belongs to. Lookups are submitted from
+    any thread and their results are streamed back as they complete, so several runners
+    may fetch concurrently.
+
+    Usage:
+        engine = FetchEngine()
+        for item in engine.stream([(url, payload)]):
+            ...
+        engine.close()
+    """
+
+    def __init__(self, options: Optional[FetchOptions] = None, debug: bool = False):
+        self.fetcher = Fetcher(options, debug=debug)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="license-sh-fetch", daemon=True)
+        self.thread.start()
+        self.run(self.fetcher.__aenter__())
+
+    @property
+    def options(self) -> FetchOptions:
+        return self.fetcher.options
+
+    def run(self, coroutine: Coroutine[Any, Any, T]) -> T:
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def set_debug(self, debug: bool) -> None:
+        self.fetcher.debug = debug
+        for window in self.fetcher.windows.values():
+            window.debug = debug
+
+    def close(self) -> None:
+        if self.loop.is_closed():
+            return
+        self.run(self.fetcher.__aexit__(None, None, None))
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    def stream(
+        self,
+        requests: Iterable[Tuple[str, P]],
+        read: Callable[[aiohttp.ClientResponse, P], Awaitable[T]] = read_text,  # type: ignore
+        stats: Optional[FetchStats] = None,
+        hedge: bool = False,
+        headers: Optional[Callable[[P], Optional[Dict[str, str]]]] = None,
+    ) -> Generator[FetchResult, None, None]:
+        """Fetch all urls concurrently and yield results in the order they complete
+
+        Lookups still running when the stream is closed early are cancelled.
+
+        Args:
+            requests (Iterable[Tuple[str, P]]): (url, payload) pairs
+            read (Callable, optional): Coroutine reading the successful response and the payload. Defaults to text.
+            stats (FetchStats, optional): Collects retries and hedges of these lookups
+            hedge (bool, optional): Hedge slow requests, when enabled by the options
+            headers (Callable, optional): Headers of the request of each payload, e.g. conditional ones
+
+        Raises:
+            Exception: Any error of read other than FetchError
+
+        Returns:
+            Generator[FetchResult]: Payload with the result of read or the error of each lookup
+        """
+        results: "queue.Queue[Tuple[P, Any, Optional[BaseException]]]" = queue.Queue()
+
+        async def fetch(url: str, payload: P) -> None:
+            try:
+                request = HttpRequest(headers=headers(payload)) if headers else None
+                result = await self.fetcher.fetch(url, lambda resp: read(resp, payload), hedge, stats, request)
+            except Exception as error:
+                results.put((payload, None, error))
+            else:
+                results.put((payload, result, None))
+
+        futures = [asyncio.run_coroutine_threadsafe(fetch(url, payload), self.loop) for url, payload in requests]
+        try:
+            for _ in futures:
+                payload, result, error = results.get()
+                if error is not None and not isinstance(error, FetchError):
+                    raise error
+                yield FetchResult(payload, result, error)
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+_engine: Optional[FetchEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_fetch_engine(debug: bool = False) -> FetchEngine:
+    """Get the fetch engine shared by the process, started on first use
+
+    Args:
+        debug (bool, optional): Print adjustments of the per-host concurrency windows from now on
+
+    Returns:
+        FetchEngine: The engine, closed when the process exits
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = FetchEngine(debug=debug)
+            atexit.register(_engine.close)
+        elif debug:
+            _engine.set_debug(True)
+        return _engine
+
+
+def fetch_all(
+    requests: Iterable[Tuple[str, P]],
+    handle: Callable[[Optional[T], P], None],
+    read: Callable[[aiohttp.ClientResponse, P], Awaitable[T]] = read_text,  # type: ignore
+    stats: Optional[FetchStats] = None,
+    options: Optional[FetchOptions] = None,
+    debug: bool = False,
+    hedge: bool = False,
+    handle_error: Optional[Callable[[FetchError, P], None]] = None,
+    engine: Optional[FetchEngine] = None,
+    headers: Optional[Callable[[P], Optional[Dict[str, str]]]] = None,
+) -> None:
+    """Fetch all urls concurrently and handle each response as soon as it arrives
+
+    Lookups run on the shared fetch engine, an exception raised by handle cancels the ones
+    still running.
+
+    Args:
+        requests (Iterable[Tuple[str, P]]): (url, payload) pairs, payload is passed to handle
+        handle (Callable): Called with the result of read (None if the fetch failed) and the payload
+        read (Callable, optional): Coroutine reading the successful response and the payload. Defaults to text.
+        stats (FetchStats, optional): Collects retry counts
+        options (FetchOptions, optional): Network settings, a dedicated engine is started for
+            other than the shared ones. Defaults to the environment.
+        debug (bool, optional): Print adjustments of the per-host concurrency window
+        hedge (bool, optional): Hedge slow requests, when enabled by the options
+        handle_error (Callable, optional): Called with the error and the payload of failed fetches
+            instead of handle
+        engine (FetchEngine, optional): Engine to run on. Defaults to the shared one.
+        headers (Callable, optional): Headers of the request of each payload, e.g. conditional ones
+    """
+    dedicated = engine is None and options is not None
+    if engine is None:
+        engine = FetchEngine(options, debug) if dedicated else get_fetch_engine(debug)
+    results = engine.stream(requests, read, stats, hedge, headers)
+    try:
+        for payload, result, error in results:
+            if error is not None and handle_error is not None:
+                handle_error(error, payload)
+            else:
+                handle(result, payload)
+    finally:
+        results.close()
+        if dedicated:
+            engine.close()
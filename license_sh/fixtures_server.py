@@ -0,0 +1,125 @@
+import asyncio
+import json
+import os
+import random
+from typing import Optional, Tuple
+
+from aiohttp import web
+
+NPM_PREFIX = "/npm"
+PYPI_PREFIX = "/pypi"
+MAVEN_PREFIX = "/maven"
+
+
+def get_fixture_path(directory: str, *parts: str) -> Optional[str]:
+    """Get path to a fixture file, None if it doesn't exist or lies outside of the directory"""
+    root = os.path.realpath(directory)
+    path = os.path.realpath(os.path.join(root, *parts))
+    if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+        return None
+    return path
+
+
+def split_npm_path(path: str) -> Tuple[str, Optional[str]]:
+    """Split registry path into package name and version, scoped names contain a slash
+
+    Example:
+        "@babel/core/7.0.0" -> ("@babel/core", "7.0.0")
+        "react/" -> ("react", None)
+    """
+    parts = [part for part in path.split("/") if part]
+    name_parts = 2 if parts and parts[0].startswith("@") else 1
+    name = "/".join(parts[:name_parts])
+    version = parts[name_parts] if len(parts) > name_parts else None
+    return name, version
+
+
+def get_fault_injection(latency: float, error_rate: float, seed: Optional[int] = None):
+    errors = random.Random(seed)
+
+    @web.middleware
+    async def inject_faults(request, handler):
+        if latency:
+            await asyncio.sleep(latency)
+        if error_rate and errors.random() < error_rate:
+            return web.Response(status=503, text="Injected error")
+        return await handler(request)
+
+    return inject_faults
+
+
+class FixtureHandlers:
+    """
+    Request handlers serving files of a fixtures directory in the shape of the registries.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    async def npm(self, request):
+        name, version = split_npm_path(request.match_info["path"])
+        path = get_fixture_path(self.directory, "npm", f"{name}.json")
+        if path is None:
+            raise web.HTTPNotFound()
+        if version is None:
+            return web.FileResponse(path, headers={"Content-Type": "application/json"})
+
+        with open(path) as file:
+            packument = json.load(file)
+        document = packument.get("versions", {}).get(version)
+        if document is None:
+            raise web.HTTPNotFound()
+        return web.json_response(dict(document, name=packument.get("name", name), version=version))
+
+    async def pypi(self, request):
+        path = get_fixture_path(
+            self.directory, "pypi", request.match_info["name"], f"{request.match_info['version']}.json"
+        )
+        if path is None:
+            raise web.HTTPNotFound()
+        return web.FileResponse(path, headers={"Content-Type": "application/json"})
+
+    async def maven(self, request):
+        path = get_fixture_path(self.directory, "maven", request.match_info["path"])
+        if path is None:
+            raise web.HTTPNotFound()
+        return web.FileResponse(path)
+
+
+def get_fixtures_app(
+    directory: str, latency: float = 0.0, error_rate: float = 0.0, seed: Optional[int] = None
+) -> web.Application:
+    """Create a stand-in of package registries serving fixture files
+
+    Fixtures directory layout:
+
+        npm/{name}.json                 packument, served at /npm/{name}/ and /npm/{name}/{version}
+        pypi/{name}/{version}.json      served at /pypi/{name}/{version}/json
+        maven/{path}                    any file e.g. POMs or license texts, served at /maven/{path}
+
+    Args:
+        directory (str): Fixtures directory
+        latency (float, optional): Seconds each response is delayed by
+        error_rate (float, optional): Share of requests failing with 503
+        seed (int, optional): Seed of the injected errors, for reproducible runs
+
+    Returns:
+        web.Application: The server application
+    """
+    app = web.Application(middlewares=[get_fault_injection(latency, error_rate, seed)])
+    handlers = FixtureHandlers(directory)
+    app.router.add_get(PYPI_PREFIX + "/{name}/{version}/json", handlers.pypi)
+    app.router.add_get(NPM_PREFIX + "/{path:.+}", handlers.npm)
+    app.router.add_get(MAVEN_PREFIX + "/{path:.+}", handlers.maven)
+    return app
+
+
+def serve_fixtures(
+    directory: str, host: str = "127.0.0.1", port: int = 8080, latency: float = 0.0, error_rate: float = 0.0
+) -> None:
+    url = f"http://{host}:{port}"
+    print(f"Serving fixtures from {directory} on {url}")
+    print(f"  LICENSE_SH_NPM_REGISTRY={url}{NPM_PREFIX}")
+    print(f"  LICENSE_SH_PYPI_REGISTRY={url}{PYPI_PREFIX}")
+    print(f"  LICENSE_SH_MAVEN_REGISTRY={url}{MAVEN_PREFIX}")
+    web.run_app(get_fixtures_app(directory, latency, error_rate), host=host, port=port, print=None)
@@ -1,4 +1,4 @@
-from typing import Tuple, Set, List, Optional, Union
+from typing import Dict, Tuple, Set, List, Optional, Union
 
 from anytree import PreOrderIter, LevelOrderIter, AnyNode
 from anytree.exporter import DictExporter
@@ -100,6 +100,22 @@ def flatten_dependency_tree(tree: PackageNode) -> Set[PackageInfo]:
     )
 
 
+def get_breadth_first_dependencies(tree: PackageNode) -> List[PackageInfo]:
+    """Get unique packages of a dependency tree, direct dependencies of the root first
+
+    Args:
+        tree (PackageNode): Dependency tree
+
+    Returns:
+        List[PackageInfo]: Packages ordered by their shallowest occurrence in the tree
+    """
+    packages: Dict[PackageInfo, None] = {}
+    for node in LevelOrderIter(tree):
+        if node is not tree:
+            packages.setdefault(PackageInfo(name=node.name, version=node.version))
+    return list(packages)
+
+
 def parse_license(license_text: str) -> List[str]:
     """Parse license, if complex, then break it into simple parts
 
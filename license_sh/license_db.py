@@ -0,0 +1,310 @@
+import bz2
+import gzip
+import itertools
+import json
+import lzma
+import os
+import sqlite3
+import time
+from typing import IO, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from license_sh.cache import get_cache_dir, get_cache_key
+from license_sh.types.nodes import PackageInfo
+
+LICENSE_DB_ENV = "LICENSE_SH_DB"
+LICENSE_DB_FILE_NAME = "licenses.sqlite3"
+
+BATCH_SIZE = 10000
+MMAP_SIZE = 256 * 1024 * 1024  # pages of the database are mapped instead of read into the heap
+SQLITE_MAGIC = b"SQLite format 3\x00"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS licenses (
+    key TEXT PRIMARY KEY,
+    license TEXT
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+INSERT OR IGNORE INTO meta (name, value) VALUES ('updates', '0');
+"""
+
+
+class LicenseRow(NamedTuple):
+    """
+    Single row of a snapshot or of an update, deleted rows are only allowed in updates.
+    """
+    ecosystem: str
+    name: str
+    version: str
+    license: Optional[str]
+    deleted: bool = False
+
+
+class LicenseDatabaseStats(NamedTuple):
+    path: str
+    entries: int
+    imported_at: Optional[float]
+    source: Optional[str]
+    updates: int
+
+
+def open_snapshot(path: str) -> IO[str]:
+    """Open NDJSON snapshot, compressed with gzip, bzip2 or xz or not compressed at all
+
+    Args:
+        path (str): Path to the file
+
+    Returns:
+        IO[str]: Text stream of the decompressed file
+    """
+    with open(path, "rb") as file:
+        magic = file.read(6)
+    if magic.startswith(b"\x1f\x8b"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    if magic.startswith(b"BZh"):
+        return bz2.open(path, "rt", encoding="utf-8")
+    if magic.startswith(b"\xfd7zXZ\x00"):
+        return lzma.open(path, "rt", encoding="utf-8")
+    return open(path, "rt", encoding="utf-8")
+
+
+def is_sqlite_file(path: str) -> bool:
+    with open(path, "rb") as file:
+        return file.read(len(SQLITE_MAGIC)) == SQLITE_MAGIC
+
+
+def read_ndjson_rows(path: str) -> Iterator[LicenseRow]:
+    """Read license rows of a NDJSON file, one object per line:
+
+        {"ecosystem": "npm", "name": "react", "version": "16.0.0", "license": "MIT"}
+        {"ecosystem": "npm", "name": "left-pad", "version": "1.0.0", "deleted": true}
+
+    Raises:
+        ValueError: When a line isn't a license row
+    """
+    with open_snapshot(path) as file:
+        for line_number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+                yield LicenseRow(
+                    row["ecosystem"], row["name"], row["version"], row.get("license"), bool(row.get("deleted"))
+                )
+            except (ValueError, KeyError, TypeError):
+                raise ValueError(f"Invalid license row on line {line_number} of {path}")
+
+
+def read_sqlite_rows(path: str) -> Iterator[LicenseRow]:
+    """Read license rows of a SQLite file with table
+    licenses (ecosystem, name, version, license[, deleted])
+    """
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        columns = [column[1] for column in connection.execute("PRAGMA table_info(licenses)")]
+        if not columns:
+            raise ValueError(f"{path} has no licenses table")
+        deleted = "deleted" if "deleted" in columns else "0"
+        for ecosystem, name, version, license, is_deleted in connection.execute(
+            f"SELECT ecosystem, name, version, license, {deleted} FROM licenses"
+        ):
+            yield LicenseRow(ecosystem, name, version, license, bool(is_deleted))
+    finally:
+        connection.close()
+
+
+def read_rows(path: str) -> Iterator[LicenseRow]:
+    return read_sqlite_rows(path) if is_sqlite_file(path) else read_ndjson_rows(path)
+
+
+def batched(rows: Iterable[LicenseRow]) -> Iterator[List[LicenseRow]]:
+    iterator = iter(rows)
+    while True:
+        batch = list(itertools.islice(iterator, BATCH_SIZE))
+        if not batch:
+            return
+        yield batch
+
+
+class LicenseDatabase:
+    """
+    Local store of licenses imported from bulk snapshots, consulted before any registry
+    request so air-gapped machines can check projects.
+
+    Rows live in a SQLite table clustered by ecosystem + name + version, a lookup reads
+    a handful of pages however many millions of rows are stored. Pages are memory-mapped
+    and read on demand, the store is never loaded whole.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = self._connect(path)
+
+    @staticmethod
+    def _connect(path: str) -> sqlite3.Connection:
+        connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+        connection.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        connection.executescript(SCHEMA)
+        return connection
+
+    def close(self):
+        self.connection.close()
+
+    def get_many(self, ecosystem: str, packages: Iterable[PackageInfo]) -> Dict[PackageInfo, Optional[str]]:
+        """Look up licenses of many packages at once
+
+        Args:
+            ecosystem (str): Ecosystem of the packages e.g. npm or pypi
+            packages (Iterable[PackageInfo]): Packages to look up
+
+        Returns:
+            Dict[PackageInfo, Optional[str]]: Packages found in the database only, None marks
+            a package known to have no license
+        """
+        keys = {get_cache_key(ecosystem, package.name, package.version): PackageInfo(*package) for package in packages}
+        key_list = list(keys.keys())
+        result = {}
+        # stay under SQLite's limit of host parameters
+        for i in range(0, len(key_list), 500):
+            chunk = key_list[i:i + 500]
+            for key, license in self.connection.execute(
+                f"SELECT key, license FROM licenses WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            ):
+                result[keys[key]] = license
+        return result
+
+    def import_snapshot(self, path: str) -> int:
+        """Replace the content of the database with a snapshot
+
+        The snapshot is loaded into a new file which then replaces the database at once,
+        running checks keep reading the previous one.
+
+        Args:
+            path (str): NDJSON (optionally compressed) or SQLite snapshot
+
+        Raises:
+            ValueError: When the snapshot is invalid or contains deleted rows
+
+        Returns:
+            int: Number of imported rows
+        """
+        import_path = f"{self.path}.import"
+        if os.path.exists(import_path):
+            os.remove(import_path)
+        connection = self._connect(import_path)
+        try:
+            connection.execute("PRAGMA journal_mode=OFF")
+            connection.execute("PRAGMA synchronous=OFF")
+            count = 0
+            with connection:
+                connection.execute("BEGIN")
+                for batch in batched(read_rows(path)):
+                    if any(row.deleted for row in batch):
+                        raise ValueError("Snapshots can't contain deleted rows, apply them as an update")
+                    connection.executemany(
+                        "INSERT OR REPLACE INTO licenses (key, license) VALUES (?, ?)",
+                        [(get_cache_key(row.ecosystem, row.name, row.version), row.license) for row in batch],
+                    )
+                    count += len(batch)
+                connection.executemany(
+                    "INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)",
+                    [("imported_at", str(time.time())), ("source", os.path.abspath(path))],
+                )
+        except BaseException:
+            connection.close()
+            os.remove(import_path)
+            raise
+        connection.close()
+
+        self.connection.close()
+        os.replace(import_path, self.path)
+        self.connection = self._connect(self.path)
+        return count
+
+    def apply_update(self, path: str) -> Tuple[int, int]:
+        """Apply incremental changes to the database without rebuilding it
+
+        Args:
+            path (str): NDJSON (optionally compressed) or SQLite file of changed rows,
+                rows marked as deleted are removed
+
+        Returns:
+            Tuple[int, int]: Number of upserted and deleted rows
+        """
+        upserted = deleted = 0
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            for batch in batched(read_rows(path)):
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO licenses (key, license) VALUES (?, ?)",
+                    [
+                        (get_cache_key(row.ecosystem, row.name, row.version), row.license)
+                        for row in batch if not row.deleted
+                    ],
+                )
+                self.connection.executemany(
+                    "DELETE FROM licenses WHERE key = ?",
+                    [(get_cache_key(row.ecosystem, row.name, row.version),) for row in batch if row.deleted],
+                )
+                removed = sum(row.deleted for row in batch)
+                upserted += len(batch) - removed
+                deleted += removed
+            self.connection.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE name = 'updates'")
+        return upserted, deleted
+
+    def stats(self) -> LicenseDatabaseStats:
+        (entries,) = self.connection.execute("SELECT COUNT(*) FROM licenses").fetchone()
+        meta = dict(self.connection.execute("SELECT name, value FROM meta"))
+        return LicenseDatabaseStats(
+            path=self.path,
+            entries=entries,
+            imported_at=float(meta["imported_at"]) if "imported_at" in meta else None,
+            source=meta.get("source"),
+            updates=int(meta.get("updates", 0)),
+        )
+
+
+def get_license_db_path() -> str:
+    return os.environ.get(LICENSE_DB_ENV) or os.path.join(get_cache_dir(), LICENSE_DB_FILE_NAME)
+
+
+_license_db: Optional[LicenseDatabase] = None
+
+
+def get_license_db() -> Optional[LicenseDatabase]:
+    """Get the shared license database
+
+    Returns:
+        Optional[LicenseDatabase]: The database or None if no snapshot was imported
+    """
+    global _license_db
+    if _license_db is None:
+        path = get_license_db_path()
+        if not os.path.exists(path):
+            return None
+        _license_db = LicenseDatabase(path)
+    return _license_db
+
+
+def split_license_db(
+    license_db: Optional[LicenseDatabase], ecosystem: str, packages: List[PackageInfo]
+) -> Tuple[Dict[PackageInfo, Optional[str]], List[PackageInfo]]:
+    """Split packages into the ones answered by the license database and the rest
+
+    Args:
+        license_db (Optional[LicenseDatabase]): Database to use, None to skip it
+        ecosystem (str): Ecosystem of the packages
+        packages (List[PackageInfo]): Packages to look up
+
+    Returns:
+        Tuple[Dict, List]: Licenses found in the database and list of packages missing there
+    """
+    if license_db is None or not packages:
+        return {}, packages
+    found = license_db.get_many(ecosystem, packages)
+    return found, [package for package in packages if package not in found]
@@ -0,0 +1,57 @@
+import os
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+from license_sh.cache import MAVEN, NPM, PYPI
+
+REGISTRY_ENVS = {
+    NPM: "LICENSE_SH_NPM_REGISTRY",
+    PYPI: "LICENSE_SH_PYPI_REGISTRY",
+    MAVEN: "LICENSE_SH_MAVEN_REGISTRY",
+}
+DEFAULT_REGISTRIES = {
+    NPM: "https://registry.npmjs.org",
+    PYPI: "https://pypi.org/pypi",
+}
+
+
+def get_registry(ecosystem: str, registries: Optional[Dict[str, str]] = None) -> Optional[str]:
+    """Get base url of the registry of an ecosystem
+
+    The environment (e.g. LICENSE_SH_NPM_REGISTRY) takes precedence over the config,
+    the public registry is used when neither is set.
+
+    Args:
+        ecosystem (str): npm, pypi or maven
+        registries (Dict[str, str], optional): Registries from the config, ecosystem as key
+
+    Returns:
+        Optional[str]: Base url without a trailing slash, None when there is no registry
+            (maven license files are fetched from their own urls by default)
+    """
+    registry = (
+        os.environ.get(REGISTRY_ENVS.get(ecosystem, ""))
+        or (registries or {}).get(ecosystem)
+        or DEFAULT_REGISTRIES.get(ecosystem)
+    )
+    return registry.rstrip("/") if registry else None
+
+
+def get_mirror_url(url: str, registry: Optional[str]) -> str:
+    """Rewrite an url to be fetched from a mirror which keeps files under their original host
+
+    Example:
+        get_mirror_url("https://www.apache.org/licenses/LICENSE-2.0.txt", "http://mirror/maven")
+        -> "http://mirror/maven/www.apache.org/licenses/LICENSE-2.0.txt"
+
+    Args:
+        url (str): Original url
+        registry (str, optional): Base url of the mirror, None keeps the url as is
+
+    Returns:
+        str: Url to fetch
+    """
+    if not registry:
+        return url
+    parts = urlsplit(url)
+    return f"{registry}/{parts.netloc}{parts.path}" + (f"?{parts.query}" if parts.query else "")
@@ -0,0 +1,125 @@
+import asyncio
+import os
+import sys
+from typing import Dict, Iterable, List, Optional
+
+from license_sh.cache import NO_CACHE_ENV, get_cache_key
+from license_sh.fetcher import FetchEngine, FetchError, HttpRequest, get_fetch_engine, is_offline
+from license_sh.types.nodes import PackageInfo
+
+REMOTE_CACHE_ENV = "LICENSE_SH_REMOTE_CACHE"
+REMOTE_CACHE_TOKEN_ENV = "LICENSE_SH_REMOTE_CACHE_TOKEN"
+
+LOOKUP_PATH = "/lookup"
+ENTRIES_PATH = "/entries"
+BATCH_SIZE = 1000  # keys per request, a 3k-package tree takes three concurrent lookups
+
+
+async def read_entries(resp, payload=None) -> Dict[str, Optional[str]]:
+    document = await resp.json()
+    entries = document.get("entries") if isinstance(document, dict) else None
+    return entries if isinstance(entries, dict) else {}
+
+
+async def read_nothing(resp, payload=None) -> None:
+    return None
+
+
+class RemoteCache:
+    """
+    Client of a cache shared over HTTP, e.g. by the CI runners of a team.
+
+    The protocol has two batch requests, entries are keyed like the local cache
+    ("npm:react@16.0.0") and hold a license, null marks a package without license:
+
+        POST /lookup   {"keys": [...]}             -> {"entries": {key: license}} of the hits
+        PUT  /entries  {"entries": {key: license}} -> 204
+
+    The remote cache is best effort, once it fails it isn't asked again for the rest of the run.
+    """
+
+    def __init__(self, url: str, token: Optional[str] = None, engine: Optional[FetchEngine] = None):
+        self.url = url.rstrip("/")
+        self.headers = {"Authorization": f"Bearer {token}"} if token else None
+        self.engine = engine
+        self.available = True
+
+    def send(self, method: str, path: str, bodies: List[Dict], read) -> List:
+        """Send batch requests concurrently
+
+        Returns:
+            List: Results of read, empty when the remote cache failed
+        """
+        if not self.available or not bodies:
+            return []
+        engine = self.engine or get_fetch_engine()
+
+        async def send_all():
+            return await asyncio.gather(*[
+                engine.fetcher.fetch(self.url + path, read, request=HttpRequest(method, body, self.headers))
+                for body in bodies
+            ])
+
+        try:
+            return engine.run(send_all())
+        except (FetchError, ValueError) as error:
+            self.available = False
+            print(f"⚠️  Remote cache {self.url} is unavailable: {error}", file=sys.stderr)
+            return []
+
+    def get_many(self, ecosystem: str, packages: Iterable[PackageInfo]) -> Dict[PackageInfo, Optional[str]]:
+        """Look up licenses of many packages in a few batch requests
+
+        Args:
+            ecosystem (str): Ecosystem of the packages e.g. npm or pypi
+            packages (Iterable[PackageInfo]): Packages to look up
+
+        Returns:
+            Dict[PackageInfo, Optional[str]]: Packages found in the remote cache only
+        """
+        keys = {get_cache_key(ecosystem, package.name, package.version): PackageInfo(*package) for package in packages}
+        key_list = list(keys)
+        batches = self.send(
+            "POST", LOOKUP_PATH, [{"keys": key_list[i:i + BATCH_SIZE]} for i in range(0, len(key_list), BATCH_SIZE)],
+            read_entries,
+        )
+        return {
+            keys[key]: license
+            for entries in batches
+            for key, license in entries.items()
+            if key in keys and (license is None or isinstance(license, str))
+        }
+
+    def set_many(self, ecosystem: str, licenses: Dict[PackageInfo, Optional[str]]) -> None:
+        """Store licenses in the remote cache
+
+        Args:
+            ecosystem (str): Ecosystem of the packages
+            licenses (Dict[PackageInfo, Optional[str]]): Package as key, license as value
+        """
+        entries = [
+            (get_cache_key(ecosystem, package.name, package.version), license) for package, license in licenses.items()
+        ]
+        self.send(
+            "PUT", ENTRIES_PATH, [{"entries": dict(entries[i:i + BATCH_SIZE])} for i in range(0, len(entries), BATCH_SIZE)],
+            read_nothing,
+        )
+
+
+_remote_cache: Optional[RemoteCache] = None
+
+
+def get_remote_cache() -> Optional[RemoteCache]:
+    """Get the remote cache of the process
+
+    Returns:
+        Optional[RemoteCache]: The cache or None if LICENSE_SH_REMOTE_CACHE isn't set,
+            caching is disabled with LICENSE_SH_NO_CACHE or in offline mode
+    """
+    global _remote_cache
+    url = os.environ.get(REMOTE_CACHE_ENV)
+    if not url or os.environ.get(NO_CACHE_ENV) or is_offline():
+        return None
+    if _remote_cache is None or _remote_cache.url != url.rstrip("/"):
+        _remote_cache = RemoteCache(url, os.environ.get(REMOTE_CACHE_TOKEN_ENV))
+    return _remote_cache
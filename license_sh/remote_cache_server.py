@@ -0,0 +1,145 @@
+import ipaddress
+import os
+import sqlite3
+from typing import Dict, Iterable, Optional
+
+from aiohttp import web
+
+from license_sh.cache import get_cache_dir
+from license_sh.remote_cache import ENTRIES_PATH, LOOKUP_PATH, REMOTE_CACHE_TOKEN_ENV
+
+STORE_FILE_NAME = "remote-cache.sqlite3"
+DEFAULT_HOST = "127.0.0.1"
+MAX_KEYS = 10000  # per request
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value TEXT
+) WITHOUT ROWID;
+"""
+
+
+class RemoteCacheStore:
+    """
+    Entries of the reference remote cache server, kept in SQLite.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Optional[str]]:
+        key_list = list(keys)
+        result: Dict[str, Optional[str]] = {}
+        # stay under SQLite's limit of host parameters
+        for i in range(0, len(key_list), 500):
+            chunk = key_list[i:i + 500]
+            result.update(
+                self.connection.execute(
+                    f"SELECT key, value FROM entries WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                )
+            )
+        return result
+
+    def set_many(self, entries: Dict[str, Optional[str]]) -> None:
+        with self.connection:
+            self.connection.execute("BEGIN")
+            self.connection.executemany("INSERT OR REPLACE INTO entries (key, value) VALUES (?, ?)", entries.items())
+
+
+def is_entry(key, value) -> bool:
+    return isinstance(key, str) and (value is None or isinstance(value, str))
+
+
+class RemoteCacheHandlers:
+    def __init__(self, store: RemoteCacheStore, token: Optional[str] = None):
+        self.store = store
+        self.token = token
+
+    def authorize(self, request: web.Request) -> None:
+        if self.token and request.headers.get("Authorization") != f"Bearer {self.token}":
+            raise web.HTTPUnauthorized()
+
+    async def read_json(self, request: web.Request, field: str):
+        self.authorize(request)
+        try:
+            document = await request.json()
+        except ValueError:
+            raise web.HTTPBadRequest(text="Invalid JSON")
+        value = document.get(field) if isinstance(document, dict) else None
+        if not isinstance(value, (list, dict)) or len(value) > MAX_KEYS:
+            raise web.HTTPBadRequest(text=f"Expected up to {MAX_KEYS} {field}")
+        return value
+
+    async def lookup(self, request: web.Request) -> web.Response:
+        keys = await self.read_json(request, "keys")
+        if not isinstance(keys, list) or not all(isinstance(key, str) for key in keys):
+            raise web.HTTPBadRequest(text="Keys have to be strings")
+        return web.json_response({"entries": self.store.get_many(keys)})
+
+    async def put_entries(self, request: web.Request) -> web.Response:
+        entries = await self.read_json(request, "entries")
+        if not isinstance(entries, dict) or not all(is_entry(key, value) for key, value in entries.items()):
+            raise web.HTTPBadRequest(text="Entries have to map keys to strings or null")
+        self.store.set_many(entries)
+        return web.Response(status=204)
+
+
+def get_remote_cache_app(store: RemoteCacheStore, token: Optional[str] = None) -> web.Application:
+    """Create the reference server of the remote cache protocol
+
+    Args:
+        store (RemoteCacheStore): Store of the entries
+        token (str, optional): Bearer token clients have to send, None accepts everyone
+
+    Returns:
+        web.Application: The server application
+    """
+    app = web.Application(client_max_size=16 * 1024 * 1024)
+    handlers = RemoteCacheHandlers(store, token)
+    app.router.add_post(LOOKUP_PATH, handlers.lookup)
+    app.router.add_put(ENTRIES_PATH, handlers.put_entries)
+    return app
+
+
+def is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def serve_remote_cache(path: Optional[str] = None, host: str = DEFAULT_HOST, port: int = 8080) -> None:
+    """Serve the remote cache until interrupted
+
+    Clients trust the licenses the cache returns, so it's only served beyond the loopback
+    interface when writes are authenticated with LICENSE_SH_REMOTE_CACHE_TOKEN.
+
+    Args:
+        path (str, optional): Path to the store, "remote-cache.sqlite3" in the cache directory by default
+        host (str, optional): Interface to listen on. Defaults to the loopback interface.
+        port (int, optional): Port to listen on
+
+    Raises:
+        ValueError: When the host isn't a loopback interface and no token is set
+    """
+    token = os.environ.get(REMOTE_CACHE_TOKEN_ENV)
+    if not token and not is_loopback(host):
+        raise ValueError(f"Set {REMOTE_CACHE_TOKEN_ENV} to serve the remote cache on {host}")
+    path = path or os.path.join(get_cache_dir(), STORE_FILE_NAME)
+    store = RemoteCacheStore(path)
+    print(f"Serving remote cache {path} on http://{host}:{port}")
+    try:
+        web.run_app(get_remote_cache_app(store, token), host=host, port=port, print=None)
+    finally:
+        store.close()
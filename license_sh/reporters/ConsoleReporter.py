@@ -1,5 +1,6 @@
 from anytree import RenderTree, ContStyle
 
+from license_sh.fetcher import RESOLVED_FROM_CONFIG
 from license_sh.helpers import GREEN, RESET, RED, BOLD, is_problematic_node
 from license_sh.types.nodes import AnnotatedPackageNode
 
@@ -21,6 +22,11 @@ class ConsoleReporter:
                     else ""
                 )
                 license_info = node.license if node.license else UNKNOWN
+                reason = getattr(node, "license_unresolved_reason", None)
+                if reason and not node.license:
+                    license_info += f" ({reason})"
+                if getattr(node, "license_from_config", False):
+                    license_info += f" ({RESOLVED_FROM_CONFIG})"
                 print(
                     f"{pre}{node.name} - {node.version} - {color}{license_info}{RESET}{normalized_info}"
                 )
@@ -0,0 +1,99 @@
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from license_sh.cache import LicenseCache
+from license_sh.fetcher import FetchStats
+from license_sh.remote_cache import RemoteCache
+from license_sh.types.nodes import PackageInfo
+
+# sources of license data, from the cheapest to the most expensive
+LOCKFILE = "lockfile"
+INSTALLED = "installed"
+CACHE = "cache"
+LICENSE_DB = "license-db"
+NPM_CACHE = "npm-cache"
+REMOTE_CACHE = "remote-cache"
+REGISTRY = "registry"
+
+Resolver = Callable[[List[PackageInfo]], Dict[PackageInfo, Optional[str]]]
+Tier = Tuple[str, Resolver]
+
+
+class LookupOptions(NamedTuple):
+    """
+    Options of a license lookup, shared by the npm and PyPI lookups.
+    """
+    tiers: Optional[List[Tier]] = None  # sources tried before the caches, cheapest first
+    private_packages: Optional[List[str]] = None  # name patterns of packages never looked up remotely
+    config_packages: Optional[Set[str]] = None  # keys of packages ignored or overridden by the config
+    registry: Optional[str] = None  # registry base url, the configured or public one by default
+    use_cache: bool = True  # use the persistent license cache and the remote cache
+    use_npm_cache: bool = True  # resolve npm packages from npm's _cacache before the registry
+    stats: Optional[FetchStats] = None  # collects counts and sources of the licenses
+    on_license: Optional[Callable[[PackageInfo, Optional[str]], None]] = None  # sees each license once known
+    debug: bool = False  # print adjustments of registry concurrency
+
+
+def resolve_chain(
+    packages: Iterable[Tuple[str, str]], tiers: Iterable[Tier], stats: FetchStats
+) -> Tuple[Dict[PackageInfo, Optional[str]], List[PackageInfo]]:
+    """Resolve licenses with a chain of sources, each package stops at the first source that answers
+
+    A source answers a package by returning it, None marks a package known to have no license.
+    The source of every answered package is recorded in stats.
+
+    Args:
+        packages (Iterable[Tuple[str, str]]): (name, version) pairs to resolve
+        tiers (Iterable[Tier]): (source, resolver) pairs, cheapest first
+        stats (FetchStats): Collects the source of each package
+
+    Returns:
+        Tuple[Dict, List]: Resolved licenses and packages no source answered, in the given order
+    """
+    resolved: Dict[PackageInfo, Optional[str]] = {}
+    missing = [PackageInfo(*package) for package in packages]
+    for source, resolve in tiers:
+        if not missing:
+            break
+        answered = resolve(missing)
+        for package, license in answered.items():
+            resolved[package] = license
+            stats.add_source(package, source)
+        missing = [package for package in missing if package not in answered]
+    return resolved, missing
+
+
+def get_known_resolver(licenses: Dict[PackageInfo, Optional[str]]) -> Resolver:
+    """Resolver answering packages with a license already known e.g. from the lockfile"""
+    return lambda packages: {package: licenses[package] for package in packages if licenses.get(package)}
+
+
+def store_lookups(
+    ecosystem: str,
+    registry: str,
+    cache: Optional[LicenseCache],
+    remote_cache: Optional[RemoteCache],
+    fetched: Dict[PackageInfo, Optional[str]],
+    from_remote: Dict[PackageInfo, Optional[str]],
+    not_found: Dict[PackageInfo, str],
+    integrities: Optional[Dict[PackageInfo, str]] = None,
+) -> None:
+    """Keep results of a lookup for the next run
+
+    Fetched licenses are stored in the local and the remote cache, licenses of the remote cache
+    only locally and packages the registry didn't know in the negative cache of the registry.
+
+    Args:
+        ecosystem (str): Ecosystem of the packages
+        registry (str): Registry base url the packages were looked up on
+        cache (LicenseCache, optional): Persistent cache, None when disabled
+        remote_cache (RemoteCache, optional): Remote cache, None when disabled
+        fetched (Dict[PackageInfo, Optional[str]]): Licenses fetched from the registry or a local source
+        from_remote (Dict[PackageInfo, Optional[str]]): Licenses answered by the remote cache
+        not_found (Dict[PackageInfo, str]): Packages the registry didn't know, reason as value
+        integrities (Dict[PackageInfo, str], optional): Lockfile integrity hashes
+    """
+    if cache is not None:
+        cache.set_many(ecosystem, {**from_remote, **fetched}, integrities)
+        cache.set_not_found(ecosystem, registry, not_found)
+    if remote_cache is not None:
+        remote_cache.set_many(ecosystem, fetched)
@@ -1,3 +1,6 @@
+from typing import Dict, List, Optional, Set
+
+from ..fail_fast import FailFast
 from ..project_identifier import ProjectType
 from ..runners.maven import MavenRunner
 from ..runners.npm import NpmRunner
@@ -13,8 +16,20 @@ RUNNERS = {
 }
 
 
-def run_check(project_to_check: ProjectType, path: str, silent: bool, debug: bool) -> PackageNode:
+def run_check(
+    project_to_check: ProjectType,
+    path: str,
+    silent: bool,
+    debug: bool,
+    private_packages: Optional[List[str]] = None,
+    config_packages: Optional[Set[str]] = None,
+    fail_fast: Optional[FailFast] = None,
+    registries: Optional[Dict[str, str]] = None,
+) -> PackageNode:
     runner = RUNNERS.get(project_to_check)
     assert runner, f"This runner ({project_to_check.value}) is not supported"
 
-    return runner(path, silent, debug).check()
+    if runner is MavenRunner:
+        # maven resolves the packages and their licenses itself, there are no lookups to configure
+        return MavenRunner(path, silent, debug, fail_fast).check()
+    return runner(path, silent, debug, private_packages, config_packages, fail_fast, registries).check()
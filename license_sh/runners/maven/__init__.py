@@ -11,11 +11,12 @@ from typing import Dict, Optional
 from anytree import AnyNode, PreOrderIter
 from yaspin import yaspin
 
-from license_sh.helpers import get_initiated_text
+from license_sh.fail_fast import FailFast
+from license_sh.helpers import get_breadth_first_dependencies, get_initiated_text
 from license_sh.project_identifier import ProjectType
 from license_sh.runners import maven
 from license_sh.runners.abstract_runner import AbstractRunner
-from license_sh.runners.runners_shared import check_maven
+from license_sh.runners.runners_shared import check_maven, get_maven_offline_flags
 
 DEPENDENCY_JAR = path.join(
     Path(__file__).parent,
@@ -42,12 +43,13 @@ def get_dependency_tree_xml(directory: str, debug=False):
     """
 
     with resources.path(maven, "pom.xml") as maven_path:
-        subprocess.run(["mvn", "install", f"-f={maven_path}"], capture_output=not debug)
+        subprocess.run(["mvn", *get_maven_offline_flags(), "install", f"-f={maven_path}"], capture_output=not debug)
 
     with resources.path(maven, "maven-dependency-plugin-3.1.1-Licensesh.jar") as maven_path:
         subprocess.run(
             [
                 "mvn",
+                *get_maven_offline_flags(),
                 "install:install-file",
                 f"-Dfile={maven_path}",
                 f"-DgroupId={GROUP_ID}",
@@ -62,6 +64,7 @@ def get_dependency_tree_xml(directory: str, debug=False):
         subprocess.run(
             [
                 "mvn",
+                *get_maven_offline_flags(),
                 f"{GROUP_ID}:{ARTIFACT_ID}:{VERSION}:tree",
                 "-DoutputType=xml",
                 f"-DoutputFile={tmpfile.name}",
@@ -95,6 +98,7 @@ def get_license_xml_file(directory: str, debug: bool) -> ET.Element:
         subprocess.run(
             [
                 "mvn",
+                *get_maven_offline_flags(),
                 "license:download-licenses",
                 f"-DlicensesOutputDirectory={dirpath}",
                 "-DskipDownloadLicenses=true",
@@ -198,10 +202,17 @@ class MavenRunner(AbstractRunner):
     for each of the packages (including transitive dependencies)
     """
 
-    def __init__(self, directory: str, silent: bool, debug: bool):
+    def __init__(
+        self,
+        directory: str,
+        silent: bool,
+        debug: bool,
+        fail_fast: Optional[FailFast] = None,
+    ):
         self.directory = directory
         self.silent = silent
         self.debug = debug
+        self.fail_fast = fail_fast
 
     def check(self):
         check_maven()
@@ -216,11 +227,21 @@ class MavenRunner(AbstractRunner):
 
         with yaspin(text="Analysing dependencies ...") if not self.silent else nullcontext():
             dep_tree = parse_dependency_xml(xml_tree)
-            license_map = parse_licenses_xml(
-                get_license_xml_file(self.directory, self.debug)
-            )
+
+        # licenses overridden by the config are checked before maven downloads the rest
+        if self.fail_fast:
+            self.fail_fast.watch(dep_tree)
+
+        with yaspin(text="Getting licenses ...") if not self.silent else nullcontext():
+            license_map = parse_licenses_xml(get_license_xml_file(self.directory, self.debug))
 
         for node in PreOrderIter(dep_tree):
             node.license = license_map.get(f"{node.name}@{node.version}", "")
 
+        # all licenses come from a single maven run, only packages of the tree are checked,
+        # in breadth-first order
+        if self.fail_fast:
+            for package in get_breadth_first_dependencies(dep_tree):
+                self.fail_fast.check(package, license_map.get(f"{package.name}@{package.version}"))
+
         return dep_tree
@@ -2,14 +2,21 @@ import json
 import sys
 from contextlib import nullcontext
 from os import path
+from typing import Dict, List, Optional, Set
 
 from anytree import AnyNode, PreOrderIter
 from yaspin import yaspin
 
-from license_sh.helpers import get_initiated_text
+from license_sh.cache import NPM
+from license_sh.fail_fast import FailFast
+from license_sh.fetcher import FetchStats, add_unresolved_reasons, report_fetch_stats
+from license_sh.helpers import get_breadth_first_dependencies, get_initiated_text
 from license_sh.project_identifier import ProjectType
+from license_sh.registries import get_registry
+from license_sh.resolvers import INSTALLED, LOCKFILE, LookupOptions, get_known_resolver, resolve_chain
 from license_sh.runners.abstract_runner import AbstractRunner
-from license_sh.runners.runners_shared import fetch_npm_licenses
+from license_sh.runners.runners_shared import fetch_npm_licenses, get_installed_npm_resolver
+from license_sh.types.nodes import PackageInfo
 
 
 def flatten_package_lock_dependencies(package_lock_dependencies):
@@ -37,6 +44,22 @@ def flatten_package_lock_dependencies(package_lock_dependencies):
     return set(root_deps)
 
 
+def get_package_lock_integrities(package_lock_dependencies):
+    """
+    Collects integrity hashes of all package.lock dependencies
+    :param package_lock_dependencies:
+    :return: dict with PackageInfo as key and integrity hash as value
+    """
+    integrities = {}
+    for name, dep in package_lock_dependencies.items():
+        if dep.get("integrity"):
+            integrities[PackageInfo(name, dep.get("version"))] = dep.get("integrity")
+        if dep.get("dependencies"):
+            integrities.update(get_package_lock_integrities(dep.get("dependencies")))
+
+    return integrities
+
+
 def add_nested_dependencies(dependency, package_lock_tree, parent):
     for name, version_request in dependency.get("requires", {}).items():
         node = AnyNode(
@@ -96,18 +119,114 @@ def get_dependency_tree(package_json, package_lock_tree):
     return root
 
 
+NODE_MODULES = "node_modules/"
+
+
+def resolve_package_path(packages, parent_path, name):
+    """
+    Resolves a dependency the way node does, looking into node_modules of the
+    requiring package and then of each of its ancestors up to the root
+    :param packages: "packages" section of package-lock.json v2/v3
+    :param parent_path: path of the requiring package, "" for the root
+    :param name: name of the dependency
+    :return: path of the resolved package or None
+    """
+    path = parent_path
+    while True:
+        candidate = f"{path}/{NODE_MODULES}{name}" if path else f"{NODE_MODULES}{name}"
+        if candidate in packages:
+            return candidate
+        if not path:
+            return None
+        parent_index = path.rfind(f"/{NODE_MODULES}")
+        path = path[:parent_index] if parent_index != -1 else ""
+
+
+def add_package_dependencies(packages, package_path, package, parent, ancestors):
+    """
+    Recursively adds dependencies of a package from package-lock.json v2/v3
+    :param packages: "packages" section of package-lock.json
+    :param package_path: path of the package whose dependencies are added
+    :param package: lockfile entry of the package
+    :param parent: node of the package
+    :param ancestors: paths of packages on the way from the root, to prevent cycles
+    """
+    dependencies = list(package.get("dependencies", {}).keys())
+    dependencies += list(package.get("optionalDependencies", {}).keys())
+    for name in dependencies:
+        dep_path = resolve_package_path(packages, package_path, name)
+        if dep_path is None:
+            continue  # optional dependency that wasn't installed
+        dep = packages[dep_path]
+        if dep.get("link"):
+            dep_path = dep.get("resolved")
+            dep = packages.get(dep_path, {})
+
+        node = AnyNode(
+            name=dep.get("name", name),
+            version=dep.get("version"),
+            parent=parent,
+            license=dep.get("license"),
+            integrity=dep.get("integrity"),
+        )
+        if dep_path not in ancestors:
+            add_package_dependencies(packages, dep_path, dep, node, ancestors | {dep_path})
+
+
+def get_dependency_tree_from_packages(package_json, packages):
+    """
+    Builds the dependency tree from the flat "packages" section of package-lock.json v2/v3
+    :param package_json:
+    :param packages:
+    :return: dependency tree, nodes carry license and integrity found in the lockfile
+    """
+    root = AnyNode(
+        name=package_json.get("name", "package.json"),
+        version=package_json.get("version"),
+        license=None,
+        integrity=None,
+    )
+
+    for dep_name in package_json.get("dependencies", {}).keys():
+        if resolve_package_path(packages, "", dep_name) is None:
+            print(
+                f"{dep_name} package not found in package-lock.json", file=sys.stderr,
+            )
+            exit(1)
+
+    root_package = dict(packages.get("", {}))
+    root_package["dependencies"] = package_json.get("dependencies", {})
+    root_package.pop("optionalDependencies", None)
+    add_package_dependencies(packages, "", root_package, root, set())
+
+    return root
+
+
 class NpmRunner(AbstractRunner):
     """
     This class checks for dependencies in NPM projects and fetches license info
     for each of the packages (including transitive dependencies)
     """
 
-    def __init__(self, directory: str, silent: bool, debug: bool):
+    def __init__(
+        self,
+        directory: str,
+        silent: bool,
+        debug: bool,
+        private_packages: Optional[List[str]] = None,
+        config_packages: Optional[Set[str]] = None,
+        fail_fast: Optional[FailFast] = None,
+        registries: Optional[Dict[str, str]] = None,
+    ):
         self.directory = directory
         self.silent = silent
         self.package_json_path = path.join(directory, "package.json")
         self.package_lock_path = path.join(directory, "package-lock.json")
         self.debug = debug
+        self.private_packages = private_packages
+        self.config_packages = config_packages
+        self.fail_fast = fail_fast
+        self.registries = registries
 
     def check(self):
         with open(self.package_json_path) as package_json_file:
@@ -124,16 +243,91 @@ class NpmRunner(AbstractRunner):
         if not self.silent:
             print(get_initiated_text(ProjectType.NPM, project_name, self.directory))
 
+        if "packages" in package_lock:
+            return self.check_packages(package_json, package_lock["packages"])
+
         with yaspin(text="Analysing dependencies ...") if not self.silent else nullcontext():
             dep_tree = get_dependency_tree(package_json, all_dependencies)
-            flat_dependencies = flatten_package_lock_dependencies(all_dependencies)
+            # only packages reachable from package.json end up in the report
+            flat_dependencies = get_breadth_first_dependencies(dep_tree)
+
+        if self.fail_fast:
+            self.fail_fast.watch(dep_tree)
 
+        stats = FetchStats()
         with yaspin(text="Fetching license info from npm ...") if not self.silent else nullcontext():
-            license_map = fetch_npm_licenses(flat_dependencies)
+            license_map = fetch_npm_licenses(
+                flat_dependencies,
+                get_package_lock_integrities(all_dependencies),
+                LookupOptions(
+                    tiers=[(INSTALLED, get_installed_npm_resolver(self.directory))],
+                    private_packages=self.private_packages,
+                    config_packages=self.config_packages,
+                    registry=get_registry(NPM, self.registries),
+                    stats=stats,
+                    on_license=self.fail_fast.check if self.fail_fast else None,
+                    debug=self.debug,
+                ),
+            )
+        report_fetch_stats(stats, self.silent, self.debug)
 
         for node in PreOrderIter(dep_tree):
             delattr(node, "dependencies")
             hasattr(node, "version_request") and delattr(node, "version_request")
             node.license = license_map.get(f"{node.name}@{node.version}", None)
+        add_unresolved_reasons(dep_tree, stats)
+
+        return dep_tree
+
+    def check_packages(self, package_json, packages):
+        """
+        Checks package-lock.json v2/v3, licenses are taken from the lockfile and only
+        packages without a license there are looked up further
+        """
+        with yaspin(text="Analysing dependencies ...") if not self.silent else nullcontext():
+            dep_tree = get_dependency_tree_from_packages(package_json, packages)
+            lockfile_licenses = {
+                PackageInfo(node.name, node.version): node.license
+                for node in PreOrderIter(dep_tree)
+                if node.license
+            }
+            integrities = {
+                PackageInfo(node.name, node.version): node.integrity
+                for node in PreOrderIter(dep_tree)
+                if node.integrity
+            }
+
+        # licenses from the lockfile are checked before anything is fetched
+        if self.fail_fast:
+            self.fail_fast.watch(dep_tree)
+
+        stats = FetchStats()
+        # the lockfile is the first source, the rest of the chain only sees what it didn't answer
+        _, missing_licenses = resolve_chain(
+            get_breadth_first_dependencies(dep_tree), [(LOCKFILE, get_known_resolver(lockfile_licenses))], stats
+        )
+        license_map = {}
+        if missing_licenses:
+            with yaspin(text="Fetching license info from npm ...") if not self.silent else nullcontext():
+                license_map = fetch_npm_licenses(
+                    missing_licenses,
+                    integrities,
+                    LookupOptions(
+                        tiers=[(INSTALLED, get_installed_npm_resolver(self.directory))],
+                        private_packages=self.private_packages,
+                        config_packages=self.config_packages,
+                        registry=get_registry(NPM, self.registries),
+                        stats=stats,
+                        on_license=self.fail_fast.check if self.fail_fast else None,
+                        debug=self.debug,
+                    ),
+                )
+            report_fetch_stats(stats, self.silent, self.debug)
+
+        for node in PreOrderIter(dep_tree):
+            delattr(node, "integrity")
+            if not node.license:
+                node.license = license_map.get(f"{node.name}@{node.version}", None)
+        add_unresolved_reasons(dep_tree, stats)
 
         return dep_tree
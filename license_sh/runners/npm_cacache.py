@@ -0,0 +1,199 @@
+import base64
+import binascii
+import hashlib
+import json
+import os
+import tarfile
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from license_sh.helpers import extract_npm_license
+from license_sh.types.nodes import PackageInfo
+
+NPM_CACHE_ENV = "npm_config_cache"
+CACHE_KEY_PREFIX = "make-fetch-happen:request-cache:"
+INDEX_DIR = "index-v5"
+CONTENT_DIR = "content-v2"
+SUPPORTED_ALGORITHMS = ("sha512", "sha256", "sha1")
+
+
+def get_npm_cache_dir() -> str:
+    """Get location of npm's content-addressable cache
+
+    Returns:
+        str: Path to the _cacache directory
+    """
+    npm_cache = os.environ.get(NPM_CACHE_ENV) or os.path.join(os.path.expanduser("~"), ".npm")
+    return os.path.join(npm_cache, "_cacache")
+
+
+def get_index_path(cache_dir: str, key: str) -> str:
+    hashed = hashlib.sha256(key.encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, INDEX_DIR, hashed[0:2], hashed[2:4], hashed[4:])
+
+
+def get_content_path(cache_dir: str, integrity: str) -> Optional[str]:
+    """Get path of a content blob from its subresource integrity string
+
+    Args:
+        cache_dir (str): Path to the _cacache directory
+        integrity (str): Integrity e.g. "sha512-<base64 digest>", might contain several hashes
+
+    Returns:
+        Optional[str]: Path to the blob or None for unsupported integrity strings
+    """
+    for item in integrity.split():
+        algorithm, _, digest = item.partition("-")
+        if algorithm not in SUPPORTED_ALGORITHMS:
+            continue
+        try:
+            hex_digest = base64.b64decode(digest.split("?")[0]).hex()
+        except (binascii.Error, ValueError):
+            continue
+        return os.path.join(cache_dir, CONTENT_DIR, algorithm, hex_digest[0:2], hex_digest[2:4], hex_digest[4:])
+    return None
+
+
+def read_index_entry(cache_dir: str, key: str) -> Optional[Dict]:
+    """Read the newest index entry of a key
+
+    Index buckets are append-only files with "<sha1 of entry>\\t<entry json>" lines,
+    the last entry for the key wins and an entry without integrity means it was deleted.
+
+    Args:
+        cache_dir (str): Path to the _cacache directory
+        key (str): Cache key
+
+    Returns:
+        Optional[Dict]: Index entry or None if not found
+    """
+    try:
+        with open(get_index_path(cache_dir, key), "r", encoding="utf-8") as bucket:
+            lines = bucket.read().splitlines()
+    except OSError:
+        return None
+
+    entry = None
+    for line in lines:
+        checksum, _, data = line.partition("\t")
+        if not data or hashlib.sha1(data.encode("utf-8")).hexdigest() != checksum:
+            continue  # corrupted or partially written line
+        try:
+            item = json.loads(data)
+        except json.JSONDecodeError:
+            continue
+        if item.get("key") == key:
+            entry = item
+    return entry if entry and entry.get("integrity") else None
+
+
+def read_tarball_package_json(path: str) -> Optional[Dict]:
+    """Read package.json from a gzipped package tarball without unpacking the rest
+
+    Args:
+        path (str): Path to the tarball
+
+    Returns:
+        Optional[Dict]: Parsed package.json or None
+    """
+    try:
+        with tarfile.open(path, "r|gz") as tarball:
+            for member in tarball:
+                parts = member.name.split("/")
+                if len(parts) == 2 and parts[1] == "package.json" and member.isfile():
+                    package_file = tarball.extractfile(member)
+                    return json.load(package_file) if package_file else None
+    except (OSError, tarfile.TarError, EOFError, ValueError):
+        return None
+    return None
+
+
+def read_json_content(path: str) -> Optional[Dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as content:
+            return json.load(content)
+    except (OSError, ValueError):
+        return None
+
+
+def get_tarball_url(registry: str, name: str, version: str) -> str:
+    *_, unscoped_name = name.split("/")
+    return f"{registry}/{name}/-/{unscoped_name}-{version}.tgz"
+
+
+def get_packument_url(registry: str, name: str) -> str:
+    return f"{registry}/{name.replace('/', '%2f')}"
+
+
+def resolve_package_license(
+    cache_dir: str, registry: str, package: PackageInfo, integrity: Optional[str] = None
+) -> Optional[str]:
+    """Resolve license of a single package from the npm cache
+
+    Tries the tarball addressed by the lockfile integrity, the tarball found through
+    the index and finally the cached packument.
+
+    Args:
+        cache_dir (str): Path to the _cacache directory
+        registry (str): Registry base url used by npm
+        package (PackageInfo): Package to resolve
+        integrity (str, optional): Lockfile integrity of the package tarball
+
+    Returns:
+        Optional[str]: License or None when the cache can't answer
+    """
+    tarball_paths: List[Optional[str]] = []
+    if integrity:
+        tarball_paths.append(get_content_path(cache_dir, integrity))
+    tarball_entry = read_index_entry(
+        cache_dir, CACHE_KEY_PREFIX + get_tarball_url(registry, package.name, package.version)
+    )
+    if tarball_entry:
+        tarball_paths.append(get_content_path(cache_dir, tarball_entry["integrity"]))
+
+    for path in tarball_paths:
+        if path and os.path.isfile(path):
+            package_json = read_tarball_package_json(path)
+            license = extract_npm_license(package_json, package.version)
+            if license:
+                return license
+
+    # abbreviated packuments (used by npm install) don't carry licenses, full ones do
+    packument_entry = read_index_entry(cache_dir, CACHE_KEY_PREFIX + get_packument_url(registry, package.name))
+    if packument_entry:
+        path = get_content_path(cache_dir, packument_entry["integrity"])
+        packument = read_json_content(path) if path else None
+        if packument and package.version in packument.get("versions", {}):
+            return extract_npm_license(packument, package.version)
+
+    return None
+
+
+def resolve_from_npm_cache(
+    packages: Iterable[Tuple[str, str]],
+    registry: str,
+    integrities: Optional[Dict[PackageInfo, str]] = None,
+    cache_dir: Optional[str] = None,
+) -> Dict[PackageInfo, str]:
+    """Answer license queries from npm's local cache, with no network at all
+
+    Args:
+        packages (Iterable[Tuple[str, str]]): (name, version) pairs to resolve
+        registry (str): Registry base url used by npm
+        integrities (Dict[PackageInfo, str], optional): Lockfile integrity hashes
+        cache_dir (str, optional): Path to the _cacache directory. Defaults to npm's cache.
+
+    Returns:
+        Dict[PackageInfo, str]: Licenses of packages found in the cache
+    """
+    cache_dir = cache_dir or get_npm_cache_dir()
+    if not os.path.isdir(cache_dir):
+        return {}
+
+    integrities = integrities or {}
+    licenses = {}
+    for package in packages:
+        package = PackageInfo(*package)
+        license = resolve_package_license(cache_dir, registry, package, integrities.get(package))
+        if license:
+            licenses[package] = license
+    return licenses
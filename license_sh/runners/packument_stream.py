@@ -0,0 +1,294 @@
+import codecs
+import json
+import re
+from typing import Any, Dict, Iterable, List, Match, Optional, Pattern, Tuple
+
+WHITESPACE = re.compile(r"\s*")
+STRING = re.compile(r'"(?:[^"\\]|\\.)*"', re.S)
+STRING_BODY = re.compile(r'(?:[^"\\]|\\.)*', re.S)
+SCALAR = re.compile(r"[^,}\]\s]*")
+CONTAINER_BODY = re.compile(r'[^"{}\[\]]*')
+
+LICENSE_FIELDS = ("license", "licenses")
+TOP_LEVEL_FIELDS = ("name",) + LICENSE_FIELDS
+VERSIONS = "versions"
+TIME = "time"
+MODIFIED = "modified"
+
+decoder = json.JSONDecoder()
+
+
+class _NeedMore(Exception):
+    """
+    Raised by the parser when the buffer ends in the middle of a token.
+    """
+
+
+class PackumentLicenseExtractor:
+    """
+    Incremental parser of npm packuments which keeps only the fields needed to
+    resolve licenses and drops everything else while the document streams in.
+
+    The result has the shape of a packument reduced to:
+
+        {
+            "name": "package",
+            "license": "MIT",
+            "licenses": [...],
+            "versions": {"1.0.0": {"license": "MIT"}},
+            "time": {"modified": "2021-02-20T15:42:16.891Z"}
+        }
+
+    so it can be passed to extract_npm_license as is.
+
+    Usage:
+        extractor = PackumentLicenseExtractor(["1.0.0"])
+        for chunk in chunks:
+            extractor.feed(chunk)
+        page = extractor.close()
+    """
+
+    def __init__(self, versions: Optional[Iterable[str]] = None):
+        """
+        :param versions: versions whose license should be kept, None keeps all of them
+        """
+        self.versions = set(versions) if versions is not None else None
+        self.result: Dict[str, Any] = {}
+        self.text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buf = ""
+        self.pos = 0
+        self.finished = False
+        self.state = "start"
+        self.stack: List[Tuple[str, ...]] = []  # paths of objects the parser descended into
+        self.key = ""
+        self.skip_mode = ""
+        self.skip_depth = 0
+        self.skip_in_string = False
+
+    def feed(self, chunk: bytes) -> None:
+        self.buf = self.buf[self.pos:] + self.text_decoder.decode(chunk)
+        self.pos = 0
+        self._parse()
+
+    def close(self) -> Dict[str, Any]:
+        """Finish parsing
+
+        Raises:
+            ValueError: When the document isn't a complete JSON object
+
+        Returns:
+            Dict[str, Any]: Reduced packument
+        """
+        self.buf = self.buf[self.pos:] + self.text_decoder.decode(b"", final=True)
+        self.pos = 0
+        self.finished = True
+        self._parse()
+        if self.state != "end":
+            raise ValueError("Unexpected end of packument")
+        return self.result
+
+    def _parse(self) -> None:
+        try:
+            while self.state != "end":
+                getattr(self, f"_state_{self.state}")()
+        except _NeedMore:
+            if self.finished:
+                raise ValueError("Unexpected end of packument")
+
+    def _match(self, pattern: Pattern) -> Match:
+        match = pattern.match(self.buf, self.pos)
+        assert match, "Patterns used for skipping always match"
+        return match
+
+    def _peek(self) -> str:
+        self.pos = self._match(WHITESPACE).end()
+        if self.pos >= len(self.buf):
+            raise _NeedMore()
+        return self.buf[self.pos]
+
+    def _expect(self, chars: str) -> str:
+        char = self._peek()
+        if char not in chars:
+            raise ValueError(f"Unexpected '{char}' in packument at {self.pos}")
+        self.pos += 1
+        return char
+
+    def _should_enter(self, path: Tuple[str, ...]) -> bool:
+        if path in ((VERSIONS,), (TIME,)):
+            return True
+        return (
+            len(path) == 2
+            and path[0] == VERSIONS
+            and (self.versions is None or path[1] in self.versions)
+        )
+
+    def _should_capture(self, path: Tuple[str, ...]) -> bool:
+        if len(path) == 1:
+            return path[0] in TOP_LEVEL_FIELDS
+        if path == (TIME, MODIFIED):
+            return True
+        return len(path) == 3 and path[0] == VERSIONS and path[2] in LICENSE_FIELDS
+
+    def _store(self, path: Tuple[str, ...], value: Any) -> None:
+        target = self.result
+        for key in path[:-1]:
+            target = target.setdefault(key, {})
+        target[path[-1]] = value
+
+    def _after_value(self) -> None:
+        self.state = "comma" if self.stack else "end"
+
+    def _state_start(self) -> None:
+        self._expect("{")
+        self.stack.append(())
+        self.state = "first_key"
+
+    def _state_first_key(self) -> None:
+        if self._peek() == "}":
+            self._close_object()
+        else:
+            self._state_key()
+
+    def _state_key(self) -> None:
+        if self._peek() != '"':
+            raise ValueError(f"Expected a key in packument at {self.pos}")
+        match = STRING.match(self.buf, self.pos)
+        if not match:
+            raise _NeedMore()
+        key = match.group()
+        self.key = json.loads(key) if "\\" in key else key[1:-1]
+        self.pos = match.end()
+        self.state = "colon"
+
+    def _state_colon(self) -> None:
+        self._expect(":")
+        self.state = "value"
+
+    def _state_value(self) -> None:
+        char = self._peek()
+        path = self.stack[-1] + (self.key,)
+        if char == "{" and self._should_enter(path):
+            if len(path) == 2 and path[0] == VERSIONS:
+                self.result.setdefault(VERSIONS, {})[path[1]] = {}  # keep versions without license too
+                if self._read_buffered_version(path):
+                    return
+            self.pos += 1
+            self.stack.append(path)
+            self.state = "first_key"
+        elif self._should_capture(path):
+            self._store(path, self._read_value(char))
+            self._after_value()
+        else:
+            self._start_skip(char)
+
+    def _read_buffered_version(self, path: Tuple[str, ...]) -> bool:
+        """Decode a version object at once when it's already buffered, that's much faster
+        than walking its keys one by one"""
+        try:
+            value, end = decoder.raw_decode(self.buf, self.pos)
+        except json.JSONDecodeError:
+            return False
+        self.pos = end
+        for field in LICENSE_FIELDS:
+            if field in value:
+                self._store(path + (field,), value[field])
+        self._after_value()
+        return True
+
+    def _state_comma(self) -> None:
+        if self._expect(",}") == ",":
+            self.state = "key"
+        else:
+            self.pos -= 1
+            self._close_object()
+
+    def _close_object(self) -> None:
+        self.pos += 1
+        self.stack.pop()
+        self._after_value()
+
+    def _read_value(self, char: str) -> Any:
+        if char in '"{[':
+            try:
+                value, self.pos = decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.finished:
+                    raise
+                raise _NeedMore()
+            return value
+
+        match = self._match(SCALAR)
+        if match.end() == len(self.buf) and not self.finished:
+            raise _NeedMore()  # the scalar might continue in the next chunk
+        self.pos = match.end()
+        return json.loads(match.group())
+
+    def _start_skip(self, char: str) -> None:
+        if char in "{[":
+            # Fast path, the whole value is already buffered
+            try:
+                _, self.pos = decoder.raw_decode(self.buf, self.pos)
+                self._after_value()
+                return
+            except json.JSONDecodeError:
+                self.skip_mode, self.skip_depth, self.skip_in_string = "container", 1, False
+        elif char == '"':
+            self.skip_mode, self.skip_depth, self.skip_in_string = "container", 0, True
+        else:
+            self.skip_mode = "scalar"
+        self.pos += 1 if self.skip_mode == "container" else 0
+        self.state = "skipping"
+
+    def _state_skipping(self) -> None:
+        if self.skip_mode == "scalar":
+            self._skip_scalar()
+        else:
+            self._skip_container()
+        self._after_value()
+
+    def _skip_scalar(self) -> None:
+        self.pos = self._match(SCALAR).end()
+        if self.pos == len(self.buf) and not self.finished:
+            raise _NeedMore()
+
+    def _skip_container(self) -> None:
+        while True:
+            if self.skip_in_string:
+                self.pos = self._match(STRING_BODY).end()
+                if self.pos >= len(self.buf) or self.buf[self.pos] != '"':
+                    raise _NeedMore()  # string or escape sequence continues in the next chunk
+                self.pos += 1
+                self.skip_in_string = False
+                if self.skip_depth == 0:
+                    return
+                continue
+
+            self.pos = self._match(CONTAINER_BODY).end()
+            if self.pos >= len(self.buf):
+                raise _NeedMore()
+            char = self.buf[self.pos]
+            self.pos += 1
+            if char == '"':
+                self.skip_in_string = True
+            elif char in "{[":
+                self.skip_depth += 1
+            else:
+                self.skip_depth -= 1
+                if self.skip_depth == 0:
+                    return
+
+
+def extract_packument_licenses(chunks: Iterable[bytes], versions: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """Reduce a packument to its license fields
+
+    Args:
+        chunks (Iterable[bytes]): Raw packument split into chunks
+        versions (Iterable[str], optional): Versions to keep, None keeps all of them
+
+    Returns:
+        Dict[str, Any]: Reduced packument
+    """
+    extractor = PackumentLicenseExtractor(versions)
+    for chunk in chunks:
+        extractor.feed(chunk)
+    return extractor.close()
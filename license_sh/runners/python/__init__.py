@@ -1,75 +1,116 @@
-import asyncio
-import json
 import os
-import subprocess
 from contextlib import nullcontext
-from json import JSONDecodeError
-from typing import Set, Dict
+from typing import Set, Dict, Iterable, List, Optional
 
-import aiohttp
 from anytree import PreOrderIter
 from yaspin import yaspin
 
-from license_sh.helpers import flatten_dependency_tree, get_initiated_text
+from license_sh.cache import PYPI, get_cache, skip_lookups, split_cached
+from license_sh.fetcher import (
+    FetchStats,
+    add_not_found,
+    add_unresolved_reasons,
+    check_offline,
+    report_fetch_stats,
+    report_known_licenses,
+)
+from license_sh.fail_fast import FailFast
+from license_sh.helpers import get_breadth_first_dependencies, get_initiated_text
+from license_sh.license_db import get_license_db, split_license_db
 from license_sh.project_identifier import ProjectType
+from license_sh.registries import get_registry
+from license_sh.remote_cache import get_remote_cache
+from license_sh.resolvers import (
+    CACHE,
+    INSTALLED,
+    LICENSE_DB,
+    REGISTRY,
+    REMOTE_CACHE,
+    LookupOptions,
+    resolve_chain,
+    store_lookups,
+)
 from license_sh.runners.abstract_runner import AbstractRunner
+from license_sh.runners.python.environment import (
+    Distribution,
+    get_dependency_tree,
+    get_metadata_resolver,
+    normalize_name,
+    read_environment,
+)
+from license_sh.runners.python.pipfile_lock import get_locked_packages, get_pipfile_packages, read_locked_metadata
+from license_sh.runners.python.pypi import fetch_index_metadata
 from license_sh.types.nodes import PackageNode, PackageInfo
 
 
-def add_nested_dependencies(dep, parent: PackageNode) -> None:
-    name = dep["package_name"]
-    version = dep["installed_version"]
-    dependencies = dep["dependencies"]
-
-    node = PackageNode(name=name, version=version, parent=parent)
-    for dep in dependencies:
-        add_nested_dependencies(dep, node)
-
-
-PYPI_HOST = "https://pypi.org/pypi"
-
-
 class PythonRunner(AbstractRunner):
-    def __init__(self, directory: str, silent: bool, debug: bool):
+    def __init__(
+        self,
+        directory: str,
+        silent: bool,
+        debug: bool,
+        private_packages: Optional[List[str]] = None,
+        config_packages: Optional[Set[str]] = None,
+        fail_fast: Optional[FailFast] = None,
+        registries: Optional[Dict[str, str]] = None,
+    ):
         self.directory = directory
         self.silent = silent
         self.pipfile_path: str = os.path.join(self.directory, "Pipfile")
         self.pipfile_lock_path: str = os.path.join(self.directory, "Pipfile.lock")
         self.debug = debug
+        self.private_packages = private_packages
+        self.config_packages = config_packages
+        self.fail_fast = fail_fast
+        self.registries = registries
 
     @staticmethod
-    def fetch_licenses(all_dependencies: Set[PackageInfo]) -> Dict[PackageInfo, str]:
-        license_map = {}
-
-        urls = [
-            f"{PYPI_HOST}/{package_name}/{version}/json"
-            for package_name, version in all_dependencies
-        ]
-
-        async def fetch(session, url):
-            async with session.get(url) as resp:
-                return await resp.text()
-                # Catch HTTP errors/exceptions here
-
-        async def fetch_concurrent(urls):
-            loop = asyncio.get_event_loop()
-            async with aiohttp.ClientSession() as session:
-                tasks = []
-                for u in urls:
-                    tasks.append(loop.create_task(fetch(session, u)))
-
-                for result in asyncio.as_completed(tasks):
-                    try:
-                        page = json.loads(await result)
-                        info = page.get("info", {})
-                        license_map[
-                            PackageInfo(name=info.get('name'), version=info.get('version'))
-                        ] = info.get("license", "Unknown")
-                    except JSONDecodeError:
-                        # TODO - investiage why does such a thing happen
-                        pass
-
-        asyncio.run(fetch_concurrent(urls))
+    def fetch_licenses(
+        all_dependencies: Iterable[PackageInfo], options: LookupOptions = LookupOptions()
+    ) -> Dict[PackageInfo, Optional[str]]:
+        cache = get_cache() if options.use_cache else None
+        remote_cache = get_remote_cache() if options.use_cache else None
+        license_db = get_license_db()
+        index: str = options.registry or get_registry(PYPI) or ""
+        packages = list(all_dependencies)
+        stats = options.stats if options.stats is not None else FetchStats()
+        license_map, missing = resolve_chain(
+            packages,
+            (options.tiers or []) + [
+                (CACHE, lambda missing: split_cached(cache, PYPI, missing)[0]),
+                (LICENSE_DB, lambda missing: split_license_db(license_db, PYPI, missing)[0]),
+                (REMOTE_CACHE, lambda missing: remote_cache.get_many(PYPI, missing) if remote_cache else {}),
+            ],
+            stats,
+        )
+        fetched: Dict[PackageInfo, Optional[str]] = {}
+        from_remote = {
+            package: license for package, license in license_map.items() if stats.sources[package] == REMOTE_CACHE
+        }
+        missing = skip_lookups(cache, PYPI, index, missing, options.private_packages, stats, options.config_packages)
+        check_offline(PYPI, missing)
+        not_found: Dict[PackageInfo, str] = {}
+        on_license = options.on_license or (lambda package, license: None)
+
+        def on_fetched(package, distribution):
+            license_map[package] = fetched[package] = distribution.license
+            stats.add_license(distribution.license)
+            stats.add_source(package, REGISTRY)
+            on_license(package, distribution.license)
+
+        def on_unresolved(package, reason):
+            if reason is None:
+                stats.failed += 1
+            else:
+                add_not_found(stats, not_found, [package], reason)
+            on_license(package, None)
+
+        try:
+            report_known_licenses(packages, license_map, stats.unresolved, on_license)
+            fetch_index_metadata(missing, index, on_fetched, on_unresolved, stats, options.debug, cache)
+        finally:
+            # licenses fetched before an early stop are kept for the next run
+            store_lookups(PYPI, index, cache, remote_cache, fetched, from_remote, not_found)
 
         return license_map
 
@@ -77,24 +118,58 @@ class PythonRunner(AbstractRunner):
         if not self.silent:
             print(get_initiated_text(ProjectType.PYTHON_PIPENV, None, self.directory))
 
+        stats = FetchStats()
         with yaspin(text="Analysing dependencies ...") if not self.silent else nullcontext():
-            result = subprocess.run(
-                ["pipdeptree", "--json-tree", "--local-only"],
-                capture_output=not self.debug,
+            # core metadata has both the dependencies and the licenses, of the packages pinned
+            # in Pipfile.lock or, without a lockfile, of the ones installed in the virtualenv
+            locked = os.path.isfile(self.pipfile_lock_path)
+            packages = get_locked_packages(self.pipfile_lock_path) if locked else []
+            metadata = (
+                read_locked_metadata(
+                    packages,
+                    read_environment(self.directory),
+                    get_cache(),
+                    get_registry(PYPI, self.registries) or "",
+                    stats,
+                    self.debug,
+                    self.private_packages,
+                    self.config_packages,
+                )
+                if locked
+                else {INSTALLED: read_environment(self.directory)}
             )
-            dep_tree = json.loads(result.stdout)
-
-            root = PackageNode(name="", version="")
-
-            for dep in dep_tree:
-                add_nested_dependencies(dep, root)
-
-            all_dependencies = flatten_dependency_tree(root)
+            # packages whose metadata couldn't be read have no dependencies in the tree
+            distributions = {
+                normalize_name(package.name): Distribution(package.name, package.version, None, [])
+                for package in packages
+            }
+            distributions.update((key, item) for by_source in metadata.values() for key, item in by_source.items())
+            root = get_dependency_tree(distributions, get_pipfile_packages(self.pipfile_path))
+            all_dependencies = get_breadth_first_dependencies(root)
+
+        if self.fail_fast:
+            self.fail_fast.watch(root)
 
         with yaspin(text="Fetching license info from pypi ...") if not self.silent else nullcontext():
-            license_map = PythonRunner.fetch_licenses(all_dependencies)
+            license_map = PythonRunner.fetch_licenses(
+                all_dependencies,
+                LookupOptions(
+                    tiers=[
+                        (source, get_metadata_resolver(by_source, with_unlicensed=source != INSTALLED))
+                        for source, by_source in metadata.items()
+                    ],
+                    private_packages=self.private_packages,
+                    config_packages=self.config_packages,
+                    registry=get_registry(PYPI, self.registries),
+                    stats=stats,
+                    on_license=self.fail_fast.check if self.fail_fast else None,
+                    debug=self.debug,
+                ),
+            )
+        report_fetch_stats(stats, self.silent, self.debug)
 
         for node in PreOrderIter(root):
             node.license = license_map.get(PackageInfo(name=node.name, version=node.version), None)
+        add_unresolved_reasons(root, stats)
 
         return root
@@ -0,0 +1,263 @@
+import base64
+import glob
+import hashlib
+import os
+import re
+import sysconfig
+from concurrent.futures import ThreadPoolExecutor
+from email.parser import HeaderParser
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set
+
+from packaging.markers import InvalidMarker, Marker
+
+from license_sh.resolvers import Resolver
+from license_sh.types.nodes import PackageInfo, PackageNode
+
+VIRTUAL_ENV_ENV = "VIRTUAL_ENV"
+WORKON_HOME_ENV = "WORKON_HOME"
+PIPENV_CUSTOM_VENV_NAME_ENV = "PIPENV_CUSTOM_VENV_NAME"
+
+METADATA_DIRS = (".dist-info", ".egg-info")
+METADATA_FILES = ("METADATA", "PKG-INFO")
+LICENSE_CLASSIFIER = "License :: "
+REQUIREMENT_NAME = re.compile(r"\s*([A-Za-z0-9][A-Za-z0-9._-]*)")
+
+
+class Distribution(NamedTuple):
+    """
+    Installed distribution read from its dist-info metadata.
+    """
+    name: str
+    version: str
+    license: Optional[str]
+    requires: List[str]  # normalized names of the required distributions
+
+
+def normalize_name(name: str) -> str:
+    """Normalize distribution name as PEP 503 does, "Foo_Bar" -> "foo-bar" """
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def get_pipenv_virtualenv(directory: str) -> Optional[str]:
+    """Get path of the virtualenv pipenv creates for the project outside of it
+
+    Pipenv names it after the project directory and a hash of the Pipfile path.
+    """
+    workon_home = os.environ.get(WORKON_HOME_ENV) or os.path.join(
+        os.path.expanduser("~"), ".local", "share", "virtualenvs"
+    )
+    custom_name = os.environ.get(PIPENV_CUSTOM_VENV_NAME_ENV)
+    if custom_name:
+        return os.path.join(workon_home, custom_name)
+
+    project = os.path.realpath(directory)
+    name = re.sub(r'[ &$`!*@"()\[\]\\\r\n\t]', "_", os.path.basename(project))[:42]
+    digest = hashlib.sha256(os.path.join(project, "Pipfile").encode()).digest()[:6]
+    path = os.path.join(workon_home, f"{name}-{base64.urlsafe_b64encode(digest).decode()[:8]}")
+    if os.path.isdir(path):
+        return path
+    # e.g. a virtualenv created for another python, its name has a suffix
+    candidates = glob.glob(os.path.join(glob.escape(workon_home), f"{glob.escape(name)}-*"))
+    return candidates[0] if len(candidates) == 1 else None
+
+
+def find_virtualenv(directory: str) -> Optional[str]:
+    """Find the virtualenv of a project: .venv in the project, the one of pipenv or the active one
+
+    Args:
+        directory (str): Project directory
+
+    Returns:
+        Optional[str]: Path of the virtualenv or None if there is none
+    """
+    candidates = [os.path.join(directory, ".venv"), get_pipenv_virtualenv(directory), os.environ.get(VIRTUAL_ENV_ENV)]
+    for candidate in candidates:
+        if candidate and os.path.isfile(os.path.join(candidate, "pyvenv.cfg")):
+            return candidate
+    return None
+
+
+def get_site_packages(directory: str) -> List[str]:
+    """Get site-packages directories of the project's virtualenv, the environment running
+    license-sh when the project has none
+
+    Args:
+        directory (str): Project directory
+
+    Returns:
+        List[str]: site-packages directories
+    """
+    virtualenv = find_virtualenv(directory)
+    if virtualenv is None:
+        paths = sysconfig.get_paths()
+        return list(dict.fromkeys([paths["purelib"], paths["platlib"]]))
+    patterns = ["lib/python*/site-packages", "lib64/python*/site-packages", "Lib/site-packages"]
+    return [
+        path
+        for pattern in patterns
+        for path in sorted(glob.glob(os.path.join(glob.escape(virtualenv), pattern)))
+        if os.path.isdir(path)
+    ]
+
+
+def get_metadata_license(license_expressions: List[str], licenses: List[str], classifiers: List[str]) -> Optional[str]:
+    """Get license of a distribution from its metadata
+
+    License-Expression is preferred, then the License field unless it holds a whole license text,
+    then License classifiers, several of them are joined with AND like npm licenses arrays.
+    """
+    for license in license_expressions + licenses:
+        license = license.strip()
+        if license and license != "UNKNOWN" and "\n" not in license:
+            return license
+    names = [
+        classifier.split(" :: ")[-1]
+        for classifier in classifiers
+        if classifier.startswith(LICENSE_CLASSIFIER) and classifier.split(" :: ")[-1] != "OSI Approved"
+    ]
+    return " AND ".join(dict.fromkeys(names)) or None
+
+
+def is_required(marker: str) -> bool:
+    """Evaluate environment marker of a requirement, requirements of extras aren't installed by default"""
+    try:
+        return Marker(marker).evaluate({"extra": ""})
+    except InvalidMarker:
+        return False
+
+
+def get_required_names(requirements: List[str]) -> List[str]:
+    """Get normalized names of distributions listed in Requires-Dist
+
+    Example:
+        ["idna (>=2.5) ; python_version >= '3'", "PySocks ; extra == 'socks'"] -> ["idna"]
+    """
+    names = []
+    for requirement in requirements:
+        requirement, _, marker = requirement.partition(";")
+        match = REQUIREMENT_NAME.match(requirement)
+        if match and (not marker.strip() or is_required(marker.strip())):
+            names.append(normalize_name(match.group(1)))
+    return list(dict.fromkeys(names))
+
+
+def parse_metadata(text: str) -> Optional[Distribution]:
+    """Parse METADATA (or PKG-INFO) of a distribution
+
+    Args:
+        text (str): Content of the metadata file
+
+    Returns:
+        Optional[Distribution]: The distribution or None if the metadata has no name or version
+    """
+    message = HeaderParser().parsestr(text)
+    name, version = message.get("Name"), message.get("Version")
+    if not name or not version:
+        return None
+    return Distribution(
+        name=name,
+        version=version,
+        license=get_metadata_license(
+            message.get_all("License-Expression", []), message.get_all("License", []), message.get_all("Classifier", [])
+        ),
+        requires=get_required_names(message.get_all("Requires-Dist", [])),
+    )
+
+
+def read_distribution(path: str) -> Optional[Distribution]:
+    for file_name in METADATA_FILES:
+        try:
+            with open(os.path.join(path, file_name), encoding="utf-8", errors="replace") as file:
+                return parse_metadata(file.read())
+        except OSError:
+            continue
+    return None
+
+
+def read_distributions(site_packages: Iterable[str]) -> Dict[str, Distribution]:
+    """Read metadata of every distribution installed in site-packages directories
+
+    Directories are listed with a single os.scandir pass and metadata files are read in parallel.
+
+    Args:
+        site_packages (Iterable[str]): site-packages directories, earlier ones take precedence
+
+    Returns:
+        Dict[str, Distribution]: Normalized name as key
+    """
+    paths = []
+    for directory in site_packages:
+        try:
+            with os.scandir(directory) as entries:
+                paths += [entry.path for entry in entries if entry.name.endswith(METADATA_DIRS) and entry.is_dir()]
+        except OSError:
+            continue
+
+    with ThreadPoolExecutor(thread_name_prefix="license-sh-metadata") as executor:
+        distributions = list(executor.map(read_distribution, paths))
+
+    result: Dict[str, Distribution] = {}
+    for distribution in distributions:
+        if distribution is not None:
+            result.setdefault(normalize_name(distribution.name), distribution)
+    return result
+
+
+def add_distribution(distribution: Distribution, distributions: Dict[str, Distribution], parent: PackageNode,
+                     ancestors: Set[str]) -> None:
+    key = normalize_name(distribution.name)
+    node = PackageNode(name=distribution.name, version=distribution.version, parent=parent)
+    # requirements which aren't installed aren't part of the tree, cycles are cut
+    for name in distribution.requires:
+        if name in distributions and name not in ancestors:
+            add_distribution(distributions[name], distributions, node, ancestors | {key})
+
+
+def get_dependency_tree(
+    distributions: Dict[str, Distribution], top_level: Optional[Iterable[str]] = None
+) -> PackageNode:
+    """Build dependency tree of distributions from their Requires-Dist
+
+    Distributions no other one requires are top level dependencies too.
+
+    Args:
+        distributions (Dict[str, Distribution]): Result of read_distributions
+        top_level (Iterable[str], optional): Names of the direct dependencies, e.g. from the Pipfile
+
+    Returns:
+        PackageNode: Root of the tree
+    """
+    root = PackageNode(name="", version="")
+    required = {name for distribution in distributions.values() for name in distribution.requires}
+    direct = [key for key in dict.fromkeys(map(normalize_name, top_level or [])) if key in distributions]
+    for key in direct + [key for key in sorted(distributions) if key not in required and key not in direct]:
+        add_distribution(distributions[key], distributions, root, {key})
+    return root
+
+
+def get_metadata_resolver(distributions: Dict[str, Distribution], with_unlicensed: bool = False) -> Resolver:
+    """Resolver answering packages of the requested version from metadata of distributions
+
+    Args:
+        distributions (Dict[str, Distribution]): Normalized name as key
+        with_unlicensed (bool, optional): Answer distributions without license data too, the metadata
+            of the release the registry serves is final while installed one may be outdated
+
+    Returns:
+        Resolver: The resolver
+    """
+
+    def resolve(packages: List[PackageInfo]) -> Dict[PackageInfo, Optional[str]]:
+        answered: Dict[PackageInfo, Optional[str]] = {}
+        for package in packages:
+            distribution = distributions.get(normalize_name(package.name))
+            if distribution and distribution.version == package.version and (distribution.license or with_unlicensed):
+                answered[package] = distribution.license
+        return answered
+
+    return resolve
+
+
+def read_environment(directory: str) -> Dict[str, Distribution]:
+    """Read distributions installed in the project's virtualenv"""
+    return read_distributions(get_site_packages(directory))
@@ -0,0 +1,129 @@
+import json
+import re
+from typing import Dict, List, Optional, Set
+
+from license_sh.cache import PYPI, LicenseCache
+from license_sh.fetcher import FetchStats, is_offline, split_config_packages, split_private
+from license_sh.resolvers import CACHE, INSTALLED, REGISTRY
+from license_sh.runners.python.environment import Distribution, normalize_name
+from license_sh.runners.python.pypi import fetch_index_metadata
+from license_sh.types.nodes import PackageInfo
+
+PIPFILE_SECTION = re.compile(r"^\s*\[([^\]]+)\]\s*$")
+
+
+def get_pipfile_packages(pipfile_path: str) -> List[str]:
+    """Get normalized names of the packages listed in the [packages] section of a Pipfile
+
+    Only the keys are read, so no TOML parser is needed.
+    """
+    try:
+        with open(pipfile_path) as pipfile:
+            lines = pipfile.read().splitlines()
+    except OSError:
+        return []
+
+    names = []
+    in_packages = False
+    for line in lines:
+        section = PIPFILE_SECTION.match(line)
+        if section:
+            in_packages = section.group(1).strip() == "packages"
+            continue
+        name, separator, _ = line.partition("=")
+        if in_packages and separator and not line.lstrip().startswith("#"):
+            names.append(normalize_name(name.strip().strip("\"'")))
+    return names
+
+
+def get_locked_packages(pipfile_lock_path: str) -> List[PackageInfo]:
+    """Get packages pinned in the default section of Pipfile.lock
+
+    Entries without a pinned version (VCS checkouts, local paths) have no release on an index
+    and are skipped.
+
+    Args:
+        pipfile_lock_path (str): Path to Pipfile.lock
+
+    Returns:
+        List[PackageInfo]: The packages
+    """
+    with open(pipfile_lock_path) as pipfile_lock:
+        lock = json.load(pipfile_lock)
+    return [
+        PackageInfo(name=name, version=entry["version"][len("=="):])
+        for name, entry in lock.get("default", {}).items()
+        if isinstance(entry, dict) and str(entry.get("version", "")).startswith("==")
+    ]
+
+
+def read_locked_metadata(
+    packages: List[PackageInfo],
+    installed: Dict[str, Distribution],
+    cache: Optional[LicenseCache],
+    index: str,
+    stats: FetchStats,
+    debug: bool = False,
+    private_packages: Optional[List[str]] = None,
+    config_packages: Optional[Set[str]] = None,
+) -> Dict[str, Dict[str, Distribution]]:
+    """Get core metadata of locked packages, from the cheapest source that has it
+
+    Distributions installed in the locked version are used first, then the metadata cache
+    and the index is only asked for the rest, except packages the config ignores or overrides,
+    private packages and the ones it recently didn't know. Fetched metadata is stored in the cache.
+
+    Args:
+        packages (List[PackageInfo]): Locked packages
+        installed (Dict[str, Distribution]): Distributions installed in the project's environment, may be empty
+        cache (LicenseCache, optional): Persistent cache
+        index (str): Base url of the PyPI registry
+        stats (FetchStats): Collects retries of the requests
+        debug (bool, optional): Print adjustments of concurrency per host
+        private_packages (List[str], optional): Name patterns of packages never looked up remotely
+        config_packages (Set[str], optional): Keys of ignored and overridden packages, recorded in stats
+
+    Returns:
+        Dict[str, Dict[str, Distribution]]: Source as key, distributions keyed by normalized name as value,
+        named as in the lockfile. Packages no source has metadata of are missing.
+    """
+    by_source: Dict[str, Dict[str, Distribution]] = {INSTALLED: {}, CACHE: {}, REGISTRY: {}}
+    from_config = set(split_config_packages(packages, config_packages)[0])
+    stats.from_config.update(from_config)
+    missing = []
+    for package in packages:
+        distribution = installed.get(normalize_name(package.name))
+        if distribution and distribution.version == package.version:
+            by_source[INSTALLED][normalize_name(package.name)] = distribution._replace(name=package.name)
+        else:
+            missing.append(package)
+
+    cached = cache.get_metadata(PYPI, missing) if cache is not None else {}
+    for package, (license, requires) in cached.items():
+        by_source[CACHE][normalize_name(package.name)] = Distribution(package.name, package.version, license, requires)
+    # packages the index recently didn't have metadata of aren't asked for again
+    not_found = cache.get_not_found(PYPI, index, missing) if cache is not None else {}
+    _, missing = split_private(
+        [package for package in missing if package not in cached and package not in not_found], private_packages
+    )
+    missing = [package for package in missing if package not in from_config]
+    if not missing or is_offline():
+        return by_source
+
+    fetched: Dict[PackageInfo, Distribution] = {}
+    not_found = {}
+
+    def on_unresolved(package, reason):
+        if reason is not None:
+            not_found[package] = reason
+
+    fetch_index_metadata(missing, index, fetched.__setitem__, on_unresolved, stats, debug, cache)
+    for package, distribution in fetched.items():
+        by_source[REGISTRY][normalize_name(package.name)] = distribution._replace(
+            name=package.name, version=package.version
+        )
+    if cache is not None:
+        cache.set_metadata(PYPI, {package: (item.license, item.requires) for package, item in fetched.items()})
+        # the license lookup skips them instead of asking the index again
+        cache.set_not_found(PYPI, index, not_found)
+    return by_source
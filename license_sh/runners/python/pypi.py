@@ -0,0 +1,98 @@
+import json
+from json import JSONDecodeError
+from typing import Callable, List, Optional
+
+from license_sh.cache import LicenseCache
+from license_sh.fetcher import INVALID_RESPONSE, NOT_FOUND, FetchStats, fetch_all
+from license_sh.runners.python.environment import Distribution, get_metadata_license, get_required_names
+from license_sh.runners.python.simple_index import fetch_simple_metadata, get_json_api_url, is_simple_index
+from license_sh.types.nodes import PackageInfo
+
+
+def fetch_json_metadata(
+    packages: List[PackageInfo],
+    registry: str,
+    on_fetched: Callable[[PackageInfo, Distribution], None],
+    on_unresolved: Callable[[PackageInfo, Optional[str]], None],
+    stats: FetchStats,
+    debug: bool = False,
+) -> None:
+    """Fetch metadata from the JSON API of PyPI, one release document per package
+
+    Arguments are the ones of fetch_index_metadata.
+    """
+
+    def handle(output, package):
+        try:
+            page = json.loads(output)
+        except JSONDecodeError:
+            page = None
+
+        if not isinstance(page, dict):
+            on_unresolved(package, INVALID_RESPONSE)
+            return
+        info = page.get("info") or {}
+        # a missing license is None like in core metadata, so it's cached for the unresolved TTL only
+        license = get_metadata_license(
+            [info.get("license_expression") or ""], [info.get("license") or ""], info.get("classifiers") or []
+        )
+        on_fetched(
+            package,
+            Distribution(
+                name=package.name,
+                version=package.version,
+                license=license,
+                requires=get_required_names(info.get("requires_dist") or []),
+            ),
+        )
+
+    fetch_all(
+        [(f"{registry}/{package.name}/{package.version}/json", package) for package in packages],
+        handle,
+        stats=stats,
+        debug=debug,
+        hedge=True,
+        handle_error=lambda error, package: on_unresolved(package, NOT_FOUND if error.status == 404 else None),
+    )
+
+
+def fetch_index_metadata(
+    packages: List[PackageInfo],
+    index: str,
+    on_fetched: Callable[[PackageInfo, Distribution], None],
+    on_unresolved: Callable[[PackageInfo, Optional[str]], None],
+    stats: FetchStats,
+    debug: bool = False,
+    cache: Optional[LicenseCache] = None,
+) -> None:
+    """Fetch license and requirements of packages from a PyPI registry
+
+    The index url decides how they are read: Simple API indexes serve core metadata files,
+    other registries the JSON API. Packages with no wheel with core metadata on a Simple API
+    index are read from the JSON API next to it, they exist on the index, so failing there
+    doesn't mark them as not found.
+
+    Args:
+        packages (List[PackageInfo]): Packages to fetch
+        index (str): Base url of the registry
+        on_fetched (Callable): Called with each package and its distribution metadata
+        on_unresolved (Callable): Called with each package that couldn't be resolved and the reason,
+            None when the fetch failed
+        stats (FetchStats): Collects retries of the requests
+        debug (bool, optional): Print adjustments of concurrency per host
+        cache (LicenseCache, optional): Persistent cache of the Simple API project pages
+    """
+    if not is_simple_index(index):
+        fetch_json_metadata(packages, index, on_fetched, on_unresolved, stats, debug)
+        return
+
+    without_metadata = fetch_simple_metadata(packages, index, on_fetched, on_unresolved, stats, debug, cache)
+    if without_metadata:
+        fetch_json_metadata(
+            without_metadata,
+            get_json_api_url(index),
+            on_fetched,
+            lambda package, reason: on_unresolved(package, None),
+            stats,
+            debug,
+        )
@@ -0,0 +1,242 @@
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urldefrag, urljoin, urlsplit
+
+from packaging.utils import canonicalize_version
+
+from license_sh.cache import LicenseCache
+from license_sh.fetcher import (
+    INVALID_RESPONSE,
+    NOT_FOUND,
+    NOT_MODIFIED,
+    FetchStats,
+    Validators,
+    fetch_all,
+    get_conditional_headers,
+    get_validators,
+)
+from license_sh.runners.python.environment import Distribution, normalize_name, parse_metadata
+from license_sh.types.nodes import PackageInfo
+
+SIMPLE_JSON = "application/vnd.pypi.simple.v1+json"
+PROJECT_PAGES = "pypi-simple"  # project pages are stored as version indexes of this ecosystem, keyed by url
+
+
+def is_simple_index(url: str) -> bool:
+    """Simple API indexes (".../simple", like pip's index url) are read through core metadata files,
+    other PyPI registries through the JSON API
+    """
+    return urlsplit(url).path.rstrip("/").endswith("/simple")
+
+
+def get_json_api_url(index: str) -> str:
+    """Get the JSON API next to a Simple API index, "https://pypi.org/simple" -> "https://pypi.org/pypi"
+
+    PyPI, Artifactory and Nexus serve both APIs under the same prefix.
+    """
+    return f"{index.rstrip('/')[:-len('/simple')]}/pypi"
+
+
+def get_project_url(index: str, name: str) -> str:
+    return f"{index.rstrip('/')}/{normalize_name(name)}/"
+
+
+def get_wheel_version(filename: str) -> Optional[str]:
+    """Get version of a wheel from its file name, "requests-2.25.1-py2.py3-none-any.whl" -> "2.25.1" """
+    if not filename.endswith(".whl"):
+        return None
+    parts = filename[:-len(".whl")].split("-")
+    return parts[1] if len(parts) >= 5 else None
+
+
+def get_version_key(version: str) -> str:
+    """Get key matching equal versions of a release and its wheels, "1.0.0" and "1.0", "2.0RC1" and "2.0rc1"
+
+    Wheel file names escape "-" as "_" ("1.0-1" -> "1.0_1"), it's turned back first. Versions which
+    aren't valid PEP 440 versions are compared as they are.
+    """
+    return str(canonicalize_version(version.replace("_", "-")))
+
+
+def get_metadata_urls(page: Dict, page_url: str) -> Dict[str, Optional[str]]:
+    """Get core metadata files (PEP 658) of wheels listed in a project page (PEP 691)
+
+    Args:
+        page (Dict): Project page of the Simple API in JSON
+        page_url (str): Url of the page, file urls may be relative to it
+
+    Returns:
+        Dict[str, Optional[str]]: Version key of the wheel file name as key, url of the metadata file of its
+            first wheel with one as value
+    """
+    metadata_urls: Dict[str, Optional[str]] = {}
+    files = page.get("files")
+    for file in files if isinstance(files, list) else []:
+        if not isinstance(file, dict) or not isinstance(file.get("url"), str):
+            continue
+        wheel_version = get_wheel_version(file.get("filename", ""))
+        version = get_version_key(wheel_version) if wheel_version is not None else None
+        has_metadata = file.get("core-metadata") or file.get("data-dist-info-metadata")
+        if has_metadata and version is not None and version not in metadata_urls:
+            url, _ = urldefrag(urljoin(page_url, file["url"]))
+            metadata_urls[version] = f"{url}.metadata"
+    return metadata_urls
+
+
+def find_metadata_url(page: Dict, page_url: str, version: str) -> Optional[str]:
+    """Find core metadata file (PEP 658) of a wheel of the version in a project page (PEP 691)
+
+    Args:
+        page (Dict): Project page of the Simple API in JSON
+        page_url (str): Url of the page, file urls may be relative to it
+        version (str): Requested version
+
+    Returns:
+        Optional[str]: Url of the metadata file or None if no wheel of the version has one
+    """
+    return get_metadata_urls(page, page_url).get(get_version_key(version))
+
+
+async def read_project_page(resp, payload=None) -> Optional[Dict]:
+    """Read project page, reduced to the metadata files of its wheels
+
+    Returns:
+        Optional[Dict]: Metadata urls by version and validators of the response, {"not_modified": True}
+            for a revalidated page or None if it isn't a valid page
+    """
+    if resp.status == NOT_MODIFIED:
+        return {"not_modified": True}
+    try:
+        page = await resp.json(content_type=None)
+    except ValueError:
+        return None
+    if not isinstance(page, dict):
+        return None
+    return {"metadata_urls": get_metadata_urls(page, str(resp.url)), "validators": get_validators(resp.headers)}
+
+
+def get_page_headers(stored: Optional[Tuple[Validators, Dict[str, Optional[str]]]]) -> Dict[str, str]:
+    """Get headers of a project page request, conditional if the page is stored"""
+    conditional = get_conditional_headers(stored[0]) if stored else None
+    return {"Accept": SIMPLE_JSON, **(conditional or {})}
+
+
+def get_stored_pages(
+    cache: Optional[LicenseCache], urls: List[str]
+) -> Dict[str, Tuple[Validators, Dict[str, Optional[str]]]]:
+    """Get project pages stored with validators, to revalidate them with conditional requests
+
+    Returns:
+        Dict[str, Tuple[Validators, Dict]]: Page url as key, validators and metadata urls by version as value
+    """
+    if cache is None:
+        return {}
+    validators = cache.get_packument_validators(PROJECT_PAGES, urls)
+    indexes = cache.get_version_indexes(PROJECT_PAGES, list(validators))
+    return {url: (validators[url][0], indexes[url][0]) for url in validators if url in indexes}
+
+
+def get_revalidated_page(
+    page: Dict,
+    url: str,
+    stored: Optional[Tuple[Validators, Dict[str, Optional[str]]]],
+    cache: Optional[LicenseCache],
+    stats: FetchStats,
+) -> Dict[str, Optional[str]]:
+    """Get metadata urls of a fetched project page, the stored ones if it wasn't modified, and store them
+
+    Returns:
+        Dict[str, Optional[str]]: Metadata urls by version
+    """
+    if stored is not None:
+        stats.add_revalidation(bool(page.get("not_modified")))
+    if page.get("not_modified") and stored is not None:
+        page = {"validators": stored[0], "metadata_urls": stored[1]}
+    if cache is not None:
+        cache.set_version_index(PROJECT_PAGES, url, page["metadata_urls"], validators=page["validators"])
+    return page["metadata_urls"]
+
+
+async def read_core_metadata(resp, payload=None) -> Optional[Distribution]:
+    return parse_metadata(await resp.text(errors="replace"))
+
+
+def fetch_simple_metadata(
+    packages: List[PackageInfo],
+    index: str,
+    on_fetched: Callable[[PackageInfo, Distribution], None],
+    on_unresolved: Callable[[PackageInfo, Optional[str]], None],
+    stats: FetchStats,
+    debug: bool = False,
+    cache: Optional[LicenseCache] = None,
+) -> List[PackageInfo]:
+    """Fetch metadata from a Simple API index, downloading only core metadata files of wheels
+
+    A JSON project page (PEP 691) is fetched once per name, then the core metadata file
+    (PEP 658) of a wheel of each version, of which only the headers are parsed. Packages
+    with no such wheel, e.g. released only as sdists, are returned for another source to read.
+
+    Project pages change with every release, they are stored with their ETag and Last-Modified
+    and revalidated with conditional requests, an unchanged page costs a 304 with no body.
+
+    Args:
+        packages (List[PackageInfo]): Packages to fetch
+        index (str): Base url of the index, e.g. https://pypi.org/simple
+        on_fetched (Callable): Called with each package and its distribution metadata
+        on_unresolved (Callable): Called with each package that couldn't be resolved and the reason,
+            None when the fetch failed
+        stats (FetchStats): Collects retries of the requests
+        debug (bool, optional): Print adjustments of concurrency per host
+        cache (LicenseCache, optional): Persistent cache of the project pages
+
+    Returns:
+        List[PackageInfo]: Packages of the index with no wheel with core metadata
+    """
+    packages_by_name: Dict[str, List[PackageInfo]] = {}
+    for package in packages:
+        packages_by_name.setdefault(normalize_name(package.name), []).append(package)
+    metadata_requests = []
+    without_metadata = []
+    stored = get_stored_pages(cache, [get_project_url(index, name) for name in packages_by_name])
+
+    def handle_error(error, packages):
+        for package in packages:
+            on_unresolved(package, NOT_FOUND if error.status == 404 else None)
+
+    def handle_page(page, name):
+        url = get_project_url(index, name)
+        metadata_urls = get_revalidated_page(page, url, stored.get(url), cache, stats) if page else None
+        for package in packages_by_name[name]:
+            metadata_url = metadata_urls.get(get_version_key(package.version)) if metadata_urls is not None else None
+            if metadata_url is not None:
+                metadata_requests.append((metadata_url, package))
+            elif metadata_urls is not None:
+                without_metadata.append(package)
+            else:
+                on_unresolved(package, INVALID_RESPONSE)
+
+    def handle_metadata(distribution, package):
+        if distribution is None:
+            on_unresolved(package, INVALID_RESPONSE)
+        else:
+            on_fetched(package, distribution)
+
+    fetch_all(
+        [(get_project_url(index, name), name) for name in packages_by_name],
+        handle_page,
+        read_project_page,
+        stats=stats,
+        debug=debug,
+        hedge=True,
+        handle_error=lambda error, name: handle_error(error, packages_by_name[name]),
+        headers=lambda name: get_page_headers(stored.get(get_project_url(index, name))),
+    )
+    fetch_all(
+        metadata_requests,
+        handle_metadata,
+        read_core_metadata,
+        stats=stats,
+        debug=debug,
+        hedge=True,
+        handle_error=lambda error, package: handle_error(error, [package]),
+    )
+    return without_metadata
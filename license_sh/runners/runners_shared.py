@@ -1,47 +1,439 @@
 import asyncio
 import json
+import os
 import subprocess
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, TypeVar
 
-import aiohttp as aiohttp
-
+from license_sh.cache import NPM, LicenseCache, get_cache, skip_lookups, split_cached
+from license_sh.fetcher import (
+    INVALID_RESPONSE,
+    NOT_FOUND,
+    NOT_MODIFIED,
+    FetchStats,
+    add_not_found,
+    check_offline,
+    fetch_all,
+    get_conditional_headers,
+    Validators,
+    get_validators,
+    is_offline,
+    report_known_licenses,
+)
 from license_sh.helpers import extract_npm_license
+from license_sh.license_db import get_license_db, split_license_db
+from license_sh.registries import DEFAULT_REGISTRIES, get_registry
+from license_sh.remote_cache import RemoteCache, get_remote_cache
+from license_sh.resolvers import (
+    CACHE,
+    LICENSE_DB,
+    NPM_CACHE,
+    REGISTRY,
+    REMOTE_CACHE,
+    LookupOptions,
+    Resolver,
+    Tier,
+    resolve_chain,
+    store_lookups,
+)
+from license_sh.runners.npm_cacache import resolve_from_npm_cache
+from license_sh.runners.packument_stream import PackumentLicenseExtractor
+from license_sh.types.nodes import PackageInfo
+
+STREAM_THRESHOLD = 1024 * 1024  # documents over 1 MB are parsed while they stream in
+CHUNK_SIZE = 64 * 1024
+FEED_SIZE = 1024 * 1024  # streamed chunks are handed to a worker in batches, not one by one
+
+PARSE_WORKERS_ENV = "LICENSE_SH_PARSE_WORKERS"
+THREAD_WORKERS = "thread"
+PROCESS_WORKERS = "process"
+NO_WORKERS = "none"
+
+T = TypeVar("T")
+
 
-NPM_HOST = "https://registry.npmjs.org"
+def get_npm_requests(
+    packages: Iterable[Tuple[str, str]], registry: str = DEFAULT_REGISTRIES[NPM]
+) -> List[Tuple[str, str, List[str]]]:
+    """Plan registry requests for npm packages, one request per package name
 
+    A single version is fetched through the small version-scoped document,
+    several versions of one name share a single packument download.
 
-def fetch_npm_licenses(all_dependencies):
-    license_map = {}
+    Args:
+        packages (Iterable[Tuple[str, str]]): (name, version) pairs to fetch
+        registry (str, optional): Registry base url. Defaults to the public npm registry.
 
-    urls = [
-        (f"{NPM_HOST}/{dependency}/", version)
-        for dependency, version in all_dependencies
+    Returns:
+        List[Tuple[str, str, List[str]]]: (url, name, versions) for each request
+    """
+    versions_by_name: Dict[str, List[str]] = {}
+    for name, version in packages:
+        versions = versions_by_name.setdefault(name, [])
+        if version not in versions:
+            versions.append(version)
+
+    return [
+        (
+            f"{registry}/{name}/{versions[0]}" if len(versions) == 1 else f"{registry}/{name}/",
+            name,
+            versions,
+        )
+        for name, versions in versions_by_name.items()
     ]
 
-    async def fetch(session, url, version):
-        async with session.get(url) as resp:
-            return await resp.text(), version
-            # Catch HTTP errors/exceptions here
 
-    async def fetch_concurrent(urls):
-        loop = asyncio.get_event_loop()
-        async with aiohttp.ClientSession() as session:
-            tasks = []
-            for url, version in urls:
-                tasks.append(loop.create_task(fetch(session, url, version)))
+def get_parse_executor(kind: Optional[str] = None) -> Optional[Executor]:
+    """Create the worker pool which decodes registry documents off the event loop
+
+    Args:
+        kind (str, optional): "thread", "process" or "none" to parse on the event loop.
+            Defaults to LICENSE_SH_PARSE_WORKERS or "process", the fastest in benchmarks/packument_parsing.py.
+
+    Returns:
+        Optional[Executor]: Worker pool or None for parsing on the event loop
+    """
+    kind = kind or os.environ.get(PARSE_WORKERS_ENV, PROCESS_WORKERS)
+    if kind == THREAD_WORKERS:
+        return ThreadPoolExecutor(thread_name_prefix="license-sh-parse")
+    if kind == PROCESS_WORKERS:
+        return ProcessPoolExecutor()
+    if kind == NO_WORKERS:
+        return None
+    raise ValueError(f"Unknown {PARSE_WORKERS_ENV} value '{kind}'")
+
+
+async def run_in(executor: Optional[Executor], function: Callable[..., T], *args) -> T:
+    if executor is None:
+        return function(*args)
+    return await asyncio.get_event_loop().run_in_executor(executor, function, *args)
+
+
+def summarize_npm_document(page: Dict, versions: List[str]) -> Optional[Dict]:
+    """Reduce a registry document to the licenses of the requested versions
+
+    Packuments (several versions requested) also keep licenses of all the versions
+    they list, which are stored as the version index of the package.
+
+    Args:
+        page (Dict): Version document or packument, full or reduced by PackumentLicenseExtractor
+        versions (List[str]): Requested versions
+
+    Returns:
+        Optional[Dict]: name, licenses of requested versions, index, package level license
+            and modified time or None if it isn't an npm document
+    """
+    if "name" not in page:
+        return None
+    return {
+        "name": page["name"],
+        "licenses": {version: extract_npm_license(page, version) for version in versions},
+        "index": get_version_index(page) if len(versions) > 1 else None,
+        "license": get_package_license(page),
+        "modified": page.get("time", {}).get("modified"),
+    }
+
+
+def parse_npm_document(data: bytes, versions: List[str]) -> Optional[Dict]:
+    try:
+        page = json.loads(data)
+    except ValueError:
+        return None
+    return summarize_npm_document(page, versions) if isinstance(page, dict) else None
+
+
+def finish_npm_document(extractor: PackumentLicenseExtractor, versions: List[str]) -> Optional[Dict]:
+    try:
+        page = extractor.close()
+    except ValueError:
+        return None
+    return summarize_npm_document(page, versions)
+
+
+async def read_npm_document(
+    resp, request: Tuple[str, List[str]], executor: Optional[Executor] = None
+) -> Optional[Dict]:
+    """Read npm registry document
+
+    Decoding runs in the executor, so the event loop keeps serving other sockets while
+    a multi-megabyte packument is parsed. Large documents (or ones of unknown size) are
+    parsed incrementally and reduced to license fields, so the whole packument is never
+    held in memory; process pools can't share the parser state, they get the whole body.
+
+    Args:
+        resp (aiohttp.ClientResponse): Registry response
+        request (Tuple[str, List[str]]): Package name and requested versions
+        executor (Executor, optional): Worker pool for decoding, None decodes on the event loop
+
+    Returns:
+        Optional[Dict]: Result of summarize_npm_document with validators of the response,
+            {"not_modified": True} for a revalidated packument or None if it isn't a valid document
+    """
+    name, versions = request
+    if resp.status == NOT_MODIFIED:
+        return {"not_modified": True}
+    small = resp.content_length is not None and resp.content_length < STREAM_THRESHOLD
+    if small or isinstance(executor, ProcessPoolExecutor):
+        document = await run_in(executor, parse_npm_document, await resp.read(), versions)
+    else:
+        document = await read_npm_stream(resp, versions, executor)
+    if document is not None:
+        document["validators"] = get_validators(resp.headers)
+    return document
+
+
+async def read_npm_stream(resp, versions: List[str], executor: Optional[Executor] = None) -> Optional[Dict]:
+    extractor = PackumentLicenseExtractor(versions if len(versions) == 1 else None)
+    batch: List[bytes] = []
+    size = 0
+    try:
+        # each hop to the executor costs a round trip, chunks are fed in batches of FEED_SIZE
+        async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+            batch.append(chunk)
+            size += len(chunk)
+            if size >= FEED_SIZE:
+                await run_in(executor, extractor.feed, b"".join(batch))
+                batch, size = [], 0
+        if batch:
+            await run_in(executor, extractor.feed, b"".join(batch))
+    except ValueError:
+        return None
+    return await run_in(executor, finish_npm_document, extractor, versions)
+
+
+def get_version_index(page: Dict) -> Dict[str, Optional[str]]:
+    """Get license of every version listed in a packument
+
+    Args:
+        page (Dict): Packument, full or reduced by PackumentLicenseExtractor
+
+    Returns:
+        Dict[str, Optional[str]]: Version as key, license as value
+    """
+    return {version: extract_npm_license(page, version) for version in page.get("versions", {})}
+
 
-            for result in asyncio.as_completed(tasks):
-                try:
-                    output, version = await result
-                    page = json.loads(output)
-                    if ("name") in page:
-                        license_map[f"{page['name']}@{version}"] = extract_npm_license(
-                            page, version
-                        )
+def get_package_license(page: Dict) -> Optional[str]:
+    """Get package level license of a packument, which extract_npm_license falls back to"""
+    return extract_npm_license({key: value for key, value in page.items() if key != "versions"}, "")
 
-                except json.JSONDecodeError:
-                    pass
 
-    asyncio.run(fetch_concurrent(urls))
+def iter_installed_npm_packages(
+    node_modules: str, seen: Optional[Set[str]] = None
+) -> Iterator[Tuple[PackageInfo, Optional[str]]]:
+    """Read licenses of packages installed in node_modules, nested node_modules included
+
+    Only package.json files are read, the rest of the installed files isn't walked.
+
+    Args:
+        node_modules (str): Path to the node_modules directory
+        seen (Set[str], optional): Real paths already visited, linked packages may form cycles
+
+    Returns:
+        Iterator[Tuple[PackageInfo, Optional[str]]]: Installed packages and their licenses
+    """
+    seen = seen if seen is not None else set()
+    real_path = os.path.realpath(node_modules)
+    if real_path in seen:
+        return
+    seen.add(real_path)
+    try:
+        entries = sorted(os.listdir(node_modules))
+    except OSError:
+        return
+    for entry in entries:
+        package_path = os.path.join(node_modules, entry)
+        if entry.startswith("."):
+            continue  # .bin, .package-lock.json, .cache
+        if entry.startswith("@"):
+            yield from iter_installed_npm_packages(package_path, seen)
+            continue
+        try:
+            with open(os.path.join(package_path, "package.json")) as package_json_file:
+                package_json = json.load(package_json_file)
+        except (OSError, ValueError):
+            continue
+        if isinstance(package_json, dict) and package_json.get("name") and package_json.get("version"):
+            version = package_json["version"]
+            yield PackageInfo(package_json["name"], version), extract_npm_license(package_json, version)
+        yield from iter_installed_npm_packages(os.path.join(package_path, "node_modules"), seen)
+
+
+def get_installed_npm_resolver(directory: str) -> Resolver:
+    """Resolver answering packages installed in node_modules of the project"""
+
+    def resolve(packages: List[PackageInfo]) -> Dict[PackageInfo, Optional[str]]:
+        installed = dict(iter_installed_npm_packages(os.path.join(directory, "node_modules")))
+        return {package: installed[package] for package in packages if package in installed}
+
+    return resolve
+
+
+def get_npm_cache_tiers(
+    cache: Optional[LicenseCache],
+    integrities: Optional[Dict[PackageInfo, str]],
+    use_npm_cache: bool,
+    registry: str = DEFAULT_REGISTRIES[NPM],
+    remote_cache: Optional[RemoteCache] = None,
+) -> List[Tier]:
+    """Cache tiers of npm licenses: the persistent cache, the imported license database,
+    version indexes of previously fetched packuments, npm's local cache and the remote cache
+    """
+    license_db = get_license_db()
+    tiers: List[Tier] = []
+    if cache is not None:
+        tiers.append((CACHE, lambda packages: split_cached(cache, NPM, packages, integrities)[0]))
+    if license_db is not None:
+        tiers.append((LICENSE_DB, lambda packages: split_license_db(license_db, NPM, packages)[0]))
+    if cache is not None:
+        tiers.append((CACHE, lambda packages: cache.get_version_index(NPM, packages)))
+    if use_npm_cache:
+        tiers.append((NPM_CACHE, lambda packages: dict(resolve_from_npm_cache(set(packages), registry, integrities))))
+    if remote_cache is not None:
+        tiers.append((REMOTE_CACHE, lambda packages: remote_cache.get_many(NPM, packages)))
+    return tiers
+
+
+def get_packument_validators(
+    cache: Optional[LicenseCache], requests: List[Tuple[str, str, List[str]]]
+) -> Dict[str, Tuple[Validators, Optional[str]]]:
+    """Get validators of stored packuments about to be downloaded again, version documents never change"""
+    if cache is None:
+        return {}
+    return cache.get_packument_validators(NPM, [name for _, name, versions in requests if len(versions) > 1])
+
+
+def get_packument_headers(
+    validators: Dict[str, Tuple[Validators, Optional[str]]], request: Tuple[str, List[str]]
+) -> Optional[Dict[str, str]]:
+    name, _ = request
+    return get_conditional_headers(validators[name][0]) if name in validators else None
+
+
+def get_revalidated_document(
+    document: Dict,
+    request: Tuple[str, List[str]],
+    validators: Dict[str, Tuple[Validators, Optional[str]]],
+    stats: FetchStats,
+) -> Dict:
+    """Answer a conditional packument request, a packument not modified since its version index was stored
+    doesn't list the requested versions, they get the package level license like extract_npm_license does
+    """
+    name, versions = request
+    if name not in validators:
+        return document
+    not_modified = bool(document.get("not_modified"))
+    stats.add_revalidation(not_modified)
+    if not not_modified:
+        return document
+    _, license = validators[name]
+    return {"licenses": {version: license for version in versions}, "index": None}
+
+
+def fetch_npm_licenses(
+    all_dependencies: Iterable[Tuple[str, str]],
+    integrities: Optional[Dict[PackageInfo, str]] = None,
+    options: LookupOptions = LookupOptions(),
+) -> Dict[str, Optional[str]]:
+    """Fetch licenses of npm packages, answering from the given tiers (e.g. the lockfile
+    and installed packages), the persistent cache, the imported license database,
+    version indexes of previously fetched packuments, npm's local cache and the remote cache
+    when possible. Each package stops at the first source that answers, the source is recorded in stats.
+
+    Packages ignored or overridden by the config, private packages and packages recently
+    not found on the registry aren't fetched, the reason is recorded in stats. In offline
+    mode OfflineError is raised when anything is left to be fetched.
+
+    Packages are requested in the given order. on_license sees every license as soon
+    as it's known, an exception raised by it cancels the outstanding requests.
+
+    Args:
+        all_dependencies (Iterable[Tuple[str, str]]): (name, version) pairs to fetch
+        integrities (Dict[PackageInfo, str], optional): Lockfile integrity hashes
+        options (LookupOptions, optional): Sources, caches and callbacks of the lookup. The registry
+            defaults to LICENSE_SH_NPM_REGISTRY or the public registry.
+
+    Returns:
+        Dict[str, Optional[str]]: "{name}@{version}" as key, license as value
+    """
+    cache = get_cache() if options.use_cache else None
+    remote_cache = get_remote_cache() if options.use_cache else None
+    registry = options.registry or get_registry(NPM) or DEFAULT_REGISTRIES[NPM]
+    packages = [PackageInfo(*package) for package in all_dependencies]
+    stats = options.stats if options.stats is not None else FetchStats()
+    on_license = options.on_license or (lambda package, license: None)
+
+    tiers = (options.tiers or []) + get_npm_cache_tiers(
+        cache, integrities, options.use_npm_cache, registry, remote_cache
+    )
+    known, missing = resolve_chain(packages, tiers, stats)
+    missing = skip_lookups(cache, NPM, registry, missing, options.private_packages, stats, options.config_packages)
+    check_offline(NPM, missing)
+
+    license_map = {f"{name}@{version}": license for (name, version), license in known.items()}
+    # licenses found in npm's cache are kept for the next run, the ones of the remote cache locally
+    fetched = {package: license for package, license in known.items() if stats.sources[package] == NPM_CACHE}
+    from_remote = {package: license for package, license in known.items() if stats.sources[package] == REMOTE_CACHE}
+    not_found: Dict[PackageInfo, str] = {}
+    validators: Dict[str, Tuple[Validators, Optional[str]]] = {}
+    completed = False
+
+    def unresolved(name, versions, reason=None):
+        requested = [PackageInfo(name, version) for version in versions]
+        if reason is None:
+            stats.failed += len(requested)
+        else:
+            add_not_found(stats, not_found, requested, reason)
+        for package in requested:
+            on_license(package, None)
+
+    def handle_error(error, request):
+        name, versions = request
+        unresolved(name, versions, NOT_FOUND if error.status == 404 else None)
+
+    def handle(document, request):
+        name, versions = request
+        if document is None:
+            unresolved(name, versions, INVALID_RESPONSE)
+            return
+
+        document = get_revalidated_document(document, request, validators, stats)
+        if cache is not None and document["index"] is not None:
+            cache.set_version_index(
+                NPM, name, document["index"], document["modified"], document["validators"], document["license"]
+            )
+
+        for version, license in document["licenses"].items():
+            license_map[f"{name}@{version}"] = license
+            fetched[PackageInfo(name, version)] = license
+            stats.add_license(license)
+            stats.add_source(PackageInfo(name, version), REGISTRY)
+            on_license(PackageInfo(name, version), license)
+
+    executor = None
+    try:
+        report_known_licenses(packages, known, stats.unresolved, on_license)
+        requests = get_npm_requests(missing, registry)
+        validators.update(get_packument_validators(cache, requests))
+        executor = get_parse_executor() if requests else None
+        fetch_all(
+            [(url, (name, versions)) for url, name, versions in requests],
+            handle,
+            partial(read_npm_document, executor=executor),
+            stats=stats,
+            debug=options.debug,
+            hedge=True,
+            handle_error=handle_error,
+            headers=partial(get_packument_headers, validators),
+        )
+        completed = True
+    finally:
+        if executor is not None:
+            # documents still being decoded aren't waited for when the fetching was stopped early
+            executor.shutdown(wait=completed)
+        # licenses fetched before an early stop are kept for the next run
+        store_lookups(NPM, registry, cache, remote_cache, fetched, from_remote, not_found, integrities)
 
     return license_map
 
@@ -68,6 +460,11 @@ def check_node():
         exit(5)
 
 
+def get_maven_offline_flags() -> List[str]:
+    """Flags keeping maven in its offline mode when license-sh runs offline"""
+    return ["-o"] if is_offline() else []
+
+
 def check_maven():
     if not check_command(["mvn", "--version"]):
         print("Missing prerequisite! Maven is required")
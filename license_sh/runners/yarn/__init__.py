@@ -4,16 +4,22 @@ import sys
 from contextlib import nullcontext
 from importlib import resources
 from os import path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Set
 
 from anytree import AnyNode, PreOrderIter
 from yaspin import yaspin
 
-from license_sh.helpers import get_initiated_text
+from license_sh.cache import NPM
+from license_sh.fail_fast import FailFast
+from license_sh.fetcher import FetchStats, add_unresolved_reasons, report_fetch_stats
+from license_sh.helpers import get_breadth_first_dependencies, get_initiated_text
 from license_sh.project_identifier import ProjectType
+from license_sh.registries import get_registry
 from license_sh.runners.abstract_runner import AbstractRunner
-from license_sh.runners.runners_shared import fetch_npm_licenses, check_node, check_yarn
+from license_sh.resolvers import INSTALLED, LookupOptions
+from license_sh.runners.runners_shared import fetch_npm_licenses, check_node, check_yarn, get_installed_npm_resolver
 from license_sh.runners.yarn import js
+from license_sh.types.nodes import PackageInfo
 
 
 def get_yarn_list_json(pathToYarn: str) -> Dict:
@@ -100,6 +106,22 @@ def parse_yarn_lock(json_element: Dict) -> Dict[str, str]:
     }
 
 
+def get_yarn_lock_integrities(json_element: Dict) -> Dict[PackageInfo, str]:
+    """Collect integrity hashes of locked packages
+
+    Arguments:
+        json_element {Dict} -- Root element of json yarn lock
+
+    Returns:
+        Dict[PackageInfo, str] -- Locked package as key, integrity hash as value
+    """
+    return {
+        PackageInfo(get_name(key), dependency.get("version")): dependency.get("integrity")
+        for key, dependency in json_element.get("object", {}).items()
+        if dependency.get("integrity")
+    }
+
+
 def get_name(name: str) -> str:
     """Get package name from package name + required version
     @deprecated
@@ -323,12 +345,25 @@ class YarnRunner(AbstractRunner):
     for each of the packages (including transitive dependencies)
     """
 
-    def __init__(self, directory: str, silent: bool, debug: bool):
+    def __init__(
+        self,
+        directory: str,
+        silent: bool,
+        debug: bool,
+        private_packages: Optional[List[str]] = None,
+        config_packages: Optional[Set[str]] = None,
+        fail_fast: Optional[FailFast] = None,
+        registries: Optional[Dict[str, str]] = None,
+    ):
         self.directory = directory
         self.silent = silent
         self.package_json_path = path.join(directory, "package.json")
         self.yarn_lock_path = path.join(directory, "yarn.lock")
         self.debug = debug
+        self.private_packages = private_packages
+        self.config_packages = config_packages
+        self.fail_fast = fail_fast
+        self.registries = registries
 
     def check(self):
         check_yarn()
@@ -342,17 +377,38 @@ class YarnRunner(AbstractRunner):
             print(get_initiated_text(ProjectType.YARN, project_name, self.directory))
 
         with yaspin(text="Analysing dependencies ...") if not self.silent else nullcontext():
-            package_map = parse_yarn_lock(get_yarn_lock_json(self.directory))
+            yarn_lock_json = get_yarn_lock_json(self.directory)
+            package_map = parse_yarn_lock(yarn_lock_json)
             flat_tree = get_flat_tree(
                 get_yarn_list_json(self.directory).get("data", {}).get("trees", []),
                 package_map,
             )
             dep_tree = get_dependency_tree(flat_tree, package_json, package_map)
 
-            flat_dependencies = [(get_name(s), v) for s, v in package_map.items()]
-            license_map = fetch_npm_licenses(flat_dependencies)
+            # range keys of package_map often resolve to the same version, the tree is deduplicated
+            flat_dependencies = get_breadth_first_dependencies(dep_tree)
+            if self.fail_fast:
+                self.fail_fast.watch(dep_tree)
+
+            stats = FetchStats()
+            license_map = fetch_npm_licenses(
+                flat_dependencies,
+                get_yarn_lock_integrities(yarn_lock_json),
+                LookupOptions(
+                    tiers=[(INSTALLED, get_installed_npm_resolver(self.directory))],
+                    private_packages=self.private_packages,
+                    config_packages=self.config_packages,
+                    registry=get_registry(NPM, self.registries),
+                    stats=stats,
+                    on_license=self.fail_fast.check if self.fail_fast else None,
+                    debug=self.debug,
+                ),
+            )
 
             for node in PreOrderIter(dep_tree):
                 node.license = license_map.get(f"{node.name}@{node.version}", None)
+            add_unresolved_reasons(dep_tree, stats)
+
+        report_fetch_stats(stats, self.silent, self.debug)
 
         return dep_tree
@@ -21,4 +21,7 @@ LicenseWhitelist = List[str]
 LanguageIgnoredPackages = List[str]
 
 IgnoredPackages = Dict[ProjectType, LanguageIgnoredPackages]
-ConfigurationType = Tuple[LicenseWhitelist, IgnoredPackages, LicenseOverrides]
+LanguagePrivatePackages = List[str]
+PrivatePackages = Dict[ProjectType, LanguagePrivatePackages]
+Registries = Dict[str, str]
+ConfigurationType = Tuple[LicenseWhitelist, IgnoredPackages, LicenseOverrides, PrivatePackages, Registries]
@@ -44,7 +44,7 @@ setuptools.setup(
         "urllib3",
         "docopt",
         "license-expression",
-        "pipdeptree",
+        "packaging",
         "questionary",
     ],
 )
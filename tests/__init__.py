@@ -0,0 +1,11 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+# tests never touch the developer's license cache, license database or remote cache
+CACHE_DIR = tempfile.mkdtemp(prefix="license-sh-tests-")
+os.environ["LICENSE_SH_CACHE_DIR"] = CACHE_DIR
+for name in ["LICENSE_SH_DB", "LICENSE_SH_REMOTE_CACHE", "LICENSE_SH_REMOTE_CACHE_TOKEN"]:
+    os.environ.pop(name, None)
+atexit.register(shutil.rmtree, CACHE_DIR, ignore_errors=True)
@@ -1,8 +1,11 @@
+import os
+import tempfile
 import unittest
 import xml.etree.ElementTree as ET
 from unittest import mock
 from unittest.mock import mock_open
 
+from aiohttp import web
 from anytree import AnyNode
 
 from license_sh.analyze.maven import (
@@ -12,8 +15,12 @@ from license_sh.analyze.maven import (
     get_jar_analyze_dict,
     get_maven_analyze_dict,
     analyze_maven,
+    fetch_maven_licenses,
     merge_licenses_analysis_with_jar_analysis,
 )
+from license_sh.cache import LicenseCache
+from license_sh.fetcher import OFFLINE_ENV, FetchStats, OfflineError
+from tests.utils.server import BackgroundServer
 
 licenses_xml = """<?xml version="1.0" encoding="UTF-8" standalone="no"?>
 <licenseSummary>
@@ -99,6 +106,13 @@ class AnalyzeMavenTestCase(unittest.TestCase):
         call_copy_dependencies("doesnt/matter", "/tmp/dir")
         mock_subprocess.run.assert_called_once()
 
+    @mock.patch("license_sh.analyze.maven.subprocess")
+    def test_offline_copy_dependencies_use_local_repository(self, mock_subprocess):
+        # bundles don't carry the maven repository, offline runs copy jars from the local one only
+        with mock.patch.dict(os.environ, {OFFLINE_ENV: "1"}):
+            call_copy_dependencies("doesnt/matter", "/tmp/dir")
+        self.assertEqual(mock_subprocess.run.call_args[0][0][:2], ["mvn", "-o"])
+
     @mock.patch("builtins.open", callable=mock_open(read_data="data"))
     def test_jar_analyze_dict(self, open_mock):
         result = get_jar_analyze_dict("../target/dependencies", ANALYZE_RESULT)
@@ -194,3 +208,54 @@ class AnalyzeMavenTestCase(unittest.TestCase):
             tree.children[1].children[0].analyze,
             [{"data": "License text", "name": "Apache-2.0"}],
         )
+
+
+class FetchMavenLicensesTestCase(unittest.TestCase):
+    def test_texts_are_cached(self):
+        async def license_text(request):
+            return web.Response(text="Apache License")
+
+        app = web.Application()
+        app.router.add_get("/LICENSE-2.0.txt", license_text)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = LicenseCache(os.path.join(tmp_dir, "cache.sqlite3"))
+            with mock.patch("license_sh.analyze.maven.get_cache", return_value=cache):
+                with BackgroundServer(app) as server:
+                    dep_data = {"gson": [server.url("/LICENSE-2.0.txt")]}
+                    fetch_maven_licenses(dep_data, tmp_dir)
+
+                # the server is gone, offline runs take texts from the cache
+                os.remove(os.path.join(tmp_dir, "gson@0"))
+                with mock.patch.dict(os.environ, {OFFLINE_ENV: "1"}):
+                    fetch_maven_licenses(dep_data, tmp_dir)
+                    with self.assertRaises(OfflineError):
+                        fetch_maven_licenses({"junit": ["http://127.0.0.1:9/epl-v10.html"]}, tmp_dir)
+            with open(os.path.join(tmp_dir, "gson@0")) as file:
+                self.assertEqual(file.read(), "Apache License")
+            cache.close()
+
+    def test_stale_texts_are_revalidated(self):
+        requests = []
+
+        async def license_text(request):
+            requests.append(request.headers.get("If-None-Match"))
+            if request.headers.get("If-None-Match") == '"v1"':
+                return web.Response(status=304)
+            return web.Response(text="Apache License", headers={"ETag": '"v1"'})
+
+        app = web.Application()
+        app.router.add_get("/LICENSE-2.0.txt", license_text)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = LicenseCache(os.path.join(tmp_dir, "cache.sqlite3"), revalidate_after=0)
+            stats = FetchStats()
+            with mock.patch("license_sh.analyze.maven.get_cache", return_value=cache):
+                with BackgroundServer(app) as server:
+                    dep_data = {"gson": [server.url("/LICENSE-2.0.txt")]}
+                    fetch_maven_licenses(dep_data, tmp_dir)
+                    os.remove(os.path.join(tmp_dir, "gson@0"))
+                    fetch_maven_licenses(dep_data, tmp_dir, stats)
+            with open(os.path.join(tmp_dir, "gson@0")) as file:
+                self.assertEqual(file.read(), "Apache License")
+            self.assertEqual(requests, [None, '"v1"'])
+            self.assertEqual((stats.revalidated, stats.not_modified), (1, 1))
+            cache.close()
@@ -1,10 +1,39 @@
+import json
+import os
+import tempfile
+import time
 import unittest
+from contextlib import nullcontext
 from unittest import mock
 from unittest.mock import mock_open
 
 from anytree import AnyNode
 
-from license_sh.analyze.pipenv import get_pipenv_analyze_dict, analyze_pipenv
+from license_sh.analyze.pipenv import (
+    analyze_pipenv,
+    get_hashed_requirements,
+    get_install_target,
+    get_pipenv_analyze_dict,
+    get_target_key,
+    prune_targets,
+)
+from license_sh.fetcher import OFFLINE_ENV, OfflineError
+
+PIPFILE_LOCK = {
+    "_meta": {
+        "hash": {"sha256": "3f2a"},
+        "sources": [
+            {"name": "pypi", "url": "https://pypi.org/simple", "verify_ssl": True},
+            {"name": "internal", "url": "https://pypi.example.com/simple", "verify_ssl": True},
+        ],
+    },
+    "default": {
+        "idna": {"hashes": ["sha256:b307", "sha256:b97d"], "markers": "python_version >= '3'", "version": "==2.10"},
+        "requests": {"extras": ["socks"], "hashes": ["sha256:c210"], "version": "==2.25.1"},
+        "local-package": {"editable": True, "path": "."},
+    },
+    "develop": {"pytest": {"hashes": ["sha256:9d1e"], "version": "==6.2.2"}},
+}
 
 ANALYZE_RESULT = [
     {
@@ -26,12 +55,104 @@ ANALYZE_RESULT = [
 ]
 
 
+def install(directory, lock, target):
+    with open(os.path.join(target, "installed"), "w"):
+        return True
+
+
 class AnalyzePipenvTestCase(unittest.TestCase):
+    def test_hashed_requirements(self):
+        self.assertEqual(
+            get_hashed_requirements(PIPFILE_LOCK).splitlines(),
+            [
+                "-i https://pypi.org/simple",
+                "--extra-index-url https://pypi.example.com/simple",
+                "idna==2.10 ; python_version >= '3' --hash=sha256:b307 --hash=sha256:b97d",
+                "requests[socks]==2.25.1 --hash=sha256:c210",
+            ],
+        )
+
+    def test_target_key_changes_with_pinned_versions(self):
+        relocked = json.loads(json.dumps(PIPFILE_LOCK))
+        relocked["default"]["idna"].update(version="==2.9", hashes=["sha256:a3f1"])
+        # the Pipfile and so _meta.hash are the same
+        self.assertNotEqual(get_target_key(relocked), get_target_key(PIPFILE_LOCK))
+        self.assertIsNone(get_target_key({"_meta": PIPFILE_LOCK["_meta"]}))
+
+    def test_target_key_changes_with_python(self):
+        key = get_target_key(PIPFILE_LOCK)
+        with mock.patch("license_sh.analyze.pipenv.sys.version_info", (2, 7, 18)):
+            self.assertNotEqual(get_target_key(PIPFILE_LOCK), key)
+        with mock.patch("license_sh.analyze.pipenv.sysconfig.get_platform", return_value="win-amd64"):
+            self.assertNotEqual(get_target_key(PIPFILE_LOCK), key)
+
+    def test_install_target_is_cached_by_locked_packages(self):
+        with tempfile.TemporaryDirectory() as project, tempfile.TemporaryDirectory() as cache_dir:
+            with open(os.path.join(project, "Pipfile.lock"), "w") as pipfile_lock:
+                json.dump(PIPFILE_LOCK, pipfile_lock)
+            key = get_target_key(PIPFILE_LOCK)
+            with mock.patch.dict(os.environ, {"LICENSE_SH_CACHE_DIR": cache_dir}), mock.patch(
+                "license_sh.analyze.pipenv.install_requirements", side_effect=install
+            ) as install_requirements:
+                with get_install_target(project) as target:
+                    self.assertEqual(target, os.path.join(cache_dir, "pipenv-targets", key))
+                    self.assertTrue(os.path.isfile(os.path.join(target, "installed")))
+                # the lockfile didn't change, the target is reused
+                with get_install_target(project) as reused:
+                    self.assertEqual(reused, target)
+            self.assertEqual(install_requirements.call_count, 1)
+            self.assertEqual(os.listdir(os.path.join(cache_dir, "pipenv-targets")), [key])
+
+    def test_least_recently_used_targets_are_pruned(self):
+        with tempfile.TemporaryDirectory() as targets_dir:
+            for i, name in enumerate(["old", "staging-1", "recent", "newest"]):
+                os.makedirs(os.path.join(targets_dir, name))
+                os.utime(os.path.join(targets_dir, name), (i, i))
+            prune_targets(targets_dir, keep=2)
+            # staging directories of running installs are left alone
+            self.assertEqual(sorted(os.listdir(targets_dir)), ["newest", "recent", "staging-1"])
+
+    def test_recently_used_targets_arent_pruned(self):
+        with tempfile.TemporaryDirectory() as targets_dir:
+            for name in ["in-use", "newest"]:
+                os.makedirs(os.path.join(targets_dir, name))
+            os.utime(os.path.join(targets_dir, "in-use"), (time.time() - 60, time.time() - 60))
+            prune_targets(targets_dir, keep=1)
+            # a parallel run may still be analysing a target it just used
+            self.assertEqual(sorted(os.listdir(targets_dir)), ["in-use", "newest"])
+
+    def test_failed_install_isnt_cached(self):
+        with tempfile.TemporaryDirectory() as project, tempfile.TemporaryDirectory() as cache_dir:
+            with open(os.path.join(project, "Pipfile.lock"), "w") as pipfile_lock:
+                json.dump(PIPFILE_LOCK, pipfile_lock)
+            with mock.patch.dict(os.environ, {"LICENSE_SH_CACHE_DIR": cache_dir}), mock.patch(
+                "license_sh.analyze.pipenv.install_requirements", return_value=False
+            ):
+                with get_install_target(project) as target:
+                    self.assertTrue(os.path.isdir(target))
+            self.assertFalse(os.path.exists(target))
+            self.assertEqual(os.listdir(os.path.join(cache_dir, "pipenv-targets")), [])
+
+    def test_offline_install_target_has_to_be_cached(self):
+        with tempfile.TemporaryDirectory() as project, tempfile.TemporaryDirectory() as cache_dir:
+            with open(os.path.join(project, "Pipfile.lock"), "w") as pipfile_lock:
+                json.dump(PIPFILE_LOCK, pipfile_lock)
+            with mock.patch.dict(os.environ, {"LICENSE_SH_CACHE_DIR": cache_dir, OFFLINE_ENV: "1"}), mock.patch(
+                "license_sh.analyze.pipenv.install_requirements", return_value=False
+            ):
+                # bundles don't carry install targets, offline analysis needs one installed before
+                with self.assertRaises(OfflineError) as context:
+                    with get_install_target(project):
+                        pass
+            self.assertEqual(context.exception.missing, ["idna@2.10", "requests@2.25.1"])
+            self.assertEqual(os.listdir(os.path.join(cache_dir, "pipenv-targets")), [])
+
+    @mock.patch("license_sh.analyze.pipenv.get_install_target", return_value=nullcontext("target"))
     @mock.patch("builtins.open", callable=mock_open(read_data="data"))
     @mock.patch(
         "license_sh.analyze.pipenv.get_analyze_pipenv_data", return_value=ANALYZE_RESULT
     )
-    def test_get_pipenv_analyze_dict(self, mock_analyze_data, mock_open):
+    def test_get_pipenv_analyze_dict(self, mock_analyze_data, mock_open, mock_install_target):
         result = get_pipenv_analyze_dict("doenst/matter")
         self.assertEqual(result.get("react-15.5.4")[0].get("name"), "Apache-2.0")
         self.assertEqual(result.get("react-15.5.4")[1].get("name"), "MIT")
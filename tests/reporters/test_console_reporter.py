@@ -1,10 +1,48 @@
+import io
 import unittest
+from contextlib import redirect_stdout
+
+from anytree import AnyNode
+
+from license_sh.reporters.ConsoleReporter import ConsoleReporter
 
 
 class ConsoleReporterTestCase(unittest.TestCase):
     def test_path_tuple_is_rendered_correctly(self):
         pass
 
+    def test_unresolved_reason_is_rendered(self):
+        root = AnyNode(name="root", version="1.0.0", license=None, license_normalized=None)
+        AnyNode(
+            name="@acme/ui",
+            version="1.0.0",
+            license=None,
+            license_normalized=None,
+            license_problem=True,
+            license_unresolved_reason="private package, not looked up",
+            parent=root,
+        )
+        output = io.StringIO()
+        with redirect_stdout(output):
+            ConsoleReporter.output(root)
+        self.assertIn("Unknown (private package, not looked up)", output.getvalue())
+
+    def test_config_label_is_rendered(self):
+        root = AnyNode(name="root", version="1.0.0", license=None, license_normalized=None)
+        AnyNode(
+            name="internal",
+            version="1.0.0",
+            license="MIT",
+            license_normalized="MIT",
+            license_problem=False,
+            license_from_config=True,
+            parent=root,
+        )
+        output = io.StringIO()
+        with redirect_stdout(output):
+            ConsoleReporter.output(root)
+        self.assertIn("MIT (resolved from config)", output.getvalue())
+
 
 if __name__ == "__main__":
     unittest.main()
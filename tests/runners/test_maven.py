@@ -1,11 +1,52 @@
 import unittest
 import xml.etree.ElementTree as ET
+from unittest import mock
 
+from license_sh.fail_fast import FailFast, LicenseViolation
 from license_sh.runners.maven import (
+    MavenRunner,
     parse_dependency_xml,
     parse_licenses_xml,
     get_project_name,
 )
+from license_sh.types.nodes import PackageInfo
+
+LICENSES_XML = """<?xml version="1.0" encoding="UTF-8" standalone="no"?>
+<licenseSummary>
+  <dependencies>
+    <dependency>
+      <groupId>antlr</groupId>
+      <artifactId>antlr</artifactId>
+      <version>2.7.7</version>
+      <licenses>
+        <license>
+          <name>MIT</name>
+        </license>
+      </licenses>
+    </dependency>
+    <dependency>
+      <groupId>org.hibernate</groupId>
+      <artifactId>hibernate-core</artifactId>
+      <version>5.4.0</version>
+      <licenses>
+        <license>
+          <name>MIT</name>
+        </license>
+      </licenses>
+    </dependency>
+    <dependency>
+      <groupId>mysql</groupId>
+      <artifactId>mysql-connector-java</artifactId>
+      <version>8.0.23</version>
+      <licenses>
+        <license>
+          <name>GPL-2.0</name>
+        </license>
+      </licenses>
+    </dependency>
+  </dependencies>
+</licenseSummary>
+"""
 
 
 class ParserTestCase(unittest.TestCase):
@@ -179,5 +220,39 @@ class ParserTestCase(unittest.TestCase):
         )
 
 
+DEPENDENCY_TREE_XML = """<?xml version="1.0" encoding="UTF-8" standalone="no"?>
+<app version="1.0.0">
+  <hibernate-core version="5.4.0">
+    <mysql-connector-java version="8.0.23" />
+  </hibernate-core>
+  <antlr version="2.7.7" />
+</app>
+"""
+
+
+@mock.patch("license_sh.runners.maven.get_license_xml_file", return_value=ET.fromstring(LICENSES_XML))
+@mock.patch("license_sh.runners.maven.get_project_pom_xml", return_value=ET.fromstring(
+    "<project><artifactId>app</artifactId></project>"
+))
+@mock.patch("license_sh.runners.maven.check_maven")
+class MavenRunnerTestCase(unittest.TestCase):
+    @mock.patch("license_sh.runners.maven.get_dependency_tree_xml", return_value=ET.fromstring(DEPENDENCY_TREE_XML))
+    def test_fail_fast_reports_path_in_tree(self, dependency_tree_xml, check_maven, pom_xml, license_xml):
+        runner = MavenRunner("project", silent=True, debug=False, fail_fast=FailFast(["MIT"]))
+        with self.assertRaises(LicenseViolation) as violation:
+            runner.check()
+        self.assertEqual(violation.exception.package, PackageInfo("mysql-connector-java", "8.0.23"))
+        self.assertEqual(violation.exception.path, "hibernate-core@5.4.0 > mysql-connector-java@8.0.23")
+
+    @mock.patch("license_sh.runners.maven.get_dependency_tree_xml", return_value=ET.fromstring(
+        '<app version="1.0.0"><antlr version="2.7.7" /></app>'
+    ))
+    def test_fail_fast_ignores_packages_out_of_tree(self, dependency_tree_xml, check_maven, pom_xml, license_xml):
+        # mysql-connector-java is in the license summary, e.g. as a test dependency, but not in the tree
+        runner = MavenRunner("project", silent=True, debug=False, fail_fast=FailFast(["MIT"]))
+        tree = runner.check()
+        self.assertEqual([(node.name, node.license) for node in tree.children], [("antlr", "MIT")])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,145 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from anytree import PreOrderIter
+
+from license_sh.runners.npm import (
+    get_dependency_tree_from_packages,
+    resolve_package_path,
+    NpmRunner,
+)
+
+PACKAGE_JSON = {
+    "name": "app",
+    "version": "1.0.0",
+    "dependencies": {"a": "^1.0.0", "b": "^1.0.0", "workspace-lib": "*"},
+    "devDependencies": {"jest": "^26.0.0"},
+}
+
+PACKAGES = {
+    "": {
+        "name": "app",
+        "version": "1.0.0",
+        "dependencies": {"a": "^1.0.0", "b": "^1.0.0", "workspace-lib": "*"},
+        "devDependencies": {"jest": "^26.0.0"},
+    },
+    "node_modules/a": {
+        "version": "1.0.0",
+        "license": "MIT",
+        "integrity": "sha512-a",
+        "dependencies": {"c": "^2.0.0"},
+        "optionalDependencies": {"fsevents": "*"},
+    },
+    "node_modules/a/node_modules/c": {"version": "2.0.0", "license": "ISC", "dependencies": {"b": "*"}},
+    "node_modules/b": {"version": "1.1.0", "dependencies": {"c": "^1.0.0", "a": "^1.0.0"}},
+    "node_modules/c": {"version": "1.0.0", "license": "Apache-2.0"},
+    "node_modules/jest": {"version": "26.0.0", "license": "MIT", "dev": True},
+    "node_modules/workspace-lib": {"resolved": "packages/lib", "link": True},
+    "packages/lib": {"name": "workspace-lib", "version": "0.1.0", "license": "MIT", "dependencies": {"c": "*"}},
+}
+
+
+def get_paths(tree):
+    return sorted(
+        "/".join(f"{node.name}@{node.version}" for node in node.path[1:])
+        for node in PreOrderIter(tree)
+        if not node.is_root
+    )
+
+
+class NpmPackagesLockTestCase(unittest.TestCase):
+    def test_resolve_nested_package_first(self):
+        self.assertEqual(resolve_package_path(PACKAGES, "node_modules/a", "c"), "node_modules/a/node_modules/c")
+
+    def test_resolve_walks_up_to_root(self):
+        self.assertEqual(resolve_package_path(PACKAGES, "node_modules/a/node_modules/c", "b"), "node_modules/b")
+        self.assertEqual(resolve_package_path(PACKAGES, "node_modules/b", "c"), "node_modules/c")
+
+    def test_resolve_missing(self):
+        self.assertIsNone(resolve_package_path(PACKAGES, "node_modules/a", "fsevents"))
+
+    def test_dependency_tree(self):
+        tree = get_dependency_tree_from_packages(PACKAGE_JSON, PACKAGES)
+        self.assertEqual(tree.name, "app")
+        self.assertEqual(
+            get_paths(tree),
+            [
+                "a@1.0.0",
+                "a@1.0.0/c@2.0.0",
+                "a@1.0.0/c@2.0.0/b@1.1.0",
+                "a@1.0.0/c@2.0.0/b@1.1.0/a@1.0.0",
+                "a@1.0.0/c@2.0.0/b@1.1.0/c@1.0.0",
+                "b@1.1.0",
+                "b@1.1.0/a@1.0.0",
+                "b@1.1.0/a@1.0.0/c@2.0.0",
+                "b@1.1.0/a@1.0.0/c@2.0.0/b@1.1.0",
+                "b@1.1.0/c@1.0.0",
+                "workspace-lib@0.1.0",
+                "workspace-lib@0.1.0/c@1.0.0",
+            ],
+        )
+
+    def test_licenses_from_lockfile(self):
+        tree = get_dependency_tree_from_packages(PACKAGE_JSON, PACKAGES)
+        licenses = {(node.name, node.version): node.license for node in PreOrderIter(tree) if not node.is_root}
+        self.assertEqual(
+            licenses,
+            {
+                ("a", "1.0.0"): "MIT",
+                ("c", "2.0.0"): "ISC",
+                ("b", "1.1.0"): None,
+                ("c", "1.0.0"): "Apache-2.0",
+                ("workspace-lib", "0.1.0"): "MIT",
+            },
+        )
+
+    @mock.patch("license_sh.runners.npm.fetch_npm_licenses")
+    def test_only_packages_without_license_are_fetched(self, mock_fetch):
+        mock_fetch.return_value = {"b@1.1.0": "BSD-3-Clause"}
+        runner = NpmRunner(".", silent=True, debug=False)
+        tree = runner.check_packages(PACKAGE_JSON, PACKAGES)
+
+        fetched, integrities = mock_fetch.call_args[0][:2]
+        self.assertEqual(set(fetched), {("b", "1.1.0")})
+        self.assertEqual(integrities, {("a", "1.0.0"): "sha512-a"})
+        self.assertEqual(
+            {node.license for node in PreOrderIter(tree) if node.name == "b"}, {"BSD-3-Clause"}
+        )
+
+    @mock.patch("license_sh.runners.npm.fetch_npm_licenses")
+    def test_no_network_when_lockfile_has_all_licenses(self, mock_fetch):
+        packages = dict(PACKAGES)
+        packages["node_modules/b"] = dict(PACKAGES["node_modules/b"], license="MIT")
+        NpmRunner(".", silent=True, debug=False).check_packages(PACKAGE_JSON, packages)
+        mock_fetch.assert_not_called()
+
+
+class NpmLegacyLockTestCase(unittest.TestCase):
+    @mock.patch("license_sh.runners.npm.fetch_npm_licenses")
+    def test_only_tree_packages_are_fetched(self, mock_fetch):
+        package_lock = {
+            "lockfileVersion": 1,
+            "dependencies": {
+                "a": {"version": "1.0.0", "requires": {"c": "^1.0.0"}},
+                "c": {"version": "1.0.0"},
+                "jest": {"version": "26.0.0", "dev": True, "requires": {"jest-cli": "*"}},
+                "jest-cli": {"version": "26.0.0", "dev": True},
+            },
+        }
+        mock_fetch.return_value = {"a@1.0.0": "MIT", "c@1.0.0": "ISC"}
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, "package.json"), "w") as package_json:
+                json.dump({"name": "app", "dependencies": {"a": "^1.0.0"}, "devDependencies": {"jest": "*"}}, package_json)
+            with open(os.path.join(directory, "package-lock.json"), "w") as package_lock_file:
+                json.dump(package_lock, package_lock_file)
+            tree = NpmRunner(directory, silent=True, debug=False).check()
+
+        self.assertEqual(set(mock_fetch.call_args[0][0]), {("a", "1.0.0"), ("c", "1.0.0")})
+        self.assertEqual({node.license for node in PreOrderIter(tree) if not node.is_root}, {"MIT", "ISC"})
+
+
+if __name__ == "__main__":
+    unittest.main()
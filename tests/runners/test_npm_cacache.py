@@ -0,0 +1,94 @@
+import base64
+import hashlib
+import io
+import json
+import os
+import tarfile
+import tempfile
+import unittest
+
+from license_sh.runners.npm_cacache import (
+    CACHE_KEY_PREFIX,
+    get_content_path,
+    get_index_path,
+    read_index_entry,
+    resolve_from_npm_cache,
+)
+from license_sh.types.nodes import PackageInfo
+
+REGISTRY = "https://registry.npmjs.org"
+
+
+def get_integrity(data: bytes) -> str:
+    return "sha512-" + base64.b64encode(hashlib.sha512(data).digest()).decode()
+
+
+def make_tarball(package_json: dict) -> bytes:
+    output = io.BytesIO()
+    with tarfile.open(fileobj=output, mode="w:gz") as tarball:
+        for name, content in [("package/README.md", b"# readme"), ("package/package.json", json.dumps(package_json).encode())]:
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            tarball.addfile(info, io.BytesIO(content))
+    return output.getvalue()
+
+
+def write_content(cache_dir: str, data: bytes) -> str:
+    integrity = get_integrity(data)
+    path = get_content_path(cache_dir, integrity)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as content:
+        content.write(data)
+    return integrity
+
+
+def write_index(cache_dir: str, key: str, integrity):
+    entry = json.dumps({"key": key, "integrity": integrity, "time": 0, "size": 1, "metadata": {}})
+    path = get_index_path(cache_dir, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as bucket:
+        bucket.write(f"\n{hashlib.sha1(entry.encode()).hexdigest()}\t{entry}")
+
+
+class NpmCacacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = self.tmp_dir.name
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_tarball_by_lockfile_integrity(self):
+        integrity = write_content(self.cache_dir, make_tarball({"name": "react", "version": "16.0.0", "license": "MIT"}))
+        package = PackageInfo("react", "16.0.0")
+        result = resolve_from_npm_cache([package], REGISTRY, {package: integrity}, self.cache_dir)
+        self.assertEqual(result, {package: "MIT"})
+
+    def test_tarball_by_index(self):
+        integrity = write_content(self.cache_dir, make_tarball({"name": "@babel/core", "license": {"type": "ISC"}}))
+        write_index(self.cache_dir, f"{CACHE_KEY_PREFIX}{REGISTRY}/@babel/core/-/core-7.0.0.tgz", integrity)
+        result = resolve_from_npm_cache([("@babel/core", "7.0.0")], REGISTRY, cache_dir=self.cache_dir)
+        self.assertEqual(result, {PackageInfo("@babel/core", "7.0.0"): "ISC"})
+
+    def test_packument(self):
+        packument = {"name": "lodash", "versions": {"4.17.21": {"license": "MIT"}}}
+        integrity = write_content(self.cache_dir, json.dumps(packument).encode())
+        write_index(self.cache_dir, f"{CACHE_KEY_PREFIX}{REGISTRY}/lodash", integrity)
+        result = resolve_from_npm_cache(
+            [("lodash", "4.17.21"), ("lodash", "1.0.0")], REGISTRY, cache_dir=self.cache_dir
+        )
+        self.assertEqual(result, {PackageInfo("lodash", "4.17.21"): "MIT"})
+
+    def test_deleted_index_entry(self):
+        key = f"{CACHE_KEY_PREFIX}{REGISTRY}/lodash"
+        write_index(self.cache_dir, key, write_content(self.cache_dir, b"{}"))
+        write_index(self.cache_dir, key, None)
+        self.assertIsNone(read_index_entry(self.cache_dir, key))
+
+    def test_missing_cache(self):
+        result = resolve_from_npm_cache([("react", "16.0.0")], REGISTRY, cache_dir=os.path.join(self.cache_dir, "none"))
+        self.assertEqual(result, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
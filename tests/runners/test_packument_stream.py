@@ -0,0 +1,98 @@
+import json
+import unittest
+
+from license_sh.helpers import extract_npm_license
+from license_sh.runners.packument_stream import (
+    PackumentLicenseExtractor,
+    extract_packument_licenses,
+)
+
+PACKUMENT = {
+    "_id": "lodash",
+    "name": "lodash",
+    "description": "Lodash modular utilities.",
+    "dist-tags": {"latest": "4.17.21"},
+    "versions": {
+        "4.17.20": {
+            "name": "lodash",
+            "version": "4.17.20",
+            "license": "MIT",
+            "dependencies": {},
+            "dist": {"shasum": "b44a9b6297bcb698f1c51a3545a2b3b368d59c52"},
+        },
+        "4.17.21": {
+            "name": "lodash",
+            "version": "4.17.21",
+            "licenses": [{"type": "MIT"}, {"type": "Apache-2.0"}],
+            "keywords": ["modules", "stdlib", "util", "\"quoted\" {braces} [brackets]"],
+        },
+        "4.17.22": {"name": "lodash", "version": "4.17.22", "license": {"type": "ISC"}},
+    },
+    "time": {"modified": "2021-02-20T15:42:16.891Z", "4.17.21": "2021-02-20T15:42:16.891Z"},
+    "readme": "# lodash \\ with \"escapes\" and unicode ✓ " * 50,
+    "license": "MIT",
+}
+
+
+def split(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class PackumentStreamTestCase(unittest.TestCase):
+    def test_keeps_only_requested_versions(self):
+        page = extract_packument_licenses([json.dumps(PACKUMENT).encode()], ["4.17.21"])
+        self.assertEqual(
+            page,
+            {
+                "name": "lodash",
+                "license": "MIT",
+                "versions": {"4.17.21": {"licenses": [{"type": "MIT"}, {"type": "Apache-2.0"}]}},
+                "time": {"modified": "2021-02-20T15:42:16.891Z"},
+            },
+        )
+
+    def test_all_versions(self):
+        page = extract_packument_licenses([json.dumps(PACKUMENT).encode()])
+        self.assertEqual(set(page["versions"].keys()), {"4.17.20", "4.17.21", "4.17.22"})
+
+    def test_keeps_versions_without_license(self):
+        packument = {"name": "x", "license": "MIT", "versions": {"1.0.0": {"version": "1.0.0"}}}
+        page = extract_packument_licenses([json.dumps(packument).encode()])
+        self.assertEqual(page["versions"], {"1.0.0": {}})
+        self.assertEqual(extract_npm_license(page, "1.0.0"), "MIT")
+
+    def test_matches_full_parse_for_any_chunking(self):
+        data = json.dumps(PACKUMENT, indent=2, ensure_ascii=False).encode()
+        versions = ["4.17.20", "4.17.21", "4.17.22", "1.0.0"]
+        for size in [1, 2, 3, 7, 64, 1024, len(data)]:
+            page = extract_packument_licenses(split(data, size), versions)
+            for version in versions:
+                self.assertEqual(
+                    extract_npm_license(page, version),
+                    extract_npm_license(PACKUMENT, version),
+                    f"chunk size {size}, version {version}",
+                )
+
+    def test_version_document(self):
+        document = PACKUMENT["versions"]["4.17.22"]
+        page = extract_packument_licenses(split(json.dumps(document).encode(), 5), ["4.17.22"])
+        self.assertEqual(extract_npm_license(page, "4.17.22"), "ISC")
+
+    def test_numbers_split_between_chunks(self):
+        page = extract_packument_licenses([b'{"skipped": 12', b'34, "name": "x", "license": 1', b"2}"])
+        self.assertEqual(page, {"name": "x", "license": 12})
+
+    def test_invalid_documents(self):
+        for data in [b"<html>Not found</html>", b'{"name": "x"', b'{"name" "x"}', b"", b"[1, 2]"]:
+            with self.assertRaises(ValueError, msg=data):
+                extract_packument_licenses([data])
+
+    def test_incremental_feed(self):
+        extractor = PackumentLicenseExtractor(["1.0.0"])
+        extractor.feed(b'{"name": "x", "versions": {"1.0.0": {"lic')
+        extractor.feed(b'ense": "MIT"}}}')
+        self.assertEqual(extractor.close(), {"name": "x", "versions": {"1.0.0": {"license": "MIT"}}})
+
+
+if __name__ == "__main__":
+    unittest.main()
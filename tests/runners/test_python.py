@@ -0,0 +1,392 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from aiohttp import web
+
+from license_sh.cache import LicenseCache
+from license_sh.fetcher import NOT_FOUND, FetchStats
+from license_sh.resolvers import CACHE, INSTALLED, REGISTRY, LookupOptions
+from license_sh.runners.python import PythonRunner
+from license_sh.runners.python.environment import (
+    find_virtualenv,
+    get_dependency_tree,
+    get_metadata_resolver,
+    get_required_names,
+    get_site_packages,
+    parse_metadata,
+    read_distributions,
+)
+from license_sh.runners.python.pipfile_lock import get_locked_packages, get_pipfile_packages
+from license_sh.runners.python.pypi import fetch_index_metadata
+from license_sh.runners.python.simple_index import SIMPLE_JSON, find_metadata_url, get_json_api_url, is_simple_index
+from license_sh.types.nodes import PackageInfo
+from tests.utils.server import BackgroundServer
+
+REQUESTS_METADATA = """Metadata-Version: 2.1
+Name: requests
+Version: 2.25.1
+License: Apache 2.0
+Requires-Dist: idna (<3,>=2.5)
+Requires-Dist: urllib3 (<1.27,>=1.21.1)
+Requires-Dist: PySocks (!=1.5.7,>=1.5.6) ; extra == 'socks'
+
+Requests is an HTTP library.
+"""
+
+URLLIB3_METADATA = """Metadata-Version: 2.1
+Name: urllib3
+Version: 1.26.3
+License: MIT License
+
+        Copyright (c) 2008-2020 Andrey Petrov and contributors
+Classifier: License :: OSI Approved :: MIT License
+"""
+
+IDNA_METADATA = """Metadata-Version: 2.1
+Name: idna
+Version: 2.10
+License: UNKNOWN
+"""
+
+
+def install_distribution(site_packages, metadata):
+    distribution = parse_metadata(metadata)
+    path = os.path.join(site_packages, f"{distribution.name}-{distribution.version}.dist-info")
+    os.makedirs(path)
+    with open(os.path.join(path, "METADATA"), "w") as file:
+        file.write(metadata)
+
+
+def create_virtualenv(directory, *metadata):
+    virtualenv = os.path.join(directory, ".venv")
+    site_packages = os.path.join(virtualenv, "lib", "python3.9", "site-packages")
+    os.makedirs(site_packages)
+    open(os.path.join(virtualenv, "pyvenv.cfg"), "w").close()
+    for text in metadata:
+        install_distribution(site_packages, text)
+    return site_packages
+
+
+class EnvironmentTestCase(unittest.TestCase):
+    def test_parse_metadata(self):
+        requests = parse_metadata(REQUESTS_METADATA)
+        self.assertEqual((requests.name, requests.version, requests.license), ("requests", "2.25.1", "Apache 2.0"))
+        self.assertEqual(requests.requires, ["idna", "urllib3"])
+
+    def test_requirements_of_other_environments_are_skipped(self):
+        requirements = [
+            "idna (>=2.5) ; python_version >= '3'",
+            "enum34 ; python_version < '3.4'",
+            "pywin32 ; sys_platform == 'win32' and sys_platform == 'linux'",
+            "PySocks ; extra == 'socks'",
+        ]
+        self.assertEqual(get_required_names(requirements), ["idna"])
+
+    def test_license_text_falls_back_to_classifiers(self):
+        self.assertEqual(parse_metadata(URLLIB3_METADATA).license, "MIT License")
+        self.assertIsNone(parse_metadata(IDNA_METADATA).license)
+
+    def test_project_virtualenv(self):
+        with tempfile.TemporaryDirectory() as project:
+            site_packages = create_virtualenv(project)
+            self.assertEqual(find_virtualenv(project), os.path.join(project, ".venv"))
+            self.assertEqual(get_site_packages(project), [site_packages])
+
+    def test_dependency_tree(self):
+        with tempfile.TemporaryDirectory() as project:
+            site_packages = create_virtualenv(project, REQUESTS_METADATA, URLLIB3_METADATA, IDNA_METADATA)
+            distributions = read_distributions([site_packages])
+        root = get_dependency_tree(distributions)
+        self.assertEqual([node.name for node in root.children], ["requests"])
+        self.assertEqual([(node.name, node.version) for node in root.children[0].children],
+                         [("idna", "2.10"), ("urllib3", "1.26.3")])
+
+    def test_installed_resolver_answers_packages_with_license_data(self):
+        with tempfile.TemporaryDirectory() as project:
+            site_packages = create_virtualenv(project, REQUESTS_METADATA, IDNA_METADATA)
+            resolve = get_metadata_resolver(read_distributions([site_packages]))
+        packages = [PackageInfo("Requests", "2.25.1"), PackageInfo("idna", "2.10"), PackageInfo("requests", "2.0.0")]
+        self.assertEqual(resolve(packages), {PackageInfo("Requests", "2.25.1"): "Apache 2.0"})
+
+
+REQUESTS_PAGE = {
+    "meta": {"api-version": "1.0"},
+    "name": "requests",
+    "files": [
+        {"filename": "requests-2.25.1.tar.gz", "url": "/files/requests-2.25.1.tar.gz", "hashes": {}},
+        {
+            "filename": "requests-2.25.1-py2.py3-none-any.whl",
+            "url": "/files/requests-2.25.1-py2.py3-none-any.whl#sha256=abc",
+            "hashes": {},
+            "core-metadata": {"sha256": "def"},
+        },
+        {"filename": "requests-2.0.0-py2.py3-none-any.whl", "url": "/files/requests-2.0.0-py2.py3-none-any.whl"},
+    ],
+}
+
+# released only as an sdist, the index has no core metadata of it
+IDNA_PAGE = {
+    "meta": {"api-version": "1.0"},
+    "name": "idna",
+    "files": [{"filename": "idna-2.10.tar.gz", "url": "/files/idna-2.10.tar.gz", "hashes": {}}],
+}
+
+PROJECT_PAGES = {"requests": REQUESTS_PAGE, "idna": IDNA_PAGE}
+
+
+PIPFILE = """[[source]]
+url = "https://pypi.org/simple"
+
+[packages]
+"Requests" = {version = "*"}
+
+[dev-packages]
+pytest = "*"
+"""
+
+PIPFILE_LOCK = {
+    "_meta": {"hash": {"sha256": "abc"}},
+    "default": {
+        "idna": {"version": "==2.10"},
+        "requests": {"version": "==2.25.1"},
+        "urllib3": {"version": "==1.26.3"},
+        "local-package": {"path": "."},
+    },
+    "develop": {"pytest": {"version": "==6.2.2"}},
+}
+
+JSON_API = {
+    "requests/2.0.0": {"info": {"license": "Apache 2.0", "requires_dist": None}},
+    "idna/2.10": {"info": {"license": "BSD-like", "requires_dist": None}},
+    "urllib3/1.26.3": {"info": {"license": "MIT", "requires_dist": ["PySocks ; extra == 'socks'"]}},
+    "six/1.15.0": {"info": {"license": "", "classifiers": ["License :: OSI Approved :: MIT License"]}},
+    "unlicensed/1.0": {"info": {"license": "UNKNOWN", "requires_dist": None}},
+}
+
+
+def get_index_app(requests):
+    async def project(request):
+        requests.append(request.path)
+        if request.headers.get("Accept") != SIMPLE_JSON:
+            return web.Response(status=406)
+        if request.match_info["name"] not in PROJECT_PAGES:
+            return web.Response(status=404)
+        etag = f'"{request.match_info["name"]}"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.json_response(
+            PROJECT_PAGES[request.match_info["name"]], content_type=SIMPLE_JSON, headers={"ETag": etag}
+        )
+
+    async def metadata(request):
+        requests.append(request.path)
+        return web.Response(text=REQUESTS_METADATA)
+
+    async def release(request):
+        requests.append(request.path)
+        release = JSON_API.get(f"{request.match_info['name']}/{request.match_info['version']}")
+        return web.json_response(release) if release else web.Response(status=404)
+
+    app = web.Application()
+    app.router.add_get("/simple/{name}/", project)
+    app.router.add_get("/files/requests-2.25.1-py2.py3-none-any.whl.metadata", metadata)
+    app.router.add_get("/pypi/{name}/{version}/json", release)
+    return app
+
+
+def create_pipenv_project(directory):
+    with open(os.path.join(directory, "Pipfile"), "w") as pipfile:
+        pipfile.write(PIPFILE)
+    with open(os.path.join(directory, "Pipfile.lock"), "w") as pipfile_lock:
+        json.dump(PIPFILE_LOCK, pipfile_lock)
+
+
+class SimpleIndexTestCase(unittest.TestCase):
+    def test_simple_index_is_selected_by_url(self):
+        self.assertTrue(is_simple_index("https://pypi.org/simple"))
+        self.assertTrue(is_simple_index("https://mirror.example.com/pypi/simple/"))
+        self.assertFalse(is_simple_index("https://pypi.org/pypi"))
+        self.assertEqual(get_json_api_url("https://pypi.org/simple/"), "https://pypi.org/pypi")
+
+    def test_find_metadata_url(self):
+        page_url = "https://mirror.example.com/simple/requests/"
+        self.assertEqual(
+            find_metadata_url(REQUESTS_PAGE, page_url, "2.25.1"),
+            "https://mirror.example.com/files/requests-2.25.1-py2.py3-none-any.whl.metadata",
+        )
+        # the wheel of 2.0.0 has no core metadata file
+        self.assertIsNone(find_metadata_url(REQUESTS_PAGE, page_url, "2.0.0"))
+
+    def test_find_metadata_url_of_equal_version(self):
+        page_url = "https://mirror.example.com/simple/pkg/"
+        page = {
+            "files": [
+                {"filename": f"pkg-{version}-py3-none-any.whl", "url": f"/files/{version}.whl", "core-metadata": True}
+                for version in ["1.0", "2.0RC1", "3.0_1", "custom_build"]
+            ]
+        }
+        # versions are compared as PEP 440 versions, not as strings, invalid ones as escaped in file names
+        equal = [("1.0.0", "1.0"), ("2.0rc1", "2.0RC1"), ("3.0.post1", "3.0_1"), ("custom-build", "custom_build")]
+        for version, wheel in equal:
+            self.assertEqual(
+                find_metadata_url(page, page_url, version), f"https://mirror.example.com/files/{wheel}.whl.metadata"
+            )
+        self.assertIsNone(find_metadata_url(page, page_url, "1.0.1"))
+
+    def test_fetch_licenses_from_core_metadata(self):
+        requests = []
+        packages = [PackageInfo("Requests", "2.25.1"), PackageInfo("requests", "2.0.0"), PackageInfo("typo", "1.0")]
+        with BackgroundServer(get_index_app(requests)) as server:
+            stats = FetchStats()
+            license_map = PythonRunner.fetch_licenses(
+                packages,
+                LookupOptions(use_cache=False, stats=stats, registry=server.url("/simple")),
+            )
+        # the wheel of 2.0.0 has no core metadata, its release document is read instead
+        self.assertEqual(
+            license_map, {PackageInfo("Requests", "2.25.1"): "Apache 2.0", PackageInfo("requests", "2.0.0"): "Apache 2.0"}
+        )
+        self.assertEqual(stats.sources[PackageInfo("Requests", "2.25.1")], REGISTRY)
+        self.assertEqual(stats.unresolved, {("typo", "1.0"): NOT_FOUND})
+        # one project page per name
+        self.assertEqual(
+            sorted(requests),
+            [
+                "/files/requests-2.25.1-py2.py3-none-any.whl.metadata",
+                "/pypi/requests/2.0.0/json",
+                "/simple/requests/",
+                "/simple/typo/",
+            ],
+        )
+
+    def test_missing_release_document_is_not_negative_cached(self):
+        not_found = {}
+        with BackgroundServer(get_index_app([])) as server:
+            fetch_index_metadata(
+                [PackageInfo("idna", "3.0")],
+                server.url("/simple"),
+                lambda package, distribution: None,
+                not_found.__setitem__,
+                FetchStats(),
+            )
+        # the project is on the index, failing to read its metadata isn't a not found package
+        self.assertEqual(not_found, {PackageInfo("idna", "3.0"): None})
+
+    def test_json_api_license_falls_back_to_classifiers(self):
+        fetched = {}
+        with BackgroundServer(get_index_app([])) as server:
+            fetch_index_metadata(
+                [PackageInfo("six", "1.15.0"), PackageInfo("unlicensed", "1.0")],
+                server.url("/pypi"),
+                fetched.__setitem__,
+                lambda package, reason: None,
+                FetchStats(),
+            )
+        # no license is None, not a license name, so it's only cached for the unresolved TTL
+        self.assertEqual(
+            {package.name: distribution.license for package, distribution in fetched.items()},
+            {"six": "MIT License", "unlicensed": None},
+        )
+
+    def test_project_page_is_revalidated(self):
+        with tempfile.TemporaryDirectory() as tmp_dir, BackgroundServer(get_index_app([])) as server:
+            cache = LicenseCache(os.path.join(tmp_dir, "cache.sqlite3"))
+            for _ in range(2):
+                fetched = {}
+                stats = FetchStats()
+                fetch_index_metadata(
+                    [PackageInfo("requests", "2.25.1")],
+                    server.url("/simple"),
+                    fetched.__setitem__,
+                    lambda package, reason: None,
+                    stats,
+                    cache=cache,
+                )
+                self.assertEqual([distribution.license for distribution in fetched.values()], ["Apache 2.0"])
+            cache.close()
+        # the stored page is reused when the index answers 304
+        self.assertEqual((stats.revalidated, stats.not_modified), (1, 1))
+
+
+class PythonRunnerTestCase(unittest.TestCase):
+    def test_check_reads_installed_metadata(self):
+        with tempfile.TemporaryDirectory() as project:
+            create_virtualenv(project, REQUESTS_METADATA, URLLIB3_METADATA)
+            # no registry is running, a request would fail
+            with mock.patch.dict(
+                os.environ, {"LICENSE_SH_NO_CACHE": "1", "LICENSE_SH_PYPI_REGISTRY": "http://127.0.0.1:9"}
+            ):
+                root = PythonRunner(project, silent=True, debug=False).check()
+        (requests,) = root.children
+        (urllib3,) = requests.children
+        self.assertEqual((requests.license, requests.license_source), ("Apache 2.0", INSTALLED))
+        self.assertEqual((urllib3.license, urllib3.license_source), ("MIT License", INSTALLED))
+
+    def test_lockfile(self):
+        with tempfile.TemporaryDirectory() as project:
+            create_pipenv_project(project)
+            self.assertEqual(get_pipfile_packages(os.path.join(project, "Pipfile")), ["requests"])
+            self.assertEqual(
+                get_locked_packages(os.path.join(project, "Pipfile.lock")),
+                [PackageInfo("idna", "2.10"), PackageInfo("requests", "2.25.1"), PackageInfo("urllib3", "1.26.3")],
+            )
+
+    def check_locked_project(self, project, registry, config_packages=None):
+        # nothing is installed, the graph comes from the lockfile and core metadata
+        with mock.patch("license_sh.runners.python.read_environment", return_value={}), mock.patch.dict(
+            os.environ, {"LICENSE_SH_CACHE_DIR": os.path.join(project, "cache"), "LICENSE_SH_PYPI_REGISTRY": registry}
+        ):
+            return PythonRunner(project, silent=True, debug=False, config_packages=config_packages).check()
+
+    def test_config_packages_arent_fetched_from_lockfile(self):
+        requests = []
+        with tempfile.TemporaryDirectory() as project, mock.patch("license_sh.cache._cache", None):
+            create_pipenv_project(project)
+            with BackgroundServer(get_index_app(requests)) as server:
+                root = self.check_locked_project(project, server.url("/simple"), config_packages={"idna"})
+        (requests_node,) = root.children
+        idna, urllib3 = requests_node.children
+        # idna is ignored or overridden in the config, neither its page nor its release document is read
+        self.assertTrue(idna.license_from_config)
+        self.assertFalse(getattr(urllib3, "license_from_config", False))
+        self.assertFalse([path for path in requests if "idna" in path])
+
+    def test_check_builds_graph_from_lockfile(self):
+        requests = []
+        with tempfile.TemporaryDirectory() as project, mock.patch("license_sh.cache._cache", None):
+            create_pipenv_project(project)
+            with BackgroundServer(get_index_app(requests)) as server:
+                root = self.check_locked_project(project, server.url("/simple"))
+            (requests_node,) = root.children
+            self.assertEqual((requests_node.name, requests_node.license_source), ("requests", REGISTRY))
+            self.assertEqual([(node.name, node.version) for node in requests_node.children],
+                             [("idna", "2.10"), ("urllib3", "1.26.3")])
+            # idna has no wheel with core metadata, it's read from the JSON API, urllib3 isn't on the index
+            self.assertEqual([node.license for node in requests_node.children], ["BSD-like", None])
+
+            # a second run reads the metadata cache and the negative cache of the index, the index is gone
+            with mock.patch("license_sh.cache._cache", None):
+                root = self.check_locked_project(project, server.url("/simple"))
+            (requests_node,) = root.children
+            self.assertEqual((requests_node.license, requests_node.license_source), ("Apache 2.0", CACHE))
+            self.assertEqual([node.license for node in requests_node.children], ["BSD-like", None])
+            self.assertEqual(requests_node.children[0].license_source, CACHE)
+
+    def test_check_builds_graph_from_json_api(self):
+        requests = []
+        with tempfile.TemporaryDirectory() as project, mock.patch("license_sh.cache._cache", None):
+            create_pipenv_project(project)
+            with open(os.path.join(project, "Pipfile.lock"), "w") as pipfile_lock:
+                json.dump({"default": {"idna": {"version": "==2.10"}, "urllib3": {"version": "==1.26.3"}}}, pipfile_lock)
+            with BackgroundServer(get_index_app(requests)) as server:
+                root = self.check_locked_project(project, server.url("/pypi"))
+        self.assertEqual([(node.name, node.license) for node in root.children], [("idna", "BSD-like"), ("urllib3", "MIT")])
+        # licenses come with the metadata, each release is fetched once
+        self.assertEqual(sorted(requests), ["/pypi/idna/2.10/json", "/pypi/urllib3/1.26.3/json"])
+
+
+if __name__ == "__main__":
+    unittest.main()
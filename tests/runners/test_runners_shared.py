@@ -0,0 +1,316 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from unittest import mock
+
+from aiohttp import web
+
+from license_sh.cache import NPM, LicenseCache
+from license_sh.fail_fast import LicenseViolation
+from license_sh.fetcher import INVALID_RESPONSE, NOT_FOUND, OFFLINE_ENV, PRIVATE_PACKAGE, FetchStats, OfflineError
+from license_sh.registries import DEFAULT_REGISTRIES
+from license_sh.resolvers import INSTALLED, REGISTRY, LookupOptions
+from license_sh.runners.runners_shared import (
+    fetch_npm_licenses,
+    get_installed_npm_resolver,
+    get_npm_requests,
+    FEED_SIZE,
+    get_parse_executor,
+    iter_installed_npm_packages,
+    read_npm_stream,
+)
+from license_sh.runners.packument_stream import PackumentLicenseExtractor
+from license_sh.types.nodes import PackageInfo
+from tests.utils.server import BackgroundServer
+
+NPM_REGISTRY = DEFAULT_REGISTRIES[NPM]
+
+
+def install_package(node_modules, name, version, license=None):
+    package_dir = os.path.join(node_modules, name)
+    os.makedirs(package_dir)
+    with open(os.path.join(package_dir, "package.json"), "w") as package_json:
+        json.dump({"name": name, "version": version, "license": license}, package_json)
+    return os.path.join(package_dir, "node_modules")
+
+
+PACKUMENT = {
+    "name": "lodash",
+    "readme": "x" * 2 * 1024 * 1024,
+    "versions": {
+        "4.17.20": {"license": "MIT"},
+        "4.17.21": {"license": "ISC"},
+    },
+}
+
+
+def get_registry_app():
+    async def packument(request):
+        response = web.StreamResponse()
+        await response.prepare(request)
+        data = json.dumps(PACKUMENT).encode()
+        for i in range(0, len(data), 10000):
+            await response.write(data[i:i + 10000])
+        return response
+
+    async def version(request):
+        return web.json_response({"name": "react", "version": "16.0.0", "license": "MIT"})
+
+    async def not_json(request):
+        return web.Response(text="<html>Oops</html>")
+
+    async def left_pad(request):
+        if request.headers.get("If-None-Match") == '"v1"':
+            return web.Response(status=304)
+        document = {"name": "left-pad", "license": "WTFPL", "versions": {"1.0.0": {}, "1.1.0": {"license": "MIT"}}}
+        return web.json_response(document, headers={"ETag": '"v1"'})
+
+    app = web.Application()
+    app.router.add_get("/left-pad/", left_pad)
+    app.router.add_get("/lodash/", packument)
+    app.router.add_get("/react/16.0.0", version)
+    app.router.add_get("/broken/1.0.0", not_json)
+    return app
+
+
+class RunnersSharedTestCase(unittest.TestCase):
+    def test_single_version_uses_version_document(self):
+        requests = get_npm_requests([("react", "16.0.0")])
+        self.assertEqual(requests, [(f"{NPM_REGISTRY}/react/16.0.0", "react", ["16.0.0"])])
+
+    def test_scoped_single_version(self):
+        requests = get_npm_requests([("@babel/core", "7.0.0")])
+        self.assertEqual(requests, [(f"{NPM_REGISTRY}/@babel/core/7.0.0", "@babel/core", ["7.0.0"])])
+
+    def test_multiple_versions_share_packument(self):
+        requests = get_npm_requests(
+            [("lodash", "4.17.20"), ("react", "16.0.0"), ("lodash", "4.17.21"), ("lodash", "4.17.20")]
+        )
+        self.assertEqual(
+            requests,
+            [
+                (f"{NPM_REGISTRY}/lodash/", "lodash", ["4.17.20", "4.17.21"]),
+                (f"{NPM_REGISTRY}/react/16.0.0", "react", ["16.0.0"]),
+            ],
+        )
+
+    def test_no_packages(self):
+        self.assertEqual(get_npm_requests([]), [])
+
+    def test_fetch_npm_licenses(self):
+        for workers in ["thread", "process", "none"]:
+            with BackgroundServer(get_registry_app()) as server, mock.patch.dict(
+                os.environ, {"LICENSE_SH_PARSE_WORKERS": workers}
+            ), mock.patch.dict(os.environ, {"LICENSE_SH_NPM_REGISTRY": server.url()}):
+                stats = FetchStats()
+                license_map = fetch_npm_licenses(
+                    [("lodash", "4.17.20"), ("lodash", "4.17.21"), ("react", "16.0.0"), ("broken", "1.0.0")],
+                    options=LookupOptions(use_cache=False, stats=stats, use_npm_cache=False),
+                )
+            self.assertEqual(
+                license_map,
+                {"lodash@4.17.20": "MIT", "lodash@4.17.21": "ISC", "react@16.0.0": "MIT"},
+                workers,
+            )
+            self.assertEqual((stats.resolved, stats.failed), (3, 0), workers)
+            self.assertEqual(stats.unresolved, {("broken", "1.0.0"): INVALID_RESPONSE}, workers)
+
+    def test_installed_packages(self):
+        with tempfile.TemporaryDirectory() as directory:
+            node_modules = os.path.join(directory, "node_modules")
+            nested = install_package(node_modules, "a", "1.0.0", "MIT")
+            install_package(nested, "b", "1.0.0", "ISC")
+            install_package(node_modules, "b", "2.0.0")
+            install_package(node_modules, "@acme/ui", "3.0.0", "Apache-2.0")
+            os.makedirs(os.path.join(node_modules, ".bin"))
+            installed = dict(iter_installed_npm_packages(node_modules))
+        self.assertEqual(
+            installed,
+            {
+                ("a", "1.0.0"): "MIT",
+                ("b", "1.0.0"): "ISC",
+                ("b", "2.0.0"): None,
+                ("@acme/ui", "3.0.0"): "Apache-2.0",
+            },
+        )
+
+    def test_installed_packages_are_not_fetched(self):
+        with tempfile.TemporaryDirectory() as directory:
+            install_package(os.path.join(directory, "node_modules"), "lodash", "4.17.20", "MIT")
+            with BackgroundServer(get_registry_app()) as server:
+                with mock.patch.dict(os.environ, {"LICENSE_SH_NPM_REGISTRY": server.url()}):
+                    stats = FetchStats()
+                    license_map = fetch_npm_licenses(
+                        [("lodash", "4.17.20"), ("react", "16.0.0")],
+                        options=LookupOptions(
+                            use_cache=False,
+                            stats=stats,
+                            use_npm_cache=False,
+                            tiers=[(INSTALLED, get_installed_npm_resolver(directory))],
+                        ),
+                    )
+        self.assertEqual(license_map, {"lodash@4.17.20": "MIT", "react@16.0.0": "MIT"})
+        self.assertEqual(stats.sources, {("lodash", "4.17.20"): INSTALLED, ("react", "16.0.0"): REGISTRY})
+
+    def test_not_found_and_private_packages(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = LicenseCache(os.path.join(tmp_dir, "cache.sqlite3"))
+            packages = [("react", "16.0.0"), ("typo", "1.0.0"), ("@acme/ui", "1.0.0")]
+            with mock.patch("license_sh.runners.runners_shared.get_cache", return_value=cache):
+                with BackgroundServer(get_registry_app()) as server:
+                    with mock.patch.dict(os.environ, {"LICENSE_SH_NPM_REGISTRY": server.url()}):
+                        stats = FetchStats()
+                        fetch_npm_licenses(
+                            packages,
+                            options=LookupOptions(stats=stats, use_npm_cache=False, private_packages=["@acme/*"]),
+                        )
+                self.assertEqual(
+                    stats.unresolved, {("typo", "1.0.0"): NOT_FOUND, ("@acme/ui", "1.0.0"): PRIVATE_PACKAGE}
+                )
+                self.assertEqual(stats.failed, 0)
+
+                # with the registry gone the negative cache still answers
+                with mock.patch.dict(os.environ, {"LICENSE_SH_NPM_REGISTRY": server.url()}):
+                    stats = FetchStats()
+                    license_map = fetch_npm_licenses(
+                        packages,
+                        options=LookupOptions(stats=stats, use_npm_cache=False, private_packages=["@acme/*"]),
+                    )
+            self.assertEqual(license_map, {"react@16.0.0": "MIT"})
+            self.assertEqual(stats.unresolved[("typo", "1.0.0")], NOT_FOUND)
+            self.assertEqual(stats.failed, 0)
+            cache.close()
+
+    def test_config_packages_are_not_requested(self):
+        # no registry is running, a request would fail
+        with mock.patch.dict(os.environ, {"LICENSE_SH_NPM_REGISTRY": "http://127.0.0.1:9"}):
+            stats = FetchStats()
+            license_map = fetch_npm_licenses(
+                [("internal", "1.0.0"), ("other", "2.0.0")],
+                options=LookupOptions(
+                    use_cache=False,
+                    stats=stats,
+                    use_npm_cache=False,
+                    config_packages={"internal", "other==2.0.0"},
+                ),
+            )
+        self.assertEqual(license_map, {})
+        self.assertEqual(stats.from_config, {("internal", "1.0.0"), ("other", "2.0.0")})
+        self.assertEqual(stats.failed, 0)
+
+    def test_on_license_stops_fetching(self):
+        checked = []
+
+        def on_license(package, license):
+            checked.append(package)
+            if license == "ISC":
+                raise LicenseViolation(package, license, f"{package.name}@{package.version}")
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = LicenseCache(os.path.join(tmp_dir, "cache.sqlite3"))
+            cache.set_many(NPM, {PackageInfo("react", "16.0.0"): "MIT"})
+            with mock.patch("license_sh.runners.runners_shared.get_cache", return_value=cache):
+                with BackgroundServer(get_registry_app()) as server:
+                    with mock.patch.dict(os.environ, {"LICENSE_SH_NPM_REGISTRY": server.url()}):
+                        with self.assertRaises(LicenseViolation):
+                            fetch_npm_licenses(
+                                [("react", "16.0.0"), ("lodash", "4.17.20"), ("lodash", "4.17.21")],
+                                options=LookupOptions(use_npm_cache=False, on_license=on_license),
+                            )
+            # licenses known before fetching are checked first, fetched ones are kept for the next run
+            self.assertEqual(checked[0], ("react", "16.0.0"))
+            self.assertEqual(cache.get_many(NPM, [PackageInfo("lodash", "4.17.21")]), {("lodash", "4.17.21"): "ISC"})
+            cache.close()
+
+    def test_unknown_parse_workers(self):
+        with self.assertRaises(ValueError):
+            get_parse_executor("fibers")
+
+    def test_process_workers_by_default(self):
+        with mock.patch.dict(os.environ, clear=True):
+            executor = get_parse_executor()
+        self.assertIsInstance(executor, ProcessPoolExecutor)
+        executor.shutdown()
+
+    def test_stream_is_fed_to_workers_in_batches(self):
+        versions = {f"1.0.{i}": {"license": "MIT", "description": "x" * 1000} for i in range(3000)}
+        packument = json.dumps({"name": "big", "versions": versions}).encode()
+
+        class Content:
+            async def iter_chunked(self, size):
+                for start in range(0, len(packument), size):
+                    yield packument[start:start + size]
+
+        feed = PackumentLicenseExtractor.feed
+        with ThreadPoolExecutor() as executor, mock.patch.object(
+            PackumentLicenseExtractor, "feed", autospec=True, side_effect=feed
+        ) as fed:
+            resp = mock.Mock(content=Content())
+            document = asyncio.run(read_npm_stream(resp, ["1.0.1", "1.0.2"], executor))
+        self.assertEqual(document["licenses"], {"1.0.1": "MIT", "1.0.2": "MIT"})
+        self.assertEqual(fed.call_count, -(-len(packument) // FEED_SIZE))
+
+    def test_packument_fills_version_index(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = LicenseCache(os.path.join(tmp_dir, "cache.sqlite3"))
+            with mock.patch("license_sh.runners.runners_shared.get_cache", return_value=cache):
+                with BackgroundServer(get_registry_app()) as server:
+                    with mock.patch.dict(os.environ, {"LICENSE_SH_NPM_REGISTRY": server.url()}):
+                        fetch_npm_licenses(
+                            [("lodash", "4.17.20"), ("lodash", "4.17.21")],
+                            options=LookupOptions(use_npm_cache=False),
+                        )
+
+                # answered from the cache with no registry running
+                stats = FetchStats()
+                license_map = fetch_npm_licenses(
+                    [("lodash", "4.17.21")],
+                    options=LookupOptions(stats=stats, use_npm_cache=False),
+                )
+            self.assertEqual(license_map, {"lodash@4.17.21": "ISC"})
+            self.assertEqual(cache.get_version_index(NPM, [("lodash", "4.17.20")]), {("lodash", "4.17.20"): "MIT"})
+            cache.close()
+
+    def test_packument_is_revalidated(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = LicenseCache(os.path.join(tmp_dir, "cache.sqlite3"))
+            with mock.patch("license_sh.runners.runners_shared.get_cache", return_value=cache):
+                with BackgroundServer(get_registry_app()) as server:
+                    with mock.patch.dict(os.environ, {"LICENSE_SH_NPM_REGISTRY": server.url()}):
+                        fetch_npm_licenses(
+                            [("left-pad", "1.0.0"), ("left-pad", "1.1.0")],
+                            options=LookupOptions(use_npm_cache=False),
+                        )
+                        # versions missing in the stored index are answered by an unchanged packument
+                        stats = FetchStats()
+                        license_map = fetch_npm_licenses(
+                            [("left-pad", "0.9.0"), ("left-pad", "0.9.1")],
+                            options=LookupOptions(stats=stats, use_npm_cache=False),
+                        )
+            self.assertEqual(license_map, {"left-pad@0.9.0": "WTFPL", "left-pad@0.9.1": "WTFPL"})
+            self.assertEqual((stats.revalidated, stats.not_modified), (1, 1))
+            self.assertEqual(stats.sources[("left-pad", "0.9.0")], REGISTRY)
+            cache.close()
+
+    def test_offline_fails_on_missing_packages(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = LicenseCache(os.path.join(tmp_dir, "cache.sqlite3"))
+            cache.set_many(NPM, {PackageInfo("react", "16.0.0"): "MIT"})
+            with mock.patch("license_sh.runners.runners_shared.get_cache", return_value=cache):
+                with mock.patch.dict(os.environ, {OFFLINE_ENV: "1", "LICENSE_SH_NPM_REGISTRY": "http://127.0.0.1:9"}):
+                    license_map = fetch_npm_licenses([("react", "16.0.0")], options=LookupOptions(use_npm_cache=False))
+                    with self.assertRaises(OfflineError) as context:
+                        fetch_npm_licenses(
+                            [("react", "16.0.0"), ("lodash", "4.17.21")],
+                            options=LookupOptions(use_npm_cache=False),
+                        )
+            self.assertEqual(license_map, {"react@16.0.0": "MIT"})
+            self.assertEqual(context.exception.missing, ["lodash@4.17.21"])
+            cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,7 +6,9 @@ from license_sh.runners.yarn import (
     get_name,
     get_flat_tree,
     get_dependency_tree,
+    get_yarn_lock_integrities,
 )
+from license_sh.types.nodes import PackageInfo
 
 
 class ConsoleReporterTestCase(unittest.TestCase):
@@ -78,6 +80,23 @@ class ConsoleReporterTestCase(unittest.TestCase):
         self.assertEqual(package_map.get("toolbox-core1@^1.0.1"), "1.1.2")
         self.assertEqual(package_map.get("toolbox-core2@^1.0.1"), "1.1.3")
 
+    def test_lock_integrities(self):
+        lock_file = """{
+  "type": "success",
+  "object": {
+    "@toolbox/core@^1.0.1": {
+      "version": "1.1.1",
+      "integrity": "sha512-abc"
+    },
+    "toolbox-core1@^1.0.1": {
+      "version": "1.1.2"
+    }
+  }
+}
+"""
+        integrities = get_yarn_lock_integrities(json.loads(lock_file))
+        self.assertEqual(integrities, {PackageInfo("@toolbox/core", "1.1.1"): "sha512-abc"})
+
     def test_single_child_flat_tree(self):
         tree_data = [{"name": "@babel/helper-create-class-features-plugin@^7.5.5"}]
         package_map = {"@babel/helper-create-class-features-plugin@^7.5.5": "1.1.3"}
@@ -0,0 +1,88 @@
+import gzip
+import os
+import tempfile
+import unittest
+
+from anytree import AnyNode
+
+from license_sh.bundle import BundleStats, export_bundle, get_tree_licenses, get_tree_unresolved, import_bundle
+from license_sh.cache import NPM, PYPI, LicenseCache
+from license_sh.fetcher import NOT_FOUND
+from license_sh.resolvers import LOCKFILE, REGISTRY
+from license_sh.types.nodes import PackageInfo
+
+
+class BundleTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = LicenseCache(os.path.join(self.tmp_dir.name, "cache.sqlite3"))
+        self.offline_cache = LicenseCache(os.path.join(self.tmp_dir.name, "offline.sqlite3"))
+        self.bundle = os.path.join(self.tmp_dir.name, "bundle.ndjson.gz")
+
+    def tearDown(self):
+        self.cache.close()
+        self.offline_cache.close()
+        self.tmp_dir.cleanup()
+
+    def test_round_trip(self):
+        self.cache.set_version_index(NPM, "lodash", {"4.17.20": "MIT", "4.17.21": "ISC"}, "2021-02-20")
+        self.cache.set_texts({"http://www.apache.org/licenses/LICENSE-2.0.txt": "Apache License"})
+        self.cache.set_metadata(PYPI, {PackageInfo("requests", "2.25.1"): ("Apache 2.0", ["idna"])})
+        licenses = {
+            NPM: {PackageInfo("lodash", "4.17.21"): "ISC", PackageInfo("private", "1.0.0"): None},
+            PYPI: {PackageInfo("requests", "2.25.1"): "Apache 2.0"},
+        }
+        texts = ["http://www.apache.org/licenses/LICENSE-2.0.txt", "http://missing.example.com/LICENSE"]
+
+        self.assertEqual(export_bundle(self.bundle, self.cache, licenses, texts), BundleStats(3, 1, 1, 1))
+        self.assertEqual(import_bundle(self.bundle, self.offline_cache), BundleStats(3, 1, 1, 1))
+
+        self.assertEqual(self.offline_cache.get_many(NPM, licenses[NPM]), licenses[NPM])
+        self.assertEqual(self.offline_cache.get_many(PYPI, licenses[PYPI]), licenses[PYPI])
+        self.assertEqual(
+            self.offline_cache.get_version_index(NPM, [PackageInfo("lodash", "4.17.20")]),
+            {("lodash", "4.17.20"): "MIT"},
+        )
+        self.assertEqual(
+            self.offline_cache.get_texts(texts), {"http://www.apache.org/licenses/LICENSE-2.0.txt": "Apache License"}
+        )
+        self.assertEqual(
+            self.offline_cache.get_metadata(PYPI, licenses[PYPI]),
+            {PackageInfo("requests", "2.25.1"): ("Apache 2.0", ["idna"])},
+        )
+
+    def test_not_found_packages_round_trip(self):
+        registry = "https://registry.npmjs.org"
+        typo = PackageInfo("reactt", "16.0.0")
+        self.cache.set_not_found(NPM, registry, {typo: NOT_FOUND})
+        # an unresolved package the registry didn't answer for isn't exported
+        unresolved = {(NPM, registry): {typo, PackageInfo("flaky", "1.0.0")}}
+
+        self.assertEqual(export_bundle(self.bundle, self.cache, {}, (), unresolved), BundleStats(0, 0, 0, 0, 1))
+        self.assertEqual(import_bundle(self.bundle, self.offline_cache), BundleStats(0, 0, 0, 0, 1))
+
+        self.assertEqual(self.offline_cache.get_not_found(NPM, registry, [typo]), {typo: NOT_FOUND})
+        # negative entries belong to the registry that didn't know the package
+        self.assertEqual(self.offline_cache.get_not_found(NPM, "https://npm.example.com", [typo]), {})
+
+    def test_import_rejects_other_files(self):
+        with gzip.open(self.bundle, "wt") as file:
+            file.write('{"ecosystem": "npm", "name": "react", "version": "16.0.0", "license": "MIT"}\n')
+        with self.assertRaises(ValueError):
+            import_bundle(self.bundle, self.offline_cache)
+
+    def test_tree_licenses_skip_lockfile(self):
+        tree = AnyNode(name="app", version="1.0.0")
+        AnyNode(name="react", version="16.0.0", license="MIT", license_source=LOCKFILE, parent=tree)
+        AnyNode(name="lodash", version="4.17.21", license="ISC", license_source=REGISTRY, parent=tree)
+        self.assertEqual(get_tree_licenses(tree), {PackageInfo("lodash", "4.17.21"): "ISC"})
+
+    def test_tree_unresolved(self):
+        tree = AnyNode(name="app", version="1.0.0", license="MIT")
+        AnyNode(name="react", version="16.0.0", license="MIT", license_source=REGISTRY, parent=tree)
+        AnyNode(name="reactt", version="16.0.0", license=None, parent=tree)
+        self.assertEqual(get_tree_unresolved(tree), {PackageInfo("reactt", "16.0.0")})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,173 @@
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+
+from license_sh.cache import LicenseCache, NPM, PYPI, split_cached
+from license_sh.fetcher import Validators
+from license_sh.types.nodes import PackageInfo
+
+REGISTRY = "https://registry.npmjs.org"
+
+
+class LicenseCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = LicenseCache(os.path.join(self.tmp_dir.name, "cache.sqlite3"))
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp_dir.cleanup()
+
+    def test_get_after_set(self):
+        self.cache.set_many(NPM, {PackageInfo("react", "16.0.0"): "MIT"})
+        result = self.cache.get_many(NPM, [PackageInfo("react", "16.0.0"), PackageInfo("react", "17.0.0")])
+        self.assertEqual(result, {PackageInfo("react", "16.0.0"): "MIT"})
+
+    def test_ecosystems_are_separated(self):
+        self.cache.set_many(NPM, {PackageInfo("six", "1.0.0"): "MIT"})
+        self.assertEqual(self.cache.get_many(PYPI, [PackageInfo("six", "1.0.0")]), {})
+
+    def test_integrity_mismatch_is_a_miss(self):
+        package = PackageInfo("react", "16.0.0")
+        self.cache.set_many(NPM, {package: "MIT"}, {package: "sha512-a"})
+        self.assertEqual(self.cache.get_many(NPM, [package], {package: "sha512-b"}), {})
+        self.assertEqual(self.cache.get_many(NPM, [package], {package: "sha512-a"}), {package: "MIT"})
+        self.assertEqual(self.cache.get_many(NPM, [package]), {package: "MIT"})
+
+    def test_unresolved_entries_expire(self):
+        package = PackageInfo("private", "1.0.0")
+        self.cache.set_many(NPM, {package: None})
+        self.assertEqual(self.cache.get_many(NPM, [package]), {package: None})
+        self.cache.unresolved_ttl = 0
+        time.sleep(0.01)
+        self.assertEqual(self.cache.get_many(NPM, [package]), {})
+
+    def test_lru_eviction(self):
+        self.cache.max_size = 1000
+        for i in range(5):
+            self.cache.set_many(NPM, {PackageInfo(f"package{i}", "1.0.0"): "MIT"})
+        self.cache.get_many(NPM, [PackageInfo("package0", "1.0.0")])
+        self.cache.set_many(NPM, {PackageInfo(f"other{i}", "1.0.0"): "MIT" for i in range(10)})
+
+        stats = self.cache.stats()
+        self.assertLessEqual(stats.size, 1000)
+        self.assertEqual(self.cache.get_many(NPM, [PackageInfo("package1", "1.0.0")]), {})
+
+    def test_stats_and_clear(self):
+        self.cache.set_many(NPM, {PackageInfo("react", "16.0.0"): "MIT", PackageInfo("x", "1.0.0"): None})
+        self.cache.get_many(NPM, [PackageInfo("react", "16.0.0"), PackageInfo("y", "1.0.0")])
+        stats = self.cache.stats()
+        self.assertEqual(stats.entries, 2)
+        self.assertEqual(stats.unresolved, 1)
+        self.assertEqual((stats.hits, stats.misses), (1, 1))
+        self.assertEqual(stats.hit_rate, 0.5)
+
+        self.cache.clear()
+        stats = self.cache.stats()
+        self.assertEqual((stats.entries, stats.hits, stats.misses), (0, 0, 0))
+
+    def test_shared_between_connections(self):
+        other = LicenseCache(self.cache.path)
+        other.set_many(NPM, {PackageInfo("react", "16.0.0"): "MIT"})
+        other.close()
+        self.assertEqual(self.cache.get_many(NPM, [PackageInfo("react", "16.0.0")]), {PackageInfo("react", "16.0.0"): "MIT"})
+
+    def test_version_index(self):
+        self.cache.set_version_index(
+            NPM, "lodash", {"4.17.20": "MIT", "4.17.21": "MIT", "0.1.0": None}, "2021-02-20T15:42:16.891Z"
+        )
+        result = self.cache.get_version_index(
+            NPM, [PackageInfo("lodash", "4.17.21"), PackageInfo("lodash", "0.1.0"), PackageInfo("lodash", "5.0.0")]
+        )
+        self.assertEqual(result, {PackageInfo("lodash", "4.17.21"): "MIT", PackageInfo("lodash", "0.1.0"): None})
+        self.assertEqual(self.cache.get_version_index(PYPI, [PackageInfo("lodash", "4.17.21")]), {})
+
+        stats = self.cache.stats()
+        self.assertEqual((stats.indexed_packages, stats.index_hits), (1, 2))
+        self.cache.clear()
+        self.assertEqual(self.cache.get_version_index(NPM, [PackageInfo("lodash", "4.17.21")]), {})
+
+    def test_version_index_eviction(self):
+        self.cache.max_size = 1000
+        for i in range(10):
+            self.cache.set_version_index(NPM, f"package{i}", {f"1.0.{v}": "MIT" for v in range(10)})
+        self.assertLessEqual(self.cache.stats().size, 1000)
+        self.assertEqual(self.cache.get_version_index(NPM, [PackageInfo("package0", "1.0.0")]), {})
+
+    def test_packument_validators(self):
+        self.cache.set_version_index(NPM, "lodash", {"4.17.21": "MIT"}, validators=Validators('"abc"'), license="MIT")
+        self.cache.set_version_index(NPM, "react", {"16.0.0": "MIT"})
+        self.assertEqual(
+            self.cache.get_packument_validators(NPM, ["lodash", "react"]), {"lodash": (Validators('"abc"'), "MIT")}
+        )
+
+    def test_metadata(self):
+        self.cache.set_metadata(PYPI, {PackageInfo("requests", "2.25.1"): ("Apache 2.0", ["idna", "urllib3"])})
+        self.cache.set_metadata(PYPI, {PackageInfo("idna", "2.10"): (None, [])})
+        packages = [PackageInfo("requests", "2.25.1"), PackageInfo("idna", "2.10"), PackageInfo("idna", "3.1")]
+        self.assertEqual(
+            self.cache.get_metadata(PYPI, packages),
+            {PackageInfo("requests", "2.25.1"): ("Apache 2.0", ["idna", "urllib3"]), PackageInfo("idna", "2.10"): (None, [])},
+        )
+        self.assertEqual(self.cache.stats().metadata, 2)
+
+    def test_stale_texts(self):
+        url = "http://www.apache.org/licenses/LICENSE-2.0.txt"
+        self.cache.set_texts({url: "Apache License"}, {url: Validators(last_modified="Sat, 20 Feb 2021 10:00:00 GMT")})
+        self.assertEqual(self.cache.get_stale_texts([url]), {})
+        self.cache.revalidate_after = 0
+        time.sleep(0.01)
+        self.assertEqual(
+            self.cache.get_stale_texts([url]), {url: Validators(last_modified="Sat, 20 Feb 2021 10:00:00 GMT")}
+        )
+        self.cache.revalidate_after = 60
+        self.cache.refresh_texts([url])
+        self.assertEqual(self.cache.get_stale_texts([url]), {})
+        self.assertEqual(self.cache.get_texts([url]), {url: "Apache License"})
+
+    def test_columns_are_added_to_existing_caches(self):
+        path = os.path.join(self.tmp_dir.name, "old.sqlite3")
+        connection = sqlite3.connect(path)
+        connection.execute(
+            "CREATE TABLE packuments (key TEXT PRIMARY KEY, ecosystem TEXT NOT NULL, name TEXT NOT NULL, "
+            "modified TEXT, licenses TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL, "
+            "size INTEGER NOT NULL)"
+        )
+        connection.close()
+        cache = LicenseCache(path)
+        cache.set_version_index(NPM, "lodash", {"4.17.21": "MIT"}, validators=Validators('"abc"'))
+        self.assertEqual(cache.get_packument_validators(NPM, ["lodash"]), {"lodash": (Validators('"abc"'), None)})
+        cache.close()
+
+    def test_not_found_entries_expire(self):
+        package = PackageInfo("typo", "1.0.0")
+        self.cache.set_not_found(NPM, REGISTRY, {package: "not found on the registry"})
+        self.assertEqual(self.cache.get_not_found(NPM, REGISTRY, [package]), {package: "not found on the registry"})
+        self.assertEqual(self.cache.get_not_found(PYPI, REGISTRY, [package]), {})
+        self.assertEqual(self.cache.stats().not_found, 1)
+        self.cache.not_found_ttl = 0
+        time.sleep(0.01)
+        self.assertEqual(self.cache.get_not_found(NPM, REGISTRY, [package]), {})
+
+    def test_not_found_entries_are_per_registry(self):
+        package = PackageInfo("@acme/ui", "1.0.0")
+        self.cache.set_not_found(NPM, REGISTRY, {package: "not found on the registry"})
+        # the mirror may have the package, it's asked
+        self.assertEqual(self.cache.get_not_found(NPM, "https://npm.mirror.example.com", [package]), {})
+
+    def test_split_cached(self):
+        self.cache.set_many(NPM, {PackageInfo("react", "16.0.0"): "MIT"})
+        cached, missing = split_cached(self.cache, NPM, [("react", "16.0.0"), ("redux", "4.0.0")])
+        self.assertEqual(cached, {PackageInfo("react", "16.0.0"): "MIT"})
+        self.assertEqual(missing, [PackageInfo("redux", "4.0.0")])
+
+    def test_split_cached_without_cache(self):
+        cached, missing = split_cached(None, NPM, [("react", "16.0.0")])
+        self.assertEqual(cached, {})
+        self.assertEqual(missing, [PackageInfo("react", "16.0.0")])
+
+
+if __name__ == "__main__":
+    unittest.main()
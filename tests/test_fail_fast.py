@@ -0,0 +1,53 @@
+import unittest
+
+from anytree import AnyNode
+
+from license_sh.fail_fast import FailFast, LicenseViolation
+from license_sh.types.nodes import PackageInfo
+
+
+def get_tree():
+    tree = AnyNode(name="project", version="")
+    react = AnyNode(name="react", version="16.0.0", parent=tree)
+    AnyNode(name="gpl-package", version="1.0.0", parent=react, license="GPL-3.0")
+    AnyNode(name="loose-envify", version="1.4.0", parent=react)
+    AnyNode(name="left-pad", version="1.3.0", parent=tree, license="WTFPL")
+    return tree
+
+
+class FailFastTestCase(unittest.TestCase):
+    def test_whitelisted_license_passes(self):
+        fail_fast = FailFast(["MIT", "Apache-2.0"])
+        fail_fast.check(PackageInfo("react", "16.0.0"), "MIT")
+        fail_fast.check(PackageInfo("react", "16.0.0"), "(MIT OR GPL-3.0)")
+
+    def test_violation_reports_path(self):
+        fail_fast = FailFast(["MIT"])
+        with self.assertRaises(LicenseViolation) as context:
+            fail_fast.watch(get_tree())
+        # direct dependencies are checked first
+        self.assertEqual(context.exception.path, "left-pad@1.3.0")
+
+        with self.assertRaises(LicenseViolation) as context:
+            fail_fast.check(PackageInfo("loose-envify", "1.4.0"), None)
+        self.assertEqual(context.exception.path, "react@16.0.0 > loose-envify@1.4.0")
+        self.assertIsNone(context.exception.license)
+
+    def test_ignored_and_overridden_packages(self):
+        fail_fast = FailFast(
+            ["MIT"],
+            ignored_packages=["left-pad"],
+            overridden_packages={"gpl-package==1.0.0": {"license": "MIT", "licenseText": "", "reason": "Dual"}},
+        )
+        fail_fast.watch(get_tree())
+        fail_fast.check(PackageInfo("left-pad", "1.3.0"), None)
+
+        fail_fast = FailFast(
+            ["MIT"], overridden_packages={"react": {"license": "GPL-3.0", "licenseText": "", "reason": "Vendored"}}
+        )
+        with self.assertRaises(LicenseViolation):
+            fail_fast.check(PackageInfo("react", "16.0.0"), "MIT")
+
+
+if __name__ == "__main__":
+    unittest.main()
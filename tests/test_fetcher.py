@@ -0,0 +1,386 @@
+import asyncio
+import errno
+import os
+import threading
+import unittest
+from collections import Counter
+from unittest import mock
+
+import aiohttp
+from aiohttp import web
+
+from license_sh.fetcher import (
+    AdaptiveWindow,
+    FetchEngine,
+    Fetcher,
+    FetchError,
+    FetchOptions,
+    FetchStats,
+    OFFLINE_ENV,
+    Validators,
+    fetch_all,
+    get_conditional_headers,
+    get_retry_after,
+    get_validators,
+    is_congestion,
+    split_private,
+)
+from license_sh.types.nodes import PackageInfo
+from tests.utils.server import BackgroundServer
+
+OPTIONS = FetchOptions(connections_per_host=2, timeout=1, retries=2, backoff=0.01, max_backoff=0.05)
+
+
+def get_app():
+    calls: Counter = Counter()
+    in_flight = {"current": 0, "max": 0}
+
+    async def ok(request):
+        return web.Response(text="ok")
+
+    async def flaky(request):
+        calls["flaky"] += 1
+        if calls["flaky"] <= 2:
+            return web.Response(status=503)
+        return web.Response(text="recovered")
+
+    async def throttled(request):
+        calls["throttled"] += 1
+        if calls["throttled"] == 1:
+            return web.Response(status=429, headers={"Retry-After": "0"})
+        return web.Response(text="throttled")
+
+    async def missing(request):
+        calls["missing"] += 1
+        return web.Response(status=404)
+
+    async def broken(request):
+        return web.Response(status=500)
+
+    async def peer(request):
+        return web.Response(text=str(request.transport.get_extra_info("peername")[1]))
+
+    async def slow(request):
+        calls["slow"] += 1
+        in_flight["current"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["current"])
+        await asyncio.sleep(0.05)
+        in_flight["current"] -= 1
+        return web.Response(text=request.match_info["id"])
+
+    app = web.Application()
+    app.router.add_get("/ok", ok)
+    app.router.add_get("/flaky", flaky)
+    app.router.add_get("/throttled", throttled)
+    app.router.add_get("/missing", missing)
+    app.router.add_get("/broken", broken)
+    app.router.add_get("/slow/{id}", slow)
+    app.router.add_get("/peer", peer)
+    return app, calls, in_flight
+
+
+def get_hedging_app():
+    calls: Counter = Counter()
+
+    async def ok(request):
+        return web.Response(text="ok")
+
+    async def stall_once(request):
+        calls["stall_once"] += 1
+        if calls["stall_once"] == 1:
+            await asyncio.sleep(0.5)
+            return web.Response(text="stalled")
+        return web.Response(text="hedged")
+
+    app = web.Application()
+    app.router.add_get("/ok", ok)
+    app.router.add_get("/stall_once", stall_once)
+    return app, calls
+
+
+async def fetch_one(url: str, stats: FetchStats = None) -> str:
+    async with Fetcher(OPTIONS, stats) as fetcher:
+        return await fetcher.fetch(url)
+
+
+class FetcherTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app, self.calls, self.in_flight = get_app()
+        self.server = BackgroundServer(self.app).__enter__()
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+
+    def test_fetch(self):
+        self.assertEqual(asyncio.run(fetch_one(self.server.url("/ok"))), "ok")
+
+    def test_retries_server_errors(self):
+        stats = FetchStats()
+        self.assertEqual(asyncio.run(fetch_one(self.server.url("/flaky"), stats)), "recovered")
+        self.assertEqual(stats.retries, 2)
+
+    def test_honours_retry_after(self):
+        self.assertEqual(asyncio.run(fetch_one(self.server.url("/throttled"))), "throttled")
+
+    def test_does_not_retry_not_found(self):
+        with self.assertRaises(FetchError) as context:
+            asyncio.run(fetch_one(self.server.url("/missing")))
+        self.assertEqual(context.exception.status, 404)
+        self.assertEqual(self.calls["missing"], 1)
+
+    def test_offline_mode_makes_no_requests(self):
+        with mock.patch.dict(os.environ, {OFFLINE_ENV: "1"}):
+            with self.assertRaises(FetchError):
+                asyncio.run(fetch_one(self.server.url("/missing")))
+        self.assertEqual(self.calls["missing"], 0)
+
+    def test_gives_up_after_retries(self):
+        with self.assertRaises(FetchError) as context:
+            asyncio.run(fetch_one(self.server.url("/broken")))
+        self.assertEqual(context.exception.status, 500)
+
+    def test_fetch_all_limits_concurrency_per_host(self):
+        results = {}
+        fetch_all(
+            [(self.server.url(f"/slow/{i}"), i) for i in range(8)],
+            lambda output, i: results.__setitem__(i, output),
+            options=OPTIONS,
+        )
+        self.assertEqual(results, {i: str(i) for i in range(8)})
+        self.assertLessEqual(self.in_flight["max"], OPTIONS.connections_per_host)
+
+    def test_fetch_all_reports_failures_as_none(self):
+        results = {}
+        fetch_all(
+            [(self.server.url("/missing"), "missing"), (self.server.url("/ok"), "ok")],
+            lambda output, name: results.__setitem__(name, output),
+            options=OPTIONS,
+        )
+        self.assertEqual(results, {"missing": None, "ok": "ok"})
+
+
+class FetchEngineTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app, self.calls, self.in_flight = get_app()
+        self.server = BackgroundServer(self.app).__enter__()
+        self.engine = FetchEngine(OPTIONS)
+
+    def tearDown(self):
+        self.engine.close()
+        self.server.__exit__(None, None, None)
+
+    def fetch_peer(self) -> str:
+        results = []
+        fetch_all([(self.server.url("/peer"), None)], lambda output, _: results.append(output), engine=self.engine)
+        return results[0]
+
+    def test_connection_is_kept_alive_between_fetches(self):
+        self.assertEqual(self.fetch_peer(), self.fetch_peer())
+
+    def test_stream(self):
+        stream = self.engine.stream([(self.server.url("/missing"), "missing"), (self.server.url("/ok"), "ok")])
+        results = {item.payload: (item.result, item.error and item.error.status) for item in stream}
+        self.assertEqual(results, {"missing": (None, 404), "ok": ("ok", None)})
+
+    def test_concurrent_streams_share_host_window(self):
+        results = {}
+
+        def run(offset):
+            for item in self.engine.stream([(self.server.url(f"/slow/{offset + i}"), offset + i) for i in range(4)]):
+                results[item.payload] = item.result
+
+        threads = [threading.Thread(target=run, args=(offset,)) for offset in (0, 4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, {i: str(i) for i in range(8)})
+        self.assertLessEqual(self.in_flight["max"], OPTIONS.connections_per_host)
+
+    def test_error_in_handle_cancels_pending_fetches(self):
+        def handle(output, i):
+            raise ValueError(i)
+
+        with self.assertRaises(ValueError):
+            fetch_all([(self.server.url(f"/slow/{i}"), i) for i in range(8)], handle, engine=self.engine)
+        self.engine.run(asyncio.sleep(0.2))
+        self.assertLess(self.calls["slow"], 8)
+
+
+class HedgingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app, self.calls = get_hedging_app()
+        self.server = BackgroundServer(self.app).__enter__()
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+
+    def fetch_after_warm_up(self, options: FetchOptions, stats: FetchStats, hedge: bool = True) -> str:
+        async def run():
+            async with Fetcher(options, stats) as fetcher:
+                for _ in range(20):
+                    await fetcher.fetch(self.server.url("/ok"), hedge=hedge)
+                return await fetcher.fetch(self.server.url("/stall_once"), hedge=hedge)
+
+        return asyncio.run(run())
+
+    def test_slow_request_is_hedged(self):
+        stats = FetchStats()
+        result = self.fetch_after_warm_up(OPTIONS._replace(hedge_percentile=90), stats)
+        self.assertEqual(result, "hedged")
+        self.assertEqual((stats.hedged, self.calls["stall_once"]), (1, 2))
+
+    def test_hedging_is_off_by_default(self):
+        stats = FetchStats()
+        self.assertEqual(self.fetch_after_warm_up(OPTIONS, stats), "stalled")
+        self.assertEqual(stats.hedged, 0)
+
+    def test_hedge_budget(self):
+        fetcher = Fetcher(OPTIONS._replace(hedge_percentile=90, hedge_budget=0.1))
+        fetcher.requests = 20
+        self.assertEqual([fetcher.take_hedge() for _ in range(3)], [True, True, False])
+
+
+class AdaptiveWindowTestCase(unittest.TestCase):
+    def test_additive_increase(self):
+        window = AdaptiveWindow("registry", initial=2, maximum=4)
+        window.on_success(0.01)
+        window.on_success(0.01)
+        self.assertEqual(window.limit, 2)
+        for _ in range(10):
+            window.on_success(0.01)
+        self.assertEqual(window.limit, 4)
+        for _ in range(20):
+            window.on_success(0.01)
+        self.assertEqual(window.limit, 4)
+
+    def test_slow_responses_stop_growth(self):
+        window = AdaptiveWindow("registry", initial=2, maximum=16)
+        window.on_success(0.01)
+        limit = window.limit
+        for _ in range(10):
+            window.on_success(1.0)
+        self.assertEqual(window.limit, limit)
+
+    def test_multiplicative_decrease_once_per_round_trip(self):
+        window = AdaptiveWindow("registry", initial=8, maximum=16)
+        window.on_success(10.0)
+        window.on_congestion("HTTP 429")
+        window.on_congestion("HTTP 429")
+        self.assertEqual((window.limit, window.decreases), (4, 1))
+
+    def test_never_below_one(self):
+        window = AdaptiveWindow("registry", initial=2, maximum=16)
+        for _ in range(5):
+            window.last_decrease = 0.0
+            window.on_congestion("timeout")
+        self.assertEqual(window.limit, 1)
+
+    def test_fetcher_backs_off_on_throttling(self):
+        app = web.Application()
+
+        async def throttle(request):
+            return web.Response(status=429, headers={"Retry-After": "0"})
+
+        app.router.add_get("/throttle", throttle)
+
+        async def run(url):
+            async with Fetcher(OPTIONS._replace(connections_per_host=8, retries=3)) as fetcher:
+                with self.assertRaises(FetchError):
+                    await fetcher.fetch(url)
+                return fetcher.get_window(url)
+
+        with BackgroundServer(app) as server:
+            window = asyncio.run(run(server.url("/throttle")))
+        self.assertEqual(window.limit, 1)
+
+
+class CongestionTestCase(unittest.TestCase):
+    def test_resets_are_congestion(self):
+        self.assertTrue(is_congestion(aiohttp.ServerDisconnectedError()))
+        self.assertTrue(is_congestion(aiohttp.ClientOSError(errno.ECONNRESET, "Connection reset by peer")))
+
+    def test_broken_responses_arent_congestion(self):
+        self.assertFalse(is_congestion(aiohttp.ClientPayloadError("Response payload is not completed")))
+        self.assertFalse(is_congestion(aiohttp.ClientConnectorError(mock.Mock(), OSError(errno.ECONNREFUSED, "refused"))))
+
+    def test_broken_response_isnt_retried(self):
+        calls: Counter = Counter()
+        app = web.Application()
+
+        async def truncated(request):
+            calls["truncated"] += 1
+            resp = web.StreamResponse(headers={"Content-Length": "100"})
+            await resp.prepare(request)
+            await resp.write(b"short")
+            request.transport.close()
+            return resp
+
+        app.router.add_get("/truncated", truncated)
+
+        async def run(url):
+            async with Fetcher(OPTIONS) as fetcher:
+                with self.assertRaises(FetchError) as context:
+                    await fetcher.fetch(url)
+                return context.exception, fetcher.get_window(url)
+
+        with BackgroundServer(app) as server:
+            error, window = asyncio.run(run(server.url("/truncated")))
+        # the body is shorter than its Content-Length, asking again wouldn't help
+        self.assertEqual(error.reason, "ClientPayloadError")
+        self.assertEqual(calls["truncated"], 1)
+        self.assertEqual(window.limit, OPTIONS.connections_per_host)
+
+
+class RetryAfterTestCase(unittest.TestCase):
+    def test_seconds(self):
+        self.assertEqual(get_retry_after({"Retry-After": "3"}), 3.0)
+
+    def test_http_date_in_the_past(self):
+        self.assertEqual(get_retry_after({"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}), 0.0)
+
+    def test_missing_or_invalid(self):
+        self.assertIsNone(get_retry_after({}))
+        self.assertIsNone(get_retry_after({"Retry-After": "soon"}))
+
+
+class SplitPrivateTestCase(unittest.TestCase):
+    def test_patterns(self):
+        packages = [PackageInfo("@acme/ui", "1.0.0"), PackageInfo("acme-utils", "2.0.0"), PackageInfo("react", "16.0.0")]
+        private, public = split_private(packages, ["@acme/*", "acme-*"])
+        self.assertEqual(private, packages[:2])
+        self.assertEqual(public, packages[2:])
+
+    def test_no_patterns(self):
+        packages = [PackageInfo("react", "16.0.0")]
+        self.assertEqual(split_private(packages, None), ([], packages))
+
+
+class FetchStatsTestCase(unittest.TestCase):
+    def test_no_license_is_not_a_failure(self):
+        stats = FetchStats()
+        stats.add_license("MIT")
+        stats.add_license(None)
+        stats.add_license("UNKNOWN")
+        self.assertEqual((stats.resolved, stats.no_license, stats.failed), (1, 2, 0))
+
+    def test_revalidation_hit_ratio(self):
+        stats = FetchStats()
+        for not_modified in [True, True, True, False]:
+            stats.add_revalidation(not_modified)
+        self.assertIn("(revalidation hit ratio 75.0%)", stats.revalidation_summary())
+
+
+class ConditionalHeadersTestCase(unittest.TestCase):
+    def test_headers(self):
+        self.assertEqual(
+            get_conditional_headers(Validators('"abc"', "Sat, 20 Feb 2021 10:00:00 GMT")),
+            {"If-None-Match": '"abc"', "If-Modified-Since": "Sat, 20 Feb 2021 10:00:00 GMT"},
+        )
+        self.assertIsNone(get_conditional_headers(None))
+        self.assertIsNone(get_validators({}))
+        self.assertEqual(get_validators({"ETag": '"abc"'}), Validators('"abc"'))
+
+
+if __name__ == "__main__":
+    unittest.main()
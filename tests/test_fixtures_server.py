@@ -0,0 +1,82 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from license_sh.analyze.maven import fetch_maven_licenses
+from license_sh.fetcher import FetchStats
+from license_sh.fixtures_server import get_fixtures_app, split_npm_path
+from license_sh.resolvers import LookupOptions
+from license_sh.runners.python import PythonRunner
+from license_sh.runners.runners_shared import fetch_npm_licenses
+from license_sh.types.nodes import PackageInfo
+from tests.utils.server import BackgroundServer
+
+
+def write_fixture(directory, path, content):
+    path = os.path.join(directory, path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as file:
+        file.write(content if isinstance(content, str) else json.dumps(content))
+
+
+class FixturesServerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        directory = self.tmp_dir.name
+        write_fixture(
+            directory,
+            "npm/react.json",
+            {"name": "react", "versions": {"16.0.0": {"license": "MIT"}, "17.0.0": {"license": "MIT"}}},
+        )
+        write_fixture(directory, "npm/@babel/core.json", {"name": "@babel/core", "versions": {"7.0.0": {"license": "ISC"}}})
+        write_fixture(directory, "pypi/six/1.15.0.json", {"info": {"license": "MIT"}})
+        write_fixture(directory, "maven/www.apache.org/licenses/LICENSE-2.0.txt", "Apache License 2.0")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_split_npm_path(self):
+        self.assertEqual(split_npm_path("react/"), ("react", None))
+        self.assertEqual(split_npm_path("react/16.0.0"), ("react", "16.0.0"))
+        self.assertEqual(split_npm_path("@babel/core/7.0.0"), ("@babel/core", "7.0.0"))
+
+    def test_npm_and_pypi_fixtures(self):
+        with BackgroundServer(get_fixtures_app(self.tmp_dir.name)) as server:
+            license_map = fetch_npm_licenses(
+                [("react", "16.0.0"), ("react", "17.0.0"), ("@babel/core", "7.0.0"), ("missing", "1.0.0")],
+                options=LookupOptions(use_cache=False, use_npm_cache=False, registry=server.url("/npm")),
+            )
+            pypi_map = PythonRunner.fetch_licenses(
+                [PackageInfo("six", "1.15.0")],
+                LookupOptions(use_cache=False, registry=server.url("/pypi")),
+            )
+        self.assertEqual(license_map, {"react@16.0.0": "MIT", "react@17.0.0": "MIT", "@babel/core@7.0.0": "ISC"})
+        self.assertEqual(pypi_map, {PackageInfo("six", "1.15.0"): "MIT"})
+
+    def test_maven_license_through_mirror(self):
+        with BackgroundServer(get_fixtures_app(self.tmp_dir.name)) as server, tempfile.TemporaryDirectory() as out:
+            fetch_maven_licenses(
+                {"('commons-io', '2.6')": ["https://www.apache.org/licenses/LICENSE-2.0.txt"]},
+                out,
+                registry=server.url("/maven"),
+                use_cache=False,
+            )
+            with open(os.path.join(out, "('commons-io', '2.6')@0")) as file:
+                self.assertEqual(file.read(), "Apache License 2.0")
+
+    @mock.patch.dict(os.environ, {"LICENSE_SH_RETRIES": "0"})
+    def test_error_injection(self):
+        with BackgroundServer(get_fixtures_app(self.tmp_dir.name, error_rate=1.0)) as server:
+            stats = FetchStats()
+            license_map = fetch_npm_licenses(
+                [("react", "16.0.0")],
+                options=LookupOptions(use_cache=False, stats=stats, use_npm_cache=False, registry=server.url("/npm")),
+            )
+        self.assertEqual(license_map, {})
+        self.assertEqual(stats.failed, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,6 +7,7 @@ from anytree.exporter import DictExporter
 
 from license_sh.helpers import (
     flatten_dependency_tree,
+    get_breadth_first_dependencies,
     annotate_dep_tree,
     is_license_ok,
     is_analyze_ok,
@@ -145,6 +146,21 @@ class HelpersTestCase(unittest.TestCase):
             },
         )
 
+    def test_dependencies_in_breadth_first_order(self):
+        self.assertEqual(
+            get_breadth_first_dependencies(get_tree()),
+            [
+                ("@company/package1", "1.1.1"),
+                ("package4", "4.4.4"),
+                ("package2", "2.2.2"),
+                ("package3", "3.3.3"),
+                ("package5", "5.5.5"),
+                ("package6", "6.6.6"),
+                ("package7", "7.7.7"),
+                ("package7", "7.7.6"),
+            ],
+        )
+
     def test_bad_licenses_identified(self):
         tree = get_tree()
 
@@ -0,0 +1,120 @@
+import gzip
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+from license_sh.cache import NPM, PYPI
+from license_sh.license_db import LicenseDatabase, split_license_db
+from license_sh.resolvers import LookupOptions
+from license_sh.runners.runners_shared import fetch_npm_licenses
+from license_sh.types.nodes import PackageInfo
+
+
+def write_ndjson(path, rows, compress=False):
+    with (gzip.open(path, "wt") if compress else open(path, "w")) as file:
+        for row in rows:
+            file.write(json.dumps(row) + "\n")
+
+
+class LicenseDatabaseTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.license_db = LicenseDatabase(os.path.join(self.tmp_dir.name, "licenses.sqlite3"))
+
+    def tearDown(self):
+        self.license_db.close()
+        self.tmp_dir.cleanup()
+
+    def get_path(self, name):
+        return os.path.join(self.tmp_dir.name, name)
+
+    def test_import_compressed_ndjson(self):
+        write_ndjson(
+            self.get_path("snapshot.ndjson.gz"),
+            [
+                {"ecosystem": "npm", "name": "react", "version": "16.0.0", "license": "MIT"},
+                {"ecosystem": "pypi", "name": "six", "version": "1.0.0", "license": "MIT"},
+                {"ecosystem": "npm", "name": "unlicensed", "version": "1.0.0", "license": None},
+            ],
+            compress=True,
+        )
+        self.assertEqual(self.license_db.import_snapshot(self.get_path("snapshot.ndjson.gz")), 3)
+        packages = [PackageInfo("react", "16.0.0"), PackageInfo("six", "1.0.0"), PackageInfo("unlicensed", "1.0.0")]
+        self.assertEqual(
+            self.license_db.get_many(NPM, packages),
+            {PackageInfo("react", "16.0.0"): "MIT", PackageInfo("unlicensed", "1.0.0"): None},
+        )
+        self.assertEqual(self.license_db.get_many(PYPI, packages), {PackageInfo("six", "1.0.0"): "MIT"})
+
+    def test_import_replaces_previous_snapshot(self):
+        write_ndjson(self.get_path("old.ndjson"), [{"ecosystem": "npm", "name": "a", "version": "1", "license": "MIT"}])
+        self.license_db.import_snapshot(self.get_path("old.ndjson"))
+
+        connection = sqlite3.connect(self.get_path("new.sqlite3"))
+        connection.execute("CREATE TABLE licenses (ecosystem TEXT, name TEXT, version TEXT, license TEXT)")
+        connection.execute("INSERT INTO licenses VALUES ('npm', 'b', '1', 'ISC')")
+        connection.commit()
+        connection.close()
+        self.assertEqual(self.license_db.import_snapshot(self.get_path("new.sqlite3")), 1)
+
+        packages = [PackageInfo("a", "1"), PackageInfo("b", "1")]
+        self.assertEqual(self.license_db.get_many(NPM, packages), {PackageInfo("b", "1"): "ISC"})
+
+    def test_apply_update(self):
+        write_ndjson(
+            self.get_path("snapshot.ndjson"),
+            [
+                {"ecosystem": "npm", "name": "a", "version": "1", "license": "MIT"},
+                {"ecosystem": "npm", "name": "b", "version": "1", "license": "MIT"},
+            ],
+        )
+        self.license_db.import_snapshot(self.get_path("snapshot.ndjson"))
+        write_ndjson(
+            self.get_path("delta.ndjson"),
+            [
+                {"ecosystem": "npm", "name": "a", "version": "1", "deleted": True},
+                {"ecosystem": "npm", "name": "b", "version": "1", "license": "ISC"},
+                {"ecosystem": "npm", "name": "c", "version": "1", "license": "MIT"},
+            ],
+        )
+        self.assertEqual(self.license_db.apply_update(self.get_path("delta.ndjson")), (2, 1))
+
+        packages = [PackageInfo("a", "1"), PackageInfo("b", "1"), PackageInfo("c", "1")]
+        self.assertEqual(
+            self.license_db.get_many(NPM, packages), {PackageInfo("b", "1"): "ISC", PackageInfo("c", "1"): "MIT"}
+        )
+        self.assertEqual(self.license_db.stats().updates, 1)
+
+    def test_invalid_snapshot_keeps_database(self):
+        write_ndjson(self.get_path("snapshot.ndjson"), [{"ecosystem": "npm", "name": "a", "version": "1"}])
+        self.license_db.import_snapshot(self.get_path("snapshot.ndjson"))
+        with open(self.get_path("broken.ndjson"), "w") as file:
+            file.write('{"ecosystem": "npm", "name": "b"}\n')
+
+        with self.assertRaises(ValueError):
+            self.license_db.import_snapshot(self.get_path("broken.ndjson"))
+        self.assertEqual(self.license_db.stats().entries, 1)
+        self.assertFalse(os.path.exists(f"{self.license_db.path}.import"))
+
+    def test_split_license_db(self):
+        packages = [PackageInfo("a", "1")]
+        self.assertEqual(split_license_db(None, NPM, packages), ({}, packages))
+
+    def test_npm_licenses_from_database(self):
+        write_ndjson(self.get_path("snapshot.ndjson"), [{"ecosystem": "npm", "name": "a", "version": "1", "license": "MIT"}])
+        self.license_db.import_snapshot(self.get_path("snapshot.ndjson"))
+
+        # no registry is running, a request would fail
+        with mock.patch("license_sh.runners.runners_shared.get_license_db", return_value=self.license_db):
+            license_map = fetch_npm_licenses(
+                [("a", "1")],
+                options=LookupOptions(use_cache=False, use_npm_cache=False, registry="http://127.0.0.1:9"),
+            )
+        self.assertEqual(license_map, {"a@1": "MIT"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,32 @@
+import os
+import unittest
+from unittest import mock
+
+from license_sh.cache import MAVEN, NPM, PYPI
+from license_sh.registries import get_mirror_url, get_registry
+
+
+class RegistriesTestCase(unittest.TestCase):
+    @mock.patch.dict(os.environ, {}, clear=True)
+    def test_public_registries_by_default(self):
+        self.assertEqual(get_registry(NPM), "https://registry.npmjs.org")
+        self.assertEqual(get_registry(PYPI), "https://pypi.org/pypi")
+        self.assertIsNone(get_registry(MAVEN))
+
+    @mock.patch.dict(os.environ, {"LICENSE_SH_PYPI_REGISTRY": "http://env/pypi/"}, clear=True)
+    def test_environment_takes_precedence_over_config(self):
+        registries = {NPM: "http://mirror/npm", PYPI: "http://mirror/pypi"}
+        self.assertEqual(get_registry(NPM, registries), "http://mirror/npm")
+        self.assertEqual(get_registry(PYPI, registries), "http://env/pypi")
+
+    def test_mirror_url(self):
+        url = "https://www.apache.org/licenses/LICENSE-2.0.txt?format=txt"
+        self.assertEqual(get_mirror_url(url, None), url)
+        self.assertEqual(
+            get_mirror_url(url, "http://mirror/maven"),
+            "http://mirror/maven/www.apache.org/licenses/LICENSE-2.0.txt?format=txt",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
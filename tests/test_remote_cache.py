@@ -0,0 +1,110 @@
+import os
+import tempfile
+import time
+import unittest
+from collections import Counter
+from unittest import mock
+
+from aiohttp import web
+
+from license_sh.cache import NPM, LicenseCache
+from license_sh.fetcher import FetchEngine, FetchOptions, FetchStats
+from license_sh.remote_cache import RemoteCache
+from license_sh.remote_cache_server import RemoteCacheStore, get_remote_cache_app, serve_remote_cache
+from license_sh.resolvers import REGISTRY, REMOTE_CACHE, LookupOptions
+from license_sh.runners.runners_shared import fetch_npm_licenses
+from license_sh.types.nodes import PackageInfo
+from tests.runners.test_runners_shared import get_registry_app
+from tests.utils.server import BackgroundServer
+
+OPTIONS = FetchOptions(timeout=5, retries=0)
+
+
+def get_counting_app(store, token=None):
+    calls: Counter = Counter()
+
+    @web.middleware
+    async def count(request, handler):
+        calls[request.method] += 1
+        return await handler(request)
+
+    app = get_remote_cache_app(store, token)
+    app.middlewares.append(count)
+    return app, calls
+
+
+class RemoteCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = RemoteCacheStore(os.path.join(self.tmp_dir.name, "remote.sqlite3"))
+        self.engine = FetchEngine(OPTIONS)
+
+    def tearDown(self):
+        self.engine.close()
+        self.store.close()
+        self.tmp_dir.cleanup()
+
+    def test_batched_round_trip(self):
+        packages = {PackageInfo(f"package{i}", "1.0.0"): "MIT" if i % 10 else None for i in range(2999)}
+        app, calls = get_counting_app(self.store, token="secret")
+        with BackgroundServer(app) as server:
+            remote = RemoteCache(server.url(), "secret", self.engine)
+            remote.set_many(NPM, packages)
+            started = time.monotonic()
+            found = remote.get_many(NPM, list(packages) + [PackageInfo("missing", "1.0.0")])
+            elapsed = time.monotonic() - started
+        self.assertEqual(found, packages)
+        self.assertEqual(calls, {"PUT": 3, "POST": 3})
+        self.assertLess(elapsed, 1.0)
+
+    def test_unauthorized_cache_is_not_asked_again(self):
+        app, calls = get_counting_app(self.store, token="secret")
+        with BackgroundServer(app) as server:
+            remote = RemoteCache(server.url(), "wrong", self.engine)
+            self.assertEqual(remote.get_many(NPM, [PackageInfo("react", "16.0.0")]), {})
+            remote.set_many(NPM, {PackageInfo("react", "16.0.0"): "MIT"})
+        self.assertEqual(calls, {"POST": 1})
+        self.assertFalse(remote.available)
+
+    def test_invalid_entries_are_rejected(self):
+        app, _ = get_counting_app(self.store)
+        with BackgroundServer(app) as server:
+            remote = RemoteCache(server.url(), engine=self.engine)
+            remote.send("PUT", "/entries", [{"entries": {"npm:react@16.0.0": 1}}], lambda resp, payload=None: None)
+        self.assertFalse(remote.available)
+        self.assertEqual(self.store.get_many(["npm:react@16.0.0"]), {})
+
+    def test_public_cache_requires_token(self):
+        store = os.path.join(self.tmp_dir.name, "public.sqlite3")
+        with mock.patch.dict(os.environ, {"LICENSE_SH_REMOTE_CACHE_TOKEN": ""}), mock.patch(
+            "license_sh.remote_cache_server.web.run_app"
+        ) as run_app:
+            with self.assertRaises(ValueError):
+                serve_remote_cache(store, "0.0.0.0")
+            serve_remote_cache(store)
+        self.assertEqual(run_app.call_args[1]["host"], "127.0.0.1")
+
+    def test_npm_licenses_shared_between_runners(self):
+        self.store.set_many({"npm:lodash@4.17.20": "MIT"})
+        app, _ = get_counting_app(self.store)
+        cache = LicenseCache(os.path.join(self.tmp_dir.name, "cache.sqlite3"))
+        with BackgroundServer(app) as remote_server, BackgroundServer(get_registry_app()) as registry:
+            with mock.patch.dict(
+                os.environ,
+                {"LICENSE_SH_REMOTE_CACHE": remote_server.url(), "LICENSE_SH_NPM_REGISTRY": registry.url()},
+            ), mock.patch("license_sh.runners.runners_shared.get_cache", return_value=cache):
+                stats = FetchStats()
+                license_map = fetch_npm_licenses(
+                    [("lodash", "4.17.20"), ("react", "16.0.0")],
+                    options=LookupOptions(stats=stats),
+                )
+        self.assertEqual(license_map, {"lodash@4.17.20": "MIT", "react@16.0.0": "MIT"})
+        self.assertEqual(stats.sources, {("lodash", "4.17.20"): REMOTE_CACHE, ("react", "16.0.0"): REGISTRY})
+        # fetched licenses are shared, remote ones are kept locally
+        self.assertEqual(self.store.get_many(["npm:react@16.0.0"]), {"npm:react@16.0.0": "MIT"})
+        self.assertEqual(cache.get_many(NPM, [PackageInfo("lodash", "4.17.20")]), {("lodash", "4.17.20"): "MIT"})
+        cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
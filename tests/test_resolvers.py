@@ -0,0 +1,51 @@
+import unittest
+
+from anytree import AnyNode
+
+from license_sh.fetcher import FetchStats, add_unresolved_reasons
+from license_sh.resolvers import CACHE, LOCKFILE, REGISTRY, get_known_resolver, resolve_chain
+from license_sh.types.nodes import PackageInfo
+
+A = PackageInfo("a", "1.0.0")
+B = PackageInfo("b", "1.0.0")
+C = PackageInfo("c", "1.0.0")
+
+
+class ResolveChainTestCase(unittest.TestCase):
+    def test_packages_stop_at_first_source(self):
+        asked = []
+
+        def cache(packages):
+            asked.append(packages)
+            return {package: "ISC" for package in packages}
+
+        stats = FetchStats()
+        resolved, missing = resolve_chain(
+            [("a", "1.0.0"), ("b", "1.0.0")], [(LOCKFILE, get_known_resolver({A: "MIT"})), (CACHE, cache)], stats
+        )
+        self.assertEqual(resolved, {A: "MIT", B: "ISC"})
+        self.assertEqual(missing, [])
+        self.assertEqual(asked, [[B]])
+        self.assertEqual(stats.sources, {A: LOCKFILE, B: CACHE})
+
+    def test_known_to_have_no_license(self):
+        stats = FetchStats()
+        resolved, missing = resolve_chain([A, B, C], [(CACHE, lambda packages: {B: None})], stats)
+        self.assertEqual(resolved, {B: None})
+        self.assertEqual(missing, [A, C])
+
+    def test_known_resolver_skips_missing_licenses(self):
+        self.assertEqual(get_known_resolver({A: "MIT", B: None})([A, B, C]), {A: "MIT"})
+
+    def test_source_in_report(self):
+        stats = FetchStats()
+        stats.add_source(A, REGISTRY)
+        tree = AnyNode(name="root", version=None)
+        node = AnyNode(name="a", version="1.0.0", license="MIT", parent=tree)
+        add_unresolved_reasons(tree, stats)
+        self.assertEqual(node.license_source, REGISTRY)
+        self.assertIn("answered by registry 1", stats.summary())
+
+
+if __name__ == "__main__":
+    unittest.main()